@@ -1,17 +1,101 @@
+import atexit
+import copy
 import logging
+import logging.handlers
+import queue
 
+from argus.tasks.base.logs import ContextFilter, JsonFormatter, RunLogCaptureHandler
 
-def setup_logging():
-    # Define the log format
-    log_format = '[%(asctime)s] %(levelname)s | %(name)s:%(lineno)d | %(message)s'
+LOG_FORMAT = '[%(asctime)s] %(levelname)s | %(name)s:%(lineno)d | %(message)s'
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
 
-    # Define the date format
-    date_format = '%Y-%m-%d %H:%M:%S'
 
-    # Configure logging
-    logging.basicConfig(
-        level=logging.INFO,  # Set minimum log level to DEBUG
-        format=log_format,  # Set log format
-        datefmt=date_format,  # Set date format
-        handlers=[logging.StreamHandler()],  # Only log to the console
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the listener thread without formatting them.
+
+    Only the message and the traceback are rendered here, as the arguments
+    and the exception may change or go away once the call returns.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class _QueueListener(logging.handlers.QueueListener):
+    def stop(self) -> None:
+        """Flushes the queue; stopping twice, e.g. again at exit, is a no-op."""
+        if self._thread is not None:
+            super().stop()
+
+
+def setup_logging(
+    json_format: bool = False,
+    log_file: str | None = None,
+    max_bytes: int = 10 << 20,
+    backup_count: int = 5,
+    background: bool = False,
+    capture_runs: bool = False,
+) -> logging.handlers.QueueListener | None:
+    """Logs to stderr and optionally to a size-rotated file.
+
+    With `json_format` each record is a JSON object carrying the task and
+    run it was logged from. With `background` the handlers write from a
+    listener thread, so logging never blocks the caller on I/O. With
+    `capture_runs` the records of each run are stored with its journal entry.
+    """
+    formatter = (
+        JsonFormatter() if json_format else logging.Formatter(LOG_FORMAT, DATE_FORMAT)
     )
+    handlers: list[logging.Handler] = [logging.StreamHandler()]
+    if log_file:
+        handlers.append(
+            logging.handlers.RotatingFileHandler(
+                log_file, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8'
+            )
+        )
+    for handler in handlers:
+        handler.setFormatter(formatter)
+        handler.addFilter(ContextFilter())
+
+    listener = None
+    root_handlers = handlers
+    if background:
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        queue_handler = _QueueHandler(log_queue)
+        # The context is read in the thread that logs, not in the listener.
+        queue_handler.addFilter(ContextFilter())
+        listener = _QueueListener(log_queue, *handlers, respect_handler_level=True)
+        listener.start()
+        atexit.register(listener.stop)
+        root_handlers = [queue_handler]
+    if capture_runs:
+        capture_handler = RunLogCaptureHandler()
+        capture_handler.addFilter(ContextFilter())
+        root_handlers = [*root_handlers, capture_handler]
+
+    logging.basicConfig(level=logging.INFO, handlers=root_handlers, force=True)
+    return listener
+
+
+def setup_worker_logging(
+    log_queue: queue.SimpleQueue, level: int = logging.INFO, capture_runs: bool = False
+) -> None:
+    """Queues the records of a worker process, to be handled by its parent.
+
+    With `capture_runs` the records of each run are also stored with its
+    journal entry, which the worker writes.
+    """
+    queue_handler = _QueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+    handlers: list[logging.Handler] = [queue_handler]
+    if capture_runs:
+        capture_handler = RunLogCaptureHandler()
+        capture_handler.addFilter(ContextFilter())
+        handlers.append(capture_handler)
+    logging.basicConfig(level=level, handlers=handlers, force=True)
@@ -1,14 +1,46 @@
-from argus.tasks.base.notifier import SlackNotifier, TelegramNotifier
-from argus.tasks.epay import EPayTask
-from argus.tasks.github import TrendingGithubReposTask
-from argus.tasks.ml.hugging_face import (
-    HuggingFaceTrendingModelsTask,
-    HuggingFaceTrendingPapersTask,
-)
-from argus.tasks.ml.paper_with_code import TrendingPapersWithCodeTask
-from argus.tasks.product import PriceDiscountsTask
-from argus.tasks.snow import SnowForecastTask, SnowReportData
-from argus.tasks.todo import TodoTask
+import importlib
+from typing import Any
+
+from argus.tasks.base.serializable import Serializable
+
+# Task modules pull in heavy dependencies, so they are imported on first use:
+# either when a class is deserialized or when it is imported from here.
+_MODULES = {
+    'argus.tasks.base.notifier': [
+        'SlackNotifier',
+        'TelegramNotifier',
+        'StaticTelegramNotifier',
+        'SimpleFormatter',
+    ],
+    'argus.tasks.epay': ['Bills', 'EPayTask', 'EPayMarkdownFormatter'],
+    'argus.tasks.github': ['Repos', 'TrendingGithubReposTask', 'GithubSlackFormatter'],
+    'argus.tasks.ml.hugging_face': [
+        'TrendingModelsData',
+        'HuggingFaceTrendingModelsTask',
+        'HuggingFaceModelFormatter',
+        'HuggingFaceTrendingPapersTask',
+        'HuggingFacePapersFormatter',
+    ],
+    'argus.tasks.ml.paper_with_code': [
+        'Papers',
+        'TrendingPapersWithCodeTask',
+        'PapersWithCodeSlackFormatter',
+    ],
+    'argus.tasks.product': [
+        'ProductPrices',
+        'PriceDiscountsTask',
+        'LillyPriceFetcher',
+        'PriceDiscountsFormatter',
+    ],
+    'argus.tasks.snow': ['SnowReportData', 'SnowForecastTask', 'SnowReportFormatter'],
+    'argus.tasks.todo': ['Todo', 'TodoTask', 'TodoFormatter'],
+}
+_CLASS_MODULES = {
+    class_name: module
+    for module, class_names in _MODULES.items()
+    for class_name in class_names
+}
+Serializable.register_modules(_CLASS_MODULES)
 
 __all__ = [
     'SlackNotifier',
@@ -23,3 +55,13 @@ __all__ = [
     'SnowForecastTask',
     'SnowReportData',
 ]
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _CLASS_MODULES:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    return getattr(importlib.import_module(_CLASS_MODULES[name]), name)
+
+
+def __dir__() -> list[str]:
+    return sorted(list(globals()) + list(_CLASS_MODULES))
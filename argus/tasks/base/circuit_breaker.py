@@ -0,0 +1,152 @@
+import threading
+from enum import Enum
+
+from argus.tasks.base.clock import SYSTEM_CLOCK, Clock
+from argus.tasks.base.state import load_state, save_state
+
+
+class CircuitState(Enum):
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """Stops calls to a failing dependency until `reset_timeout` has passed.
+
+    After `failure_threshold` consecutive failures the circuit opens and every
+    call is rejected. Once `reset_timeout` seconds have passed a single trial
+    call is let through; its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 3,
+        reset_timeout: float = 300,
+        clock: Clock | None = None,
+    ) -> None:
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._clock = clock if clock else SYSTEM_CLOCK
+        self._lock = threading.Lock()
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._trial_in_progress = False
+
+    @property
+    def state(self) -> CircuitState:
+        if self.opened_at is None:
+            return CircuitState.CLOSED
+        if self._clock.time() - self.opened_at >= self._reset_timeout:
+            return CircuitState.HALF_OPEN
+        return CircuitState.OPEN
+
+    def _load(self) -> None:
+        """Refreshes the state; only persistent breakers keep it elsewhere."""
+
+    def _save(self) -> None:
+        pass
+
+    @property
+    def retry_at(self) -> float | None:
+        """Returns the time a trial call is let through while open."""
+        return self.opened_at + self._reset_timeout if self.opened_at else None
+
+    def allow(self) -> bool:
+        with self._lock:
+            self._load()
+            state = self.state
+            if state == CircuitState.CLOSED:
+                return True
+            if state == CircuitState.HALF_OPEN and not self._trial_in_progress:
+                self._trial_in_progress = True
+                return True
+            return False
+
+    def cancel_trial(self) -> None:
+        """Gives back a trial call that `allow` granted but was not made."""
+        with self._lock:
+            self._trial_in_progress = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            changed = self.failures or self.opened_at is not None
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_progress = False
+            if changed:
+                self._save()
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._load()
+            self.failures += 1
+            self._trial_in_progress = False
+            if self.opened_at is not None or self.failures >= self._failure_threshold:
+                self.opened_at = self._clock.time()
+            self._save()
+
+
+class PersistentCircuitBreaker(CircuitBreaker):
+    """A circuit breaker whose state is kept in the state store.
+
+    The state survives restarts and is shared by every process that uses the
+    same `key`. Only whether a trial call is in progress stays local.
+    """
+
+    def __init__(
+        self,
+        key: str,
+        failure_threshold: int = 3,
+        reset_timeout: float = 300,
+        clock: Clock | None = None,
+    ) -> None:
+        super().__init__(failure_threshold, reset_timeout, clock)
+        self.key = key
+
+    def _load(self) -> None:
+        state = load_state(self.key)
+        self.failures = state['failures'] if state else 0
+        self.opened_at = state['opened_at'] if state else None
+
+    def _save(self) -> None:
+        save_state(self.key, {'failures': self.failures, 'opened_at': self.opened_at})
+
+
+class CircuitBreakerRegistry:
+    """Hands out one circuit breaker per key.
+
+    With `state_prefix` the breakers are persisted under `<state_prefix><key>`.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 3,
+        reset_timeout: float = 300,
+        state_prefix: str | None = None,
+        clock: Clock | None = None,
+    ) -> None:
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._state_prefix = state_prefix
+        self._clock = clock
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is None:
+                breaker = self._breakers[key] = (
+                    CircuitBreaker(
+                        self._failure_threshold, self._reset_timeout, self._clock
+                    )
+                    if self._state_prefix is None
+                    else PersistentCircuitBreaker(
+                        self._state_prefix + key,
+                        self._failure_threshold,
+                        self._reset_timeout,
+                        self._clock,
+                    )
+                )
+            return breaker
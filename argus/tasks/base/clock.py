@@ -0,0 +1,67 @@
+import threading
+import time
+from datetime import UTC, datetime, timedelta, tzinfo
+
+
+class Clock:
+    """Reads and waits on the wall clock."""
+
+    def now(self, tz: tzinfo = UTC) -> datetime:
+        return datetime.now(tz)
+
+    def utcnow(self) -> datetime:
+        """Returns the naive UTC time, as stored in the database."""
+        return self.now(UTC).replace(tzinfo=None)
+
+    def time(self) -> float:
+        """Returns the seconds since the epoch, like `time.time`."""
+        return self.now().timestamp()
+
+    def monotonic(self) -> float:
+        return time.monotonic()
+
+    def wait(self, event: threading.Event, timeout: float) -> bool:
+        """Waits until `event` is set or `timeout` seconds have passed."""
+        return event.wait(timeout)
+
+
+class VirtualClock(Clock):
+    """A clock that only moves when advanced, for tests and simulations.
+
+    Waiting returns at once and advances the clock by the timeout, so a loop
+    that sleeps between iterations runs through hours in milliseconds. Time is
+    kept in UTC, where adding a delta is never ambiguous.
+    """
+
+    def __init__(self, start: datetime) -> None:
+        if start.tzinfo is None:
+            raise ValueError('The start of a virtual clock needs a timezone')
+        self._now = start.astimezone(UTC)
+        self._elapsed = 0.0
+
+    def now(self, tz: tzinfo = UTC) -> datetime:
+        return self._now.astimezone(tz)
+
+    def monotonic(self) -> float:
+        return self._elapsed
+
+    def advance(self, delta: timedelta | float) -> None:
+        if not isinstance(delta, timedelta):
+            delta = timedelta(seconds=delta)
+        if delta < timedelta():
+            raise ValueError('A clock cannot go back')
+        self._now += delta
+        self._elapsed += delta.total_seconds()
+
+    def set(self, moment: datetime) -> None:
+        """Moves the clock forward to `moment`."""
+        self.advance(moment - self._now)
+
+    def wait(self, event: threading.Event, timeout: float) -> bool:
+        if event.is_set():
+            return True
+        self.advance(timeout)
+        return False
+
+
+SYSTEM_CLOCK = Clock()
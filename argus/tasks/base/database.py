@@ -1,6 +1,17 @@
 from datetime import datetime, timezone
 
-from peewee import CharField, DateTimeField, Model, SqliteDatabase, TextField
+from peewee import (
+    AutoField,
+    BooleanField,
+    CharField,
+    DateTimeField,
+    FloatField,
+    IntegerField,
+    Model,
+    SqliteDatabase,
+    TextField,
+)
+from playhouse.migrate import Operation, SqliteMigrator, migrate
 
 db = SqliteDatabase('tasks.db')
 
@@ -10,23 +21,187 @@ def get_current_utc_time():
 
 
 class TaskResult(Model):
+    id = AutoField()
     task_id = CharField()
     result = TextField()
+    # Identifies the run that stored the result, so a retry stores it once.
+    run_key = CharField(null=True, unique=True)
     created_at = DateTimeField(default=get_current_utc_time)
 
     class Meta:
         database = db
+        indexes = ((('task_id', 'created_at'), False),)
 
 
 class RunningTask(Model):
     task_id = CharField(unique=True)
     task_type = CharField()
     serialized_data = TextField()
-    last_updated = DateTimeField(default=get_current_utc_time)
+    last_updated = DateTimeField(default=get_current_utc_time, index=True)
 
     class Meta:
         database = db
 
 
+class Job(Model):
+    id = AutoField()
+    task_id = CharField()
+    state = CharField(default='pending')
+    priority = IntegerField(default=0)
+    attempts = IntegerField(default=0)
+    max_attempts = IntegerField(default=3)
+    available_at = DateTimeField(default=get_current_utc_time)
+    # Latest start that meets the SLA of the task, if it has one.
+    deadline = DateTimeField(null=True)
+    locked_by = CharField(null=True)
+    last_error = TextField(null=True)
+    created_at = DateTimeField(default=get_current_utc_time)
+    started_at = DateTimeField(null=True)
+    finished_at = DateTimeField(null=True)
+
+    class Meta:
+        database = db
+        indexes = (
+            (('state', 'available_at'), False),
+            (('task_id', 'state', 'finished_at'), False),
+        )
+
+
+class Delivery(Model):
+    notifier = CharField()
+    destination = CharField()
+    success = BooleanField()
+    attempts = IntegerField()
+    duration = FloatField()
+    error = TextField(null=True)
+    created_at = DateTimeField(default=get_current_utc_time, index=True)
+
+    class Meta:
+        database = db
+
+
+class Notification(Model):
+    id = AutoField()
+    task_id = CharField()
+    notifier = TextField()
+    destination = TextField()
+    destination_key = TextField()
+    text = TextField()
+    idempotency_key = CharField(unique=True)
+    state = CharField(default='pending')
+    attempts = IntegerField(default=0)
+    available_at = DateTimeField(default=get_current_utc_time)
+    locked_by = CharField(null=True)
+    last_error = TextField(null=True)
+    created_at = DateTimeField(default=get_current_utc_time)
+    sent_at = DateTimeField(null=True)
+
+    class Meta:
+        database = db
+        indexes = ((('state', 'available_at'), False),)
+
+
+class MetricPoint(Model):
+    task_id = CharField()
+    entity = CharField()
+    metric = CharField()
+    ts = DateTimeField()
+    value = FloatField()
+
+    class Meta:
+        database = db
+        indexes = (
+            (('task_id', 'metric', 'entity', 'ts'), False),
+            (('task_id', 'ts'), False),
+        )
+
+
+class MetricRollup(Model):
+    task_id = CharField()
+    entity = CharField()
+    metric = CharField()
+    resolution = CharField()
+    bucket = DateTimeField()
+    count = IntegerField()
+    total = FloatField()
+    minimum = FloatField()
+    maximum = FloatField()
+
+    class Meta:
+        database = db
+        indexes = ((('task_id', 'metric', 'entity', 'resolution', 'bucket'), True),)
+
+
+class KeyValue(Model):
+    key = CharField(primary_key=True)
+    value = TextField()
+    updated_at = DateTimeField(default=get_current_utc_time)
+
+    class Meta:
+        database = db
+
+
+class TaskRun(Model):
+    id = AutoField()
+    task_id = CharField()
+    run_key = CharField(null=True)
+    outcome = CharField()
+    error = TextField(null=True)
+    # Records logged by the run, as JSON lines.
+    logs = TextField(null=True)
+    started_at = DateTimeField(default=get_current_utc_time)
+    duration = FloatField()
+    cpu_time = FloatField(null=True)
+    peak_rss_delta = IntegerField(null=True)
+    n_requests = IntegerField(default=0)
+    bytes_downloaded = IntegerField(default=0)
+    # Comma separated hosts that failed during the run.
+    failed_hosts = TextField(null=True)
+
+    class Meta:
+        database = db
+        indexes = (
+            (('task_id', 'started_at'), False),
+            (('started_at',), False),
+        )
+
+
+MODELS = [
+    RunningTask,
+    TaskResult,
+    Job,
+    Delivery,
+    Notification,
+    MetricPoint,
+    MetricRollup,
+    KeyValue,
+    TaskRun,
+]
+
+
+def add_missing_columns(database: SqliteDatabase) -> None:
+    """Adds columns that models gained after their tables were created.
+
+    ``create_tables`` never alters existing tables, so databases created by an
+    older release would otherwise lack the new columns. Added columns must be
+    nullable or have a default.
+    """
+    migrator = SqliteMigrator(database)
+    operations: list[Operation] = []
+    for model in MODELS:
+        table = model._meta.table_name
+        if not database.table_exists(table):
+            continue
+        existing = {column.name for column in database.get_columns(table)}
+        operations.extend(
+            migrator.add_column(table, field.column_name, field)
+            for field in model._meta.sorted_fields
+            if field.column_name not in existing
+        )
+    if operations:
+        migrate(*operations)
+
+
 def init_database() -> None:
-    db.create_tables([RunningTask, TaskResult])
+    add_missing_columns(db)
+    db.create_tables(MODELS)
@@ -0,0 +1,132 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from argus.tasks.base.circuit_breaker import CircuitBreakerRegistry
+from argus.tasks.base.database import Delivery
+
+if TYPE_CHECKING:
+    from argus.tasks.base.notifier import Notifier
+
+logger = logging.getLogger(__name__)
+
+delivery_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix='delivery')
+destination_breakers = CircuitBreakerRegistry()
+
+
+class RateLimitedError(Exception):
+    def __init__(self, retry_after: float) -> None:
+        super().__init__(f'Rate limited, retry after {retry_after}s')
+        self.retry_after = retry_after
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    max_attempts: int = 3
+    base_delay: float = 1.0
+    max_delay: float = 30.0
+
+    def delay(self, attempt: int) -> float:
+        return min(self.base_delay * 2 ** (attempt - 1), self.max_delay)
+
+
+DEFAULT_RETRY_POLICY = RetryPolicy()
+
+
+@dataclass(frozen=True)
+class DeliveryResult:
+    destination: str
+    success: bool
+    attempts: int
+    duration: float
+    error: str | None = None
+    # The notifier refused the message itself, e.g. because it is too long.
+    rejected: bool = False
+
+
+def deliver(
+    notifier: 'Notifier',
+    destination: str,
+    text: str,
+    retry_policy: RetryPolicy | None = None,
+) -> DeliveryResult:
+    """Sends to one destination with retries, guarded by its circuit breaker.
+
+    A `ValueError` means the notifier rejected the message, so it is neither
+    retried nor counted against the destination.
+    """
+    retry_policy = retry_policy or DEFAULT_RETRY_POLICY
+    key = notifier.destination_key(destination)
+    breaker = destination_breakers.get(key)
+    started_at = time.monotonic()
+    attempt = 0
+    error: str | None = None
+    rejected = False
+    while attempt < retry_policy.max_attempts:
+        if not breaker.allow():
+            error = 'Circuit open'
+            break
+        attempt += 1
+        try:
+            notifier.send(destination, text)
+        except RateLimitedError as exc:
+            breaker.record_success()
+            error = str(exc)
+            time.sleep(exc.retry_after)
+        except ValueError as exc:
+            breaker.cancel_trial()
+            error, rejected = repr(exc), True
+            break
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            breaker.record_failure()
+            error = repr(exc)
+            if attempt < retry_policy.max_attempts:
+                time.sleep(retry_policy.delay(attempt))
+        else:
+            breaker.record_success()
+            error = None
+            break
+    result = DeliveryResult(
+        destination=key,
+        success=error is None,
+        attempts=attempt,
+        duration=time.monotonic() - started_at,
+        error=error,
+        rejected=rejected,
+    )
+    record_delivery(notifier, result)
+    return result
+
+
+def deliver_all(
+    notifier: 'Notifier', text: str, retry_policy: RetryPolicy | None = None
+) -> list[DeliveryResult]:
+    """Sends to every destination of the notifier concurrently."""
+    futures = [
+        delivery_executor.submit(deliver, notifier, destination, text, retry_policy)
+        for destination in notifier.destinations()
+    ]
+    return [future.result() for future in futures]
+
+
+def record_delivery(notifier: 'Notifier', result: DeliveryResult) -> None:
+    if not result.success:
+        logger.warning(
+            '%s delivery failed after %d attempts: %s',
+            type(notifier).__name__,
+            result.attempts,
+            result.error,
+        )
+    try:
+        Delivery.create(
+            notifier=type(notifier).__name__,
+            destination=result.destination,
+            success=result.success,
+            attempts=result.attempts,
+            duration=result.duration,
+            error=result.error,
+        )
+    except Exception:  # pylint: disable=broad-exception-caught
+        logger.exception('Failed to record delivery result')
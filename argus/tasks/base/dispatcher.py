@@ -0,0 +1,318 @@
+import hashlib
+import json
+import logging
+import socket
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import wait
+from datetime import timedelta
+
+from argus.tasks.base.database import Notification, get_current_utc_time
+from argus.tasks.base.delivery import RetryPolicy, deliver, delivery_executor
+from argus.tasks.base.notifier import Notifier
+
+logger = logging.getLogger(__name__)
+
+DIGEST_SEPARATOR = '\n\n'
+
+PENDING = 'pending'
+SENDING = 'sending'
+SENT = 'sent'
+DEAD = 'dead'
+
+
+def split_message(text: str, max_length: int | None) -> list[str]:
+    """Splits a message into parts below `max_length`, at line breaks if possible."""
+    if max_length is None:
+        return [text]
+    parts = []
+    while len(text) >= max_length:
+        cut = text.rfind('\n', 0, max_length - 1)
+        if cut > 0:
+            parts.append(text[:cut])
+            text = text[cut + 1 :]
+        else:
+            parts.append(text[: max_length - 1])
+            text = text[max_length - 1 :]
+    if text or not parts:
+        parts.append(text)
+    return parts
+
+
+def group_messages(
+    texts: list[str], max_length: int | None, separator: str = DIGEST_SEPARATOR
+) -> list[list[str]]:
+    """Greedily groups messages so that each joined group is below `max_length`.
+
+    Messages are never cut here; `enqueue` splits the ones that are too long.
+    """
+    if max_length is None:
+        return [texts] if texts else []
+    groups: list[list[str]] = []
+    length = 0
+    for text in texts:
+        if groups and length + len(separator) + len(text) < max_length:
+            groups[-1].append(text)
+            length += len(separator) + len(text)
+        else:
+            groups.append([text])
+            length = len(text)
+    return groups
+
+
+def pack_messages(
+    texts: list[str], max_length: int | None, separator: str = DIGEST_SEPARATOR
+) -> list[str]:
+    """Joins messages into digests shorter than `max_length`."""
+    return [
+        separator.join(group) for group in group_messages(texts, max_length, separator)
+    ]
+
+
+class NotificationDispatcher:
+    """Delivers notifications from the durable `Notification` outbox.
+
+    Tasks write outbox rows in the same transaction as their `TaskResult`, one
+    row per destination, keyed by an idempotency key derived from the run, so a
+    retried run does not enqueue the same notification twice. A background
+    thread merges rows for the same destination and digest key that arrived
+    within `window` seconds into digests and delivers destinations
+    concurrently, spacing sends to one destination by `min_interval` seconds.
+
+    Rows are leased while being sent. Rows left behind by a crashed process
+    become visible again once their lease expires, so a notification is only
+    repeated if the process dies between a successful send and marking the
+    row as sent.
+    """
+
+    def __init__(
+        self,
+        window: float = 5.0,
+        min_interval: float = 1.0,
+        poll_interval: float = 1.0,
+        lease: timedelta = timedelta(minutes=5),
+        retry_delay: timedelta = timedelta(seconds=30),
+        max_attempts: int = 5,
+        retry_policy: RetryPolicy | None = None,
+        worker_id: str | None = None,
+    ) -> None:
+        self._window = timedelta(seconds=window)
+        self._min_interval = min_interval
+        self._poll_interval = poll_interval
+        self._lease = lease
+        self._retry_delay = retry_delay
+        self._max_attempts = max_attempts
+        self._retry_policy = retry_policy
+        self._worker_id = (
+            worker_id
+            if worker_id is not None
+            else f'{socket.gethostname()}_{uuid.uuid4().hex[:8]}'
+        )
+        self._notifiers: dict[str, Notifier] = {}
+        self._next_send_at: dict[str, float] = {}
+        self._condition = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._is_running = False
+
+    @staticmethod
+    def enqueue(task_id: str, notifier: Notifier, text: str, run_key: str) -> None:
+        """Writes outbox rows; call inside the transaction that saves the result.
+
+        Texts longer than the notifier allows are split into several rows.
+        """
+        serialized_notifier = json.dumps(notifier.to_dict(), sort_keys=True)
+        parts = split_message(text, notifier.MAX_MESSAGE_LENGTH)
+        for destination in notifier.destinations() or ['']:
+            destination_key = (
+                notifier.destination_key(destination)
+                if destination
+                else hashlib.sha256(serialized_notifier.encode()).hexdigest()
+            )
+            for index, part in enumerate(parts):
+                key = f'{run_key}:{destination_key}'
+                idempotency_key = hashlib.sha256(
+                    (f'{key}:{index}' if index else key).encode()
+                ).hexdigest()
+                Notification.insert(
+                    task_id=task_id,
+                    notifier=serialized_notifier,
+                    destination=destination,
+                    destination_key=destination_key,
+                    text=part,
+                    idempotency_key=idempotency_key,
+                ).on_conflict_ignore().execute()
+
+    def start(self) -> None:
+        with self._condition:
+            if self._is_running:
+                return
+            self._is_running = True
+        self._thread = threading.Thread(
+            target=self._run, name='notification-dispatcher', daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float | None = None) -> None:
+        """Stops the background thread after flushing pending notifications."""
+        with self._condition:
+            self._is_running = False
+            self._condition.notify_all()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        self.drain(flush=True)
+
+    def drain(self, flush: bool = False) -> int:
+        """Delivers visible outbox rows and returns how many were sent.
+
+        Destinations whose oldest row is younger than the window are left for
+        a later call, unless `flush` is set.
+        """
+        futures = [
+            delivery_executor.submit(self._deliver, rows)
+            for rows in self._claim_ready_rows(flush)
+        ]
+        wait(futures)
+        return sum(future.result() for future in futures)
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                if not self._is_running:
+                    return
+            try:
+                self.drain()
+            except Exception:  # pylint: disable=broad-exception-caught
+                logger.exception('Failed to drain notification outbox')
+            with self._condition:
+                if self._is_running:
+                    self._condition.wait(self._poll_interval)
+
+    def _claim_ready_rows(self, flush: bool) -> list[list[Notification]]:
+        """Leases visible rows, grouped by destination and digest key.
+
+        Rows of notifiers that send different texts to the same destination,
+        e.g. a static reminder and formatted results, are never merged.
+        """
+        now = get_current_utc_time()
+        visible = (
+            Notification.select()
+            .where(
+                Notification.state.in_([PENDING, SENDING])
+                & (Notification.available_at <= now)
+            )
+            .order_by(Notification.id)
+        )
+        groups: dict[tuple[str, str], list[Notification]] = defaultdict(list)
+        for row in visible:
+            digest_key = (
+                self._get_notifier(row.notifier).digest_key(row.destination)
+                if row.destination
+                else row.notifier
+            )
+            groups[row.destination_key, digest_key].append(row)
+        claimed = []
+        for rows in groups.values():
+            if not flush and rows[0].created_at > now - self._window:
+                continue
+            ids = [row.id for row in rows]
+            Notification.update(
+                state=SENDING,
+                locked_by=self._worker_id,
+                available_at=now + self._lease,
+            ).where(
+                Notification.id.in_(ids)
+                & Notification.state.in_([PENDING, SENDING])
+                & (Notification.available_at <= now)
+            ).execute()
+            claimed_rows = list(
+                Notification.select()
+                .where(
+                    Notification.id.in_(ids)
+                    & (Notification.state == SENDING)
+                    & (Notification.locked_by == self._worker_id)
+                )
+                .order_by(Notification.id)
+            )
+            if claimed_rows:
+                claimed.append(claimed_rows)
+        return claimed
+
+    def _get_notifier(self, serialized_notifier: str) -> Notifier:
+        notifier = self._notifiers.get(serialized_notifier)
+        if notifier is None:
+            notifier = self._notifiers[serialized_notifier] = Notifier.from_dict(
+                json.loads(serialized_notifier)
+            )
+        return notifier
+
+    def _deliver(self, rows: list[Notification]) -> int:
+        notifier = self._get_notifier(rows[0].notifier)
+        destination = rows[0].destination
+        if not destination:
+            return sum(self._notify(notifier, row) for row in rows)
+        key = rows[0].destination_key
+        texts = [row.text for row in rows]
+        n_sent = offset = 0
+        for group in group_messages(texts, notifier.MAX_MESSAGE_LENGTH):
+            group_rows = rows[offset : offset + len(group)]
+            time.sleep(max(self._next_send_at.get(key, 0) - time.monotonic(), 0))
+            result = deliver(
+                notifier,
+                destination,
+                DIGEST_SEPARATOR.join(group),
+                self._retry_policy,
+            )
+            self._next_send_at[key] = time.monotonic() + self._min_interval
+            if result.rejected:
+                # Sending the same text again would be rejected again.
+                self._mark_failed(group_rows, result.error, dead=True)
+            elif not result.success:
+                self._mark_failed(rows[offset:], result.error)
+                break
+            else:
+                self._mark_sent(group_rows)
+                n_sent += len(group)
+            offset += len(group)
+        return n_sent
+
+    def _notify(self, notifier: Notifier, row: Notification) -> int:
+        """Delivers through `notify` for notifiers without known destinations."""
+        try:
+            notifier.notify(row.text)
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            logger.exception('%s failed to notify', type(notifier).__name__)
+            self._mark_failed([row], repr(exc))
+            return 0
+        self._mark_sent([row])
+        return 1
+
+    def _mark_sent(self, rows: list[Notification]) -> None:
+        Notification.update(
+            state=SENT, locked_by=None, sent_at=get_current_utc_time()
+        ).where(
+            Notification.id.in_([row.id for row in rows])
+            & (Notification.locked_by == self._worker_id)
+        ).execute()
+
+    def _mark_failed(
+        self, rows: list[Notification], error: str | None, dead: bool = False
+    ) -> None:
+        now = get_current_utc_time()
+        for row in rows:
+            attempts = row.attempts + 1
+            is_dead = dead or attempts >= self._max_attempts
+            Notification.update(
+                state=DEAD if is_dead else PENDING,
+                attempts=attempts,
+                locked_by=None,
+                last_error=error,
+                available_at=now + self._retry_delay * 2 ** (attempts - 1),
+            ).where(
+                (Notification.id == row.id)
+                & (Notification.locked_by == self._worker_id)
+            ).execute()
+            if is_dead:
+                logger.error('Notification %s dead-lettered: %s', row.id, error)
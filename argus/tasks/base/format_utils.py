@@ -1,8 +1,6 @@
 import re
-from typing import Optional
-
-import pandas as pd
-from tabulate import tabulate
+from collections.abc import Sequence
+from typing import Any
 
 emoji_pattern = re.compile(
     '['
@@ -34,21 +32,18 @@ def normalize(text: str) -> str:
     return re.sub(r'\s+', ' ', text).strip()
 
 
-def dataframe_to_str(
-    data: pd.DataFrame,
-    keep_columns: Optional[list[str]] = None,
-    norm_columns: Optional[list[str]] = None,
-    max_col_width: Optional[int] = None,
-    show_index: bool = False,
+def table_to_str(
+    rows: Sequence[Sequence[Any]],
+    headers: Sequence[str],
+    index: Sequence[Any] | None = None,
 ) -> str:
-    if norm_columns:
-        for column in norm_columns:
-            data[column] = data[column].apply(normalize)
+    """Renders rows as a psql-style table with two-decimal floats."""
+    from tabulate import tabulate  # pylint: disable=import-outside-toplevel
+
     return tabulate(
-        data[keep_columns] if keep_columns is not None else data,
-        headers='keys',
+        rows,
+        headers,
         tablefmt='psql',
-        showindex=show_index,
-        maxcolwidths=max_col_width,
         floatfmt='.2f',
+        showindex=index if index is not None else False,
     )
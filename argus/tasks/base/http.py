@@ -0,0 +1,72 @@
+from collections.abc import Callable
+from functools import partial
+from typing import TYPE_CHECKING, Any
+from urllib.parse import urlparse
+
+from argus.tasks.base.usage import RunUsage, current_usage
+
+if TYPE_CHECKING:
+    import requests
+
+
+def _response_size(response: 'requests.Response', stream: bool) -> int:
+    if stream:
+        return int(response.headers.get('Content-Length') or 0)
+    content = response.content
+    # Bytes read from the socket, before decompression.
+    n_bytes = getattr(response.raw, 'tell', lambda: None)()
+    return n_bytes if isinstance(n_bytes, int) and n_bytes > 0 else len(content)
+
+
+def _host(url: str) -> str:
+    return urlparse(url).hostname or url
+
+
+def _count_response(
+    usage: RunUsage, response: 'requests.Response', *_args: Any, **kwargs: Any
+) -> None:
+    usage.add_response(_response_size(response, kwargs.get('stream', False)))
+    if response.status_code >= 500:
+        usage.add_failed_host(_host(response.url))
+
+
+def _request(
+    usage: RunUsage,
+    request: Callable[..., 'requests.Response'],
+    method: str,
+    url: str,
+    *args: Any,
+    **kwargs: Any,
+) -> 'requests.Response':
+    import requests  # pylint: disable=import-outside-toplevel
+
+    try:
+        return request(method, url, *args, **kwargs)
+    except (requests.ConnectionError, requests.Timeout):
+        usage.add_failed_host(_host(url))
+        raise
+
+
+def session() -> 'requests.Session':
+    """Returns a session whose requests count against the current run.
+
+    The run is bound when the session is created, so requests made from
+    other threads are counted as well. Hosts that cannot be reached, time out
+    or answer with a 5xx status are recorded as failed in the run usage.
+    """
+    import requests  # pylint: disable=import-outside-toplevel
+
+    http_session = requests.Session()
+    usage = current_usage()
+    if usage is not None:
+        http_session.hooks['response'].append(partial(_count_response, usage))
+        http_session.request = partial(  # type: ignore[method-assign]
+            _request, usage, http_session.request
+        )
+    return http_session
+
+
+def get(url: str, **kwargs: Any) -> 'requests.Response':
+    """Like `requests.get`, counting the request against the current run."""
+    with session() as http_session:
+        return http_session.get(url, **kwargs)
@@ -0,0 +1,227 @@
+import logging
+import random
+import socket
+import uuid
+from datetime import datetime, timedelta
+from enum import Enum, IntEnum
+
+from argus.tasks.base.clock import SYSTEM_CLOCK, Clock
+from argus.tasks.base.database import Job
+
+logger = logging.getLogger(__name__)
+
+
+class JobState(Enum):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    DEAD = 'dead'
+
+
+ACTIVE_STATES = [JobState.PENDING.value, JobState.RUNNING.value]
+
+
+class Priority(IntEnum):
+    """Priority classes of jobs; higher values are dequeued first."""
+
+    BULK = 0
+    NORMAL = 10
+    CRITICAL = 20
+
+
+def backoff_delay(
+    attempt: int, base: timedelta, maximum: timedelta, jitter: float = 0.5
+) -> timedelta:
+    """Returns the exponential backoff before retry `attempt`, with jitter.
+
+    The delay is reduced by a random fraction of up to `jitter`, so tasks that
+    failed together do not retry together.
+    """
+    delay = min(base * 2 ** max(attempt - 1, 0), maximum)
+    return delay * (1 - jitter * random.random())
+
+
+def min_start_priority(
+    n_running: int, max_workers: int | None, reserved_workers: int = 0
+) -> int | None:
+    """Returns the lowest priority that may start now, or None when busy.
+
+    The last `reserved_workers` of `max_workers` only take critical jobs, so
+    those start on time however many slow jobs are queued. Without
+    `max_workers` every job may start.
+    """
+    if max_workers is None or n_running < max_workers - reserved_workers:
+        return Priority.BULK
+    if n_running < max_workers:
+        return Priority.CRITICAL
+    return None
+
+
+class JobQueue:
+    """SQLite-backed queue between task scheduling and task execution.
+
+    A dequeued job is leased for `visibility_timeout`. If the worker crashes
+    before acking it, the lease expires and the job becomes visible again, so
+    another worker retries it. Failed jobs are retried with exponential backoff
+    until `max_attempts` is reached, after which they are dead-lettered.
+
+    Visible jobs are dequeued by priority, then by deadline, then in the
+    order they became available. Jobs that start after their deadline are
+    logged and reported by `sla_misses`.
+    """
+
+    def __init__(
+        self,
+        visibility_timeout: timedelta = timedelta(minutes=30),
+        retry_delay: timedelta = timedelta(seconds=30),
+        max_retry_delay: timedelta = timedelta(hours=1),
+        max_attempts: int = 3,
+        worker_id: str | None = None,
+        jitter: float = 0.5,
+        clock: Clock | None = None,
+    ) -> None:
+        self._visibility_timeout = visibility_timeout
+        self._retry_delay = retry_delay
+        self._max_retry_delay = max_retry_delay
+        self._jitter = jitter
+        self._max_attempts = max_attempts
+        self._clock = clock if clock else SYSTEM_CLOCK
+        self.worker_id = (
+            worker_id
+            if worker_id is not None
+            else f'{socket.gethostname()}_{uuid.uuid4().hex[:8]}'
+        )
+
+    def enqueue(
+        self,
+        task_id: str,
+        priority: int = 0,
+        available_at: datetime | None = None,
+        deadline: datetime | None = None,
+    ) -> Job | None:
+        """Adds a run of `task_id` unless one is already pending or running."""
+        with Job._meta.database.atomic():  # pylint: disable=protected-access
+            if self.has_active_job(task_id):
+                return None
+            return Job.create(
+                task_id=task_id,
+                priority=priority,
+                deadline=deadline,
+                max_attempts=self._max_attempts,
+                available_at=available_at if available_at else self._clock.utcnow(),
+            )
+
+    def has_active_job(self, task_id: str) -> bool:
+        return (
+            Job.select()
+            .where((Job.task_id == task_id) & (Job.state.in_(ACTIVE_STATES)))
+            .exists()
+        )
+
+    def dequeue(self, min_priority: int | None = None) -> Job | None:
+        """Leases the most urgent visible job, or returns None if there is none.
+
+        With `min_priority` only jobs of at least that priority are considered.
+        """
+        while True:
+            now = self._clock.utcnow()
+            condition = Job.state.in_(ACTIVE_STATES) & (Job.available_at <= now)
+            if min_priority is not None:
+                condition &= Job.priority >= min_priority
+            job = (
+                Job.select()
+                .where(condition)
+                .order_by(
+                    Job.priority.desc(),
+                    Job.deadline.asc(nulls='LAST'),
+                    Job.available_at,
+                    Job.id,
+                )
+                .first()
+            )
+            if job is None:
+                return None
+            if job.state == JobState.RUNNING.value:
+                logger.warning('%s lease expired, retrying job %s', job.task_id, job.id)
+                if job.attempts >= job.max_attempts:
+                    self._dead_letter(job, 'Lease expired')
+                    continue
+            claimed = (
+                Job.update(
+                    state=JobState.RUNNING.value,
+                    attempts=Job.attempts + 1,
+                    locked_by=self.worker_id,
+                    available_at=now + self._visibility_timeout,
+                    started_at=now,
+                )
+                .where(
+                    (Job.id == job.id)
+                    & (Job.state == job.state)
+                    & (Job.available_at == job.available_at)
+                )
+                .execute()
+            )
+            if claimed:
+                if job.deadline is not None and now > job.deadline:
+                    logger.warning(
+                        '%s missed its SLA by %s', job.task_id, now - job.deadline
+                    )
+                return Job.get_by_id(job.id)
+
+    def complete(self, job: Job) -> None:
+        self._release(job, state=JobState.DONE, finished_at=self._clock.utcnow())
+
+    def fail(self, job: Job, error: str) -> None:
+        """Schedules a retry with exponential backoff or dead-letters the job."""
+        if job.attempts >= job.max_attempts:
+            self._dead_letter(job, error)
+            return
+        delay = backoff_delay(
+            job.attempts, self._retry_delay, self._max_retry_delay, self._jitter
+        )
+        logger.info('%s failed, retrying in %s', job.task_id, delay)
+        self._release(
+            job,
+            state=JobState.PENDING,
+            available_at=self._clock.utcnow() + delay,
+            last_error=error,
+        )
+
+    def defer(self, job: Job, available_at: datetime, reason: str) -> None:
+        """Puts a leased job back until `available_at` without using an attempt."""
+        logger.info('%s deferred until %s: %s', job.task_id, available_at, reason)
+        self._release(
+            job,
+            state=JobState.PENDING,
+            available_at=available_at,
+            attempts=Job.attempts - 1,
+            last_error=reason,
+        )
+
+    def dead_letters(self) -> list[Job]:
+        return list(
+            Job.select()
+            .where(Job.state == JobState.DEAD.value)
+            .order_by(Job.finished_at.desc())
+        )
+
+    def sla_misses(self, since: datetime | None = None) -> list[Job]:
+        """Returns the jobs that started after their deadline, latest first."""
+        condition = Job.started_at > Job.deadline
+        if since is not None:
+            condition &= Job.started_at >= since
+        return list(Job.select().where(condition).order_by(Job.started_at.desc()))
+
+    def _dead_letter(self, job: Job, error: str) -> None:
+        logger.error('%s dead-lettered after %d attempts', job.task_id, job.attempts)
+        Job.update(
+            state=JobState.DEAD.value,
+            last_error=error,
+            locked_by=None,
+            finished_at=self._clock.utcnow(),
+        ).where(Job.id == job.id).execute()
+
+    def _release(self, job: Job, state: JobState, **fields) -> None:
+        Job.update(state=state.value, locked_by=None, **fields).where(
+            (Job.id == job.id) & (Job.locked_by == self.worker_id)
+        ).execute()
@@ -0,0 +1,148 @@
+from collections.abc import Collection
+from dataclasses import astuple, dataclass, fields
+from datetime import datetime, timedelta
+from enum import Enum
+from typing import Any
+
+from peewee import SQL, Case, fn
+
+from argus.tasks.base.database import TaskRun, get_current_utc_time
+from argus.tasks.base.format_utils import table_to_str
+from argus.tasks.base.usage import RunUsage
+
+
+class Outcome(Enum):
+    SUCCESS = 'success'
+    FAILURE = 'failure'
+    TIMEOUT = 'timeout'
+
+
+@dataclass(frozen=True, slots=True)
+class TaskUsage:
+    """Resources used by the runs of one task, summed over a period."""
+
+    task_id: str
+    n_runs: int
+    n_failures: int
+    duration: float
+    cpu_time: float
+    n_requests: int
+    bytes_downloaded: int
+    max_peak_rss_delta: int
+
+
+USAGE_ORDERS = [field.name for field in fields(TaskUsage)][1:]
+
+
+def record_run(
+    task_id: str,
+    started_at: datetime,
+    duration: float,
+    outcome: Outcome,
+    usage: RunUsage,
+    run_key: str | None = None,
+    error: str | None = None,
+    logs: str | None = None,
+) -> TaskRun:
+    return TaskRun.create(
+        task_id=task_id,
+        run_key=run_key,
+        outcome=outcome.value,
+        error=error,
+        logs=logs,
+        started_at=started_at,
+        duration=duration,
+        cpu_time=usage.cpu_time,
+        peak_rss_delta=usage.peak_rss_delta,
+        n_requests=usage.n_requests,
+        bytes_downloaded=usage.bytes_downloaded,
+        failed_hosts=','.join(sorted(usage.failed_hosts)) or None,
+    )
+
+
+def get_failed_hosts(run_key: str) -> set[str]:
+    """Returns the hosts that failed during the latest run of `run_key`."""
+    run = (
+        TaskRun.select(TaskRun.failed_hosts)
+        .where(TaskRun.run_key == run_key)
+        .order_by(TaskRun.id.desc())
+        .first()
+    )
+    return set(run.failed_hosts.split(',')) if run and run.failed_hosts else set()
+
+
+def query_runs(
+    task_id: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    outcomes: Collection[Outcome] | None = None,
+    limit: int | None = 100,
+) -> list[TaskRun]:
+    """Returns the latest runs, newest first."""
+    query = TaskRun.select().order_by(TaskRun.started_at.desc())
+    if task_id is not None:
+        query = query.where(TaskRun.task_id == task_id)
+    if since is not None:
+        query = query.where(TaskRun.started_at >= since)
+    if until is not None:
+        query = query.where(TaskRun.started_at < until)
+    if outcomes is not None:
+        query = query.where(
+            TaskRun.outcome.in_([outcome.value for outcome in outcomes])
+        )
+    if limit is not None:
+        query = query.limit(limit)
+    return list(query)
+
+
+def usage_by_task(
+    since: datetime | None = None,
+    order_by: str = 'cpu_time',
+    limit: int | None = None,
+) -> list[TaskUsage]:
+    """Sums the usage of the runs of each task, largest `order_by` first."""
+    if order_by not in USAGE_ORDERS:
+        raise ValueError(f'Unknown order: {order_by}')
+    failed = Case(None, [(TaskRun.outcome != Outcome.SUCCESS.value, 1)], 0)
+    columns = [
+        TaskRun.task_id,
+        fn.COUNT(TaskRun.id).alias('n_runs'),
+        fn.SUM(failed).alias('n_failures'),
+        fn.SUM(TaskRun.duration).alias('duration'),
+        fn.COALESCE(fn.SUM(TaskRun.cpu_time), 0).alias('cpu_time'),
+        fn.SUM(TaskRun.n_requests).alias('n_requests'),
+        fn.SUM(TaskRun.bytes_downloaded).alias('bytes_downloaded'),
+        fn.COALESCE(fn.MAX(TaskRun.peak_rss_delta), 0).alias('max_peak_rss_delta'),
+    ]
+    query = TaskRun.select(*columns).group_by(TaskRun.task_id)
+    if since is not None:
+        query = query.where(TaskRun.started_at >= since)
+    # `order_by` is one of the aliases above, so it is safe to embed.
+    query = query.order_by(SQL(order_by).desc(), TaskRun.task_id)
+    if limit is not None:
+        query = query.limit(limit)
+    rows: Any = query.tuples()
+    return [TaskUsage(*row) for row in rows]
+
+
+def usage_to_str(usages: list[TaskUsage]) -> str:
+    return table_to_str(
+        [astuple(usage) for usage in usages],
+        [
+            'Task',
+            'Runs',
+            'Failures',
+            'Duration s',
+            'CPU s',
+            'Requests',
+            'Downloaded',
+            'Peak RSS delta',
+        ],
+    )
+
+
+def prune_runs(before: datetime | None = None, keep_days: int = 90) -> int:
+    """Deletes runs started before `before`, `keep_days` ago by default."""
+    if before is None:
+        before = get_current_utc_time() - timedelta(days=keep_days)
+    return TaskRun.delete().where(TaskRun.started_at < before).execute()
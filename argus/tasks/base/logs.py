@@ -0,0 +1,128 @@
+import json
+import logging
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from typing import Any
+
+# Fields of the run being executed, e.g. `task_id` and `run_key`.
+_log_context: ContextVar[dict[str, Any]] = ContextVar('log_context')
+
+# Attributes every `LogRecord` has, so the rest were passed with `extra`.
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+CONTEXT_FIELDS = ('task_id', 'run_key')
+
+
+@contextmanager
+def log_context(**fields: Any) -> Iterator[None]:
+    """Adds `fields` to the records logged in this context."""
+    token = _log_context.set(_log_context.get({}) | fields)
+    try:
+        yield
+    finally:
+        _log_context.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    """Sets the fields of the current log context on each record.
+
+    Fields already set, by the thread that logged a record handed over
+    through a queue, are kept.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = _log_context.get({})
+        for name in CONTEXT_FIELDS:
+            if not hasattr(record, name):
+                setattr(record, name, context.get(name))
+        for name, value in context.items():
+            if not hasattr(record, name):
+                setattr(record, name, value)
+        return True
+
+
+def record_to_dict(record: logging.LogRecord) -> dict[str, Any]:
+    data = {
+        'ts': datetime.fromtimestamp(record.created, UTC).isoformat(),
+        'level': record.levelname,
+        'logger': record.name,
+        'message': record.getMessage(),
+        'thread': record.threadName,
+    }
+    data.update(
+        (name, value)
+        for name, value in vars(record).items()
+        if name not in _RECORD_ATTRIBUTES and value is not None
+    )
+    if record.exc_info and not record.exc_text:
+        record.exc_text = logging.Formatter().formatException(record.exc_info)
+    if record.exc_text:
+        data['exception'] = record.exc_text
+    return data
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats each record as one JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(record_to_dict(record), default=str, ensure_ascii=False)
+
+
+@dataclass(slots=True)
+class CapturedLogs:
+    records: list[dict[str, Any]] = field(default_factory=list)
+    n_dropped: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add(self, record: logging.LogRecord, max_records: int) -> None:
+        with self._lock:
+            if len(self.records) < max_records:
+                self.records.append(record_to_dict(record))
+            else:
+                self.n_dropped += 1
+
+    def to_text(self) -> str | None:
+        """Returns the records as JSON lines, or None if nothing was logged."""
+        lines = [json.dumps(record, default=str) for record in self.records]
+        if self.n_dropped:
+            lines.append(json.dumps({'dropped': self.n_dropped}))
+        return '\n'.join(lines) if lines else None
+
+
+_captured_logs: ContextVar[CapturedLogs | None] = ContextVar(
+    'captured_logs', default=None
+)
+
+
+class RunLogCaptureHandler(logging.Handler):
+    """Keeps the records logged by a run, to be stored with its journal entry.
+
+    Records are kept in memory until the run ends; only the first
+    `max_records` of each run are kept.
+    """
+
+    def __init__(self, level: int = logging.INFO, max_records: int = 200) -> None:
+        super().__init__(level)
+        self.max_records = max_records
+
+    def emit(self, record: logging.LogRecord) -> None:
+        captured = _captured_logs.get()
+        if captured is not None:
+            captured.add(record, self.max_records)
+
+
+@contextmanager
+def capture_logs() -> Iterator[CapturedLogs]:
+    """Collects the records logged in this context.
+
+    Records are only collected if a `RunLogCaptureHandler` is installed.
+    """
+    captured = CapturedLogs()
+    token = _captured_logs.set(captured)
+    try:
+        yield captured
+    finally:
+        _captured_logs.reset(token)
@@ -0,0 +1,245 @@
+from array import array
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any
+
+from peewee import EXCLUDED, fn
+
+from argus.tasks.base.database import MetricPoint, MetricRollup
+from argus.tasks.base.results import ResultQuery
+from argus.tasks.base.serializable import Serializable
+
+# (entity, metric, value), e.g. ('https://lilly.bg/...', 'price', 12.5).
+MetricValue = tuple[str, str, float]
+
+HOUR = 'hour'
+DAY = 'day'
+RESOLUTIONS = [HOUR, DAY]
+AGGREGATES = ['mean', 'min', 'max', 'sum', 'count']
+
+# Rows per INSERT, well below SQLite's limit on bound parameters.
+INSERT_BATCH_SIZE = 100
+# Raw points are folded into the rollups as they are stored, so only recent
+# ones are kept; older ranges are read from the rollups.
+RAW_RETENTION = timedelta(days=30)
+
+
+@dataclass(frozen=True)
+class MetricSeries:
+    """Timestamps and values of one metric of one entity.
+
+    Both are NumPy arrays (`datetime64[us]` and `float64`) when NumPy is
+    installed, otherwise a list of datetimes and an `array('d')`.
+    """
+
+    timestamps: Any
+    values: Any
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+def truncate(ts: datetime, resolution: str) -> datetime:
+    if resolution == HOUR:
+        return ts.replace(minute=0, second=0, microsecond=0)
+    if resolution == DAY:
+        return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f'Unknown resolution: {resolution}')
+
+
+def record_metrics(
+    task_id: str,
+    ts: datetime,
+    values: Iterable[MetricValue],
+    raw_retention: timedelta | None = RAW_RETENTION,
+) -> int:
+    """Stores metric points and folds them into the hourly and daily rollups.
+
+    Raw points of the task older than `raw_retention` before `ts` are
+    deleted, as their values live on in the rollups.
+    """
+    points = [
+        {
+            'task_id': task_id,
+            'entity': entity,
+            'metric': metric,
+            'ts': ts,
+            'value': value,
+        }
+        for entity, metric, value in values
+    ]
+    if not points:
+        return 0
+    rollups = [
+        {
+            'task_id': task_id,
+            'entity': point['entity'],
+            'metric': point['metric'],
+            'resolution': resolution,
+            'bucket': truncate(ts, resolution),
+            'count': 1,
+            'total': point['value'],
+            'minimum': point['value'],
+            'maximum': point['value'],
+        }
+        for resolution in RESOLUTIONS
+        for point in points
+    ]
+    with MetricPoint._meta.database.atomic():  # pylint: disable=protected-access
+        for start in range(0, len(points), INSERT_BATCH_SIZE):
+            MetricPoint.insert_many(points[start : start + INSERT_BATCH_SIZE]).execute()
+        for start in range(0, len(rollups), INSERT_BATCH_SIZE):
+            MetricRollup.insert_many(
+                rollups[start : start + INSERT_BATCH_SIZE]
+            ).on_conflict(
+                conflict_target=[
+                    MetricRollup.task_id,
+                    MetricRollup.metric,
+                    MetricRollup.entity,
+                    MetricRollup.resolution,
+                    MetricRollup.bucket,
+                ],
+                update={
+                    MetricRollup.count: MetricRollup.count + 1,
+                    MetricRollup.total: MetricRollup.total + EXCLUDED.total,
+                    MetricRollup.minimum: fn.MIN(
+                        MetricRollup.minimum, EXCLUDED.minimum
+                    ),
+                    MetricRollup.maximum: fn.MAX(
+                        MetricRollup.maximum, EXCLUDED.maximum
+                    ),
+                },
+            ).execute()
+        if raw_retention is not None:
+            prune_points(task_id, ts - raw_retention)
+    return len(points)
+
+
+def prune_points(task_id: str, before: datetime) -> int:
+    """Deletes the raw points of a task recorded before `before`."""
+    return (
+        MetricPoint.delete()
+        .where((MetricPoint.task_id == task_id) & (MetricPoint.ts < before))
+        .execute()
+    )
+
+
+def backfill_metrics(
+    task_id: str,
+    result_type: type[Serializable] = Serializable,
+    batch_size: int = 500,
+) -> int:
+    """Rebuilds the metrics of a task from its stored results."""
+    with MetricPoint._meta.database.atomic():  # pylint: disable=protected-access
+        MetricPoint.delete().where(MetricPoint.task_id == task_id).execute()
+        MetricRollup.delete().where(MetricRollup.task_id == task_id).execute()
+        results = ResultQuery(task_id, batch_size=batch_size).results(result_type)
+        return sum(
+            record_metrics(task_id, created_at, result.metrics())
+            for created_at, result in results
+        )
+
+
+def _select_points(
+    task_id: str,
+    metric: str,
+    entity: str | None,
+    since: datetime | None,
+    until: datetime | None,
+    resolution: str | None,
+    aggregate: str,
+) -> Iterator[tuple[str, str, float]]:
+    """Yields `(entity, ts, value)` ordered by entity and time."""
+    if resolution is None:
+        model: Any = MetricPoint
+        ts: Any = MetricPoint.ts
+        value: Any = MetricPoint.value
+        condition = MetricPoint.metric == metric
+    else:
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f'Unknown resolution: {resolution}')
+        if aggregate not in AGGREGATES:
+            raise ValueError(f'Unknown aggregate: {aggregate}')
+        model = MetricRollup
+        ts = MetricRollup.bucket
+        value = {
+            'mean': MetricRollup.total / MetricRollup.count,
+            'min': MetricRollup.minimum,
+            'max': MetricRollup.maximum,
+            'sum': MetricRollup.total,
+            'count': MetricRollup.count,
+        }[aggregate]
+        condition = (MetricRollup.metric == metric) & (
+            MetricRollup.resolution == resolution
+        )
+    condition &= model.task_id == task_id
+    if entity is not None:
+        condition &= model.entity == entity
+    if since is not None:
+        condition &= ts >= (
+            since if resolution is None else truncate(since, resolution)
+        )
+    if until is not None:
+        condition &= ts < until
+    query = model.select(model.entity, ts, value).where(condition)
+    # Raw rows: timestamps stay as stored text until they are converted in bulk.
+    return iter(model._meta.database.execute(query.order_by(model.entity, ts)))
+
+
+def _to_series(timestamps: list[str], values: array) -> MetricSeries:
+    # numpy is imported on first use to keep it out of task imports.
+    try:
+        import numpy as np  # pylint: disable=import-outside-toplevel
+    except ImportError:  # pragma: no cover
+        return MetricSeries(list(map(MetricPoint.ts.python_value, timestamps)), values)
+    return MetricSeries(
+        np.array(timestamps, dtype='datetime64[us]'),
+        np.frombuffer(values, dtype=np.float64).copy(),
+    )
+
+
+def query_metrics(
+    task_id: str,
+    metric: str,
+    entity: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    resolution: str | None = None,
+    aggregate: str = 'mean',
+) -> dict[str, MetricSeries]:
+    """Returns the time series of a metric for every entity, or just one.
+
+    Without `resolution` the raw points are returned, which are only kept for
+    `RAW_RETENTION`. With `HOUR` or `DAY` each bucket is reduced by
+    `aggregate` from the rollup table, so long ranges are read without
+    touching the raw points.
+    """
+    columns: dict[str, tuple[list[str], array]] = defaultdict(lambda: ([], array('d')))
+    for row_entity, ts, value in _select_points(
+        task_id, metric, entity, since, until, resolution, aggregate
+    ):
+        timestamps, values = columns[row_entity]
+        timestamps.append(ts)
+        values.append(value)
+    return {
+        row_entity: _to_series(timestamps, values)
+        for row_entity, (timestamps, values) in columns.items()
+    }
+
+
+def query_metric(
+    task_id: str,
+    metric: str,
+    entity: str,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    resolution: str | None = None,
+    aggregate: str = 'mean',
+) -> MetricSeries:
+    """Returns the time series of a metric of one entity."""
+    series = query_metrics(
+        task_id, metric, entity, since, until, resolution, aggregate
+    ).get(entity)
+    return series if series is not None else _to_series([], array('d'))
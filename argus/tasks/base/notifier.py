@@ -1,12 +1,15 @@
-import asyncio
+import hashlib
 import logging
 from abc import ABC, abstractmethod
-from typing import Generic
-
-import requests
-from telegram import Bot
+from datetime import timedelta
+from typing import TYPE_CHECKING, Generic
 
+from argus.tasks.base.delivery import RateLimitedError, deliver_all
 from argus.tasks.base.serializable import JsonDict, Serializable, T
+from argus.tasks.base.telegram_bots import telegram_bots
+
+if TYPE_CHECKING:
+    from telegram import Bot
 
 logger = logging.getLogger(__name__)
 
@@ -24,35 +27,75 @@ class SimpleFormatter(DataFormatter[T]):
 
 
 class Notifier(Serializable):
+    MAX_MESSAGE_LENGTH: int | None = None
+
     @abstractmethod
     def notify(self, text: str) -> None:
         """Send a notification with the provided message."""
         pass
 
+    def destinations(self) -> list[str]:
+        """Destinations that `send` can deliver to individually."""
+        return []
+
+    def destination_key(self, destination: str) -> str:
+        """Identifies a destination across notifier instances."""
+        return f'{type(self).__name__}:{destination}'
+
+    def digest_key(self, destination: str) -> str:
+        """Messages with the same digest key may be merged and sent together."""
+        return f'{type(self).__name__}:{self.destination_key(destination)}'
+
+    def send(self, destination: str, text: str) -> None:
+        """Send a message to a single destination.
+
+        Notifiers that cannot address their destinations individually notify
+        all of them.
+        """
+        self.notify(text)
+
 
 class SlackNotifier(Notifier):
     SLACK_MESSAGE_MAX_LENGTH = 4000
+    MAX_MESSAGE_LENGTH = SLACK_MESSAGE_MAX_LENGTH
 
     def __init__(self, slack_hooks: list[str]) -> None:
         self._slack_hooks = slack_hooks
 
     @staticmethod
     def post(text: str, webhook: str) -> None:
+        import requests  # pylint: disable=import-outside-toplevel
+
         payload = {
             'text': text,
             'username': 'Argus',
             'icon_url': 'https://i.ibb.co/y8Ydz0X/argus.png',
         }
-        requests.post(webhook, json=payload, timeout=300)
+        response = requests.post(webhook, json=payload, timeout=30)
+        if response.status_code == 429:
+            raise RateLimitedError(float(response.headers.get('Retry-After', 1)))
+        response.raise_for_status()
 
     def notify(self, text: str) -> None:
-        logger.info('Slack message size: %s', len(text))
+        self._check_length(text)
+        deliver_all(self, text)
+
+    def _check_length(self, text: str) -> None:
         if len(text) >= self.SLACK_MESSAGE_MAX_LENGTH:
             raise ValueError(
                 f'Message exceeds Slack limit of {self.SLACK_MESSAGE_MAX_LENGTH} characters.'
             )
-        for slack_hook in self._slack_hooks:
-            self.post(text, slack_hook)
+
+    def destinations(self) -> list[str]:
+        return self._slack_hooks
+
+    def destination_key(self, destination: str) -> str:
+        return f'slack:{_fingerprint(destination)}'
+
+    def send(self, destination: str, text: str) -> None:
+        logger.info('Slack message size: %s', len(text))
+        self._check_length(text)
+        self.post(text, destination)
 
     def to_dict(self) -> JsonDict:
         return super().to_dict() | {'slack_hooks': self._slack_hooks}
@@ -63,23 +106,40 @@ class SlackNotifier(Notifier):
 
 
 class TelegramNotifier(Notifier):
+    MAX_MESSAGE_LENGTH = 4096
+
     def __init__(self, bot_token: str, chat_ids: list[str]) -> None:
         self._bot_token = bot_token
-        self._telegram_bot = Bot(token=bot_token)
         self._chat_ids = chat_ids
-        self._loop = asyncio.new_event_loop()
 
-    async def send_messages(self, text: str) -> None:
-        for chat_id in self._chat_ids:
-            logger.info(
-                'Telegram message with length %d sent to chat %s', len(text), chat_id
-            )
+    @property
+    def _telegram_bot(self) -> 'Bot':
+        return telegram_bots.get_bot(self._bot_token)
+
+    async def send_message(self, chat_id: str, text: str) -> None:
+        from telegram.error import RetryAfter  # pylint: disable=import-outside-toplevel
+
+        logger.info(
+            'Telegram message with length %d sent to chat %s', len(text), chat_id
+        )
+        try:
             await self._telegram_bot.send_message(
                 chat_id=chat_id, text=text, parse_mode='MarkdownV2'
             )
+        except RetryAfter as exc:
+            raise RateLimitedError(_retry_after_seconds(exc.retry_after)) from exc
 
     def notify(self, text: str) -> None:
-        self._loop.run_until_complete(self.send_messages(text))
+        deliver_all(self, text)
+
+    def destinations(self) -> list[str]:
+        return self._chat_ids
+
+    def destination_key(self, destination: str) -> str:
+        return f'telegram:{_fingerprint(self._bot_token)}:{destination}'
+
+    def send(self, destination: str, text: str) -> None:
+        telegram_bots.run(self.send_message(destination, text))
 
     def to_dict(self) -> JsonDict:
         return super().to_dict() | {
@@ -92,6 +152,17 @@ class TelegramNotifier(Notifier):
         return cls(bot_token=data['bot_token'], chat_ids=data['chat_ids'])
 
 
+def _fingerprint(secret: str) -> str:
+    """Identifies a webhook or bot token without revealing it in keys and logs."""
+    return hashlib.sha1(secret.encode()).hexdigest()[:8]
+
+
+def _retry_after_seconds(retry_after: int | timedelta) -> float:
+    if isinstance(retry_after, timedelta):
+        return retry_after.total_seconds()
+    return float(retry_after)
+
+
 class StaticTelegramNotifier(TelegramNotifier):
     def __init__(self, text: str, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -100,6 +171,12 @@ class StaticTelegramNotifier(TelegramNotifier):
     def notify(self, text: str) -> None:
         return super().notify(self._text)
 
+    def send(self, destination: str, text: str) -> None:
+        return super().send(destination, self._text)
+
+    def digest_key(self, destination: str) -> str:
+        return f'{super().digest_key(destination)}:{_fingerprint(self._text)}'
+
     def to_dict(self) -> JsonDict:
         return super().to_dict() | {
             'text': self._text,
@@ -0,0 +1,229 @@
+import json
+import re
+import sqlite3
+from collections.abc import Iterator, Mapping, Sequence
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any
+
+from peewee import Database
+
+from argus.tasks.base.database import TaskResult
+from argus.tasks.base.serializable import JsonDict, Serializable
+
+_PATH_PART = re.compile(r'\.(?:"([^"]*)"|([^.\[]+))|\[(\d+)\]')
+_json1_support: dict[Database, bool] = {}
+
+
+@dataclass(frozen=True, slots=True)
+class ResultRow:
+    id: int
+    created_at: datetime
+    # The stored payload, the projected fields or, with `items`, one item.
+    data: Any
+
+
+def field_paths(fields: Sequence[str] | Mapping[str, str]) -> dict[str, str]:
+    """Maps field names to JSON paths; plain names are top-level keys."""
+    if isinstance(fields, Mapping):
+        return dict(fields)
+    return {
+        field: field if field.startswith('$') else f'$."{field}"' for field in fields
+    }
+
+
+def extract_path(data: Any, path: str) -> Any:
+    """Resolves a JSON path like `json_extract`, returning None when missing."""
+    if path == '$':
+        return data
+    position = 1
+    for match in _PATH_PART.finditer(path, 1):
+        if match.start() != position:
+            raise ValueError(f'Unsupported JSON path: {path}')
+        position = match.end()
+        key, index = match.group(1) or match.group(2), match.group(3)
+        if index is not None:
+            if not isinstance(data, list) or int(index) >= len(data):
+                return None
+            data = data[int(index)]
+        elif isinstance(data, dict) and key in data:
+            data = data[key]
+        else:
+            return None
+    if position != len(path):
+        raise ValueError(f'Unsupported JSON path: {path}')
+    return data
+
+
+def _database() -> Database:
+    return TaskResult._meta.database  # pylint: disable=protected-access
+
+
+def _table_name() -> str:
+    return TaskResult._meta.table_name  # pylint: disable=protected-access
+
+
+def has_json1(database: Database) -> bool:
+    support = _json1_support.get(database)
+    if support is None:
+        try:
+            database.execute_sql("SELECT json_extract('[1]', '$[0]')")
+            support = True
+        except sqlite3.OperationalError:
+            support = False
+        _json1_support[database] = support
+    return support
+
+
+class ResultQuery:
+    """Streams stored results of a task in `created_at` order.
+
+    Rows are fetched in batches of `batch_size` using keyset pagination on
+    `(created_at, id)`, so any number of results is scanned in constant memory
+    and no read transaction is held while the caller processes a batch.
+
+    `fields` projects the payload to the given top-level keys or, as a mapping,
+    to names bound to JSON paths (`$.models[0].n_likes`). `items` expands the
+    array at a JSON path and yields one row per item, with `fields` relative
+    to the item. Both are evaluated by SQLite's JSON1 functions when they are
+    available, so unused parts of the payload never reach Python.
+    """
+
+    def __init__(
+        self,
+        task_id: str,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        fields: Sequence[str] | Mapping[str, str] | None = None,
+        items: str | None = None,
+        newest_first: bool = False,
+        limit: int | None = None,
+        batch_size: int = 500,
+    ) -> None:
+        self.task_id = task_id
+        self.since = since
+        self.until = until
+        self.paths = field_paths(fields) if fields is not None else None
+        self.items = items
+        self.newest_first = newest_first
+        self.limit = limit
+        self.batch_size = batch_size
+
+    def __iter__(self) -> Iterator[ResultRow]:
+        use_json1 = has_json1(_database())
+        python_value = TaskResult.created_at.python_value
+        remaining = self.limit
+        after: tuple[str, int] | None = None
+        while remaining is None or remaining > 0:
+            size = (
+                self.batch_size
+                if remaining is None
+                else min(self.batch_size, remaining)
+            )
+            sql, params = self._batch_sql(use_json1, after, size)
+            batch = _database().execute_sql(sql, params).fetchall()
+            for row_id, created_at, value in batch:
+                created = python_value(created_at)
+                for data in self._row_data(use_json1, value):
+                    yield ResultRow(row_id, created, data)
+            if len(batch) < size:
+                return
+            if remaining is not None:
+                remaining -= size
+            after = batch[-1][1], batch[-1][0]
+
+    def count(self) -> int:
+        conditions, params = self._conditions(None)
+        sql = f'SELECT COUNT(*) FROM "{_table_name()}" WHERE {conditions}'
+        return _database().execute_sql(sql, params).fetchone()[0]
+
+    def results(
+        self, result_type: type[Serializable] = Serializable
+    ) -> Iterator[tuple[datetime, Serializable]]:
+        """Yields `(created_at, result)` with each payload deserialized.
+
+        Pass `result_type` for payloads stored without `__class__`.
+        """
+        for row in ResultQuery(
+            self.task_id,
+            self.since,
+            self.until,
+            newest_first=self.newest_first,
+            limit=self.limit,
+            batch_size=self.batch_size,
+        ):
+            yield row.created_at, result_type.from_dict(row.data)
+
+    def _conditions(self, after: tuple[str, int] | None) -> tuple[str, list[Any]]:
+        conditions = ['task_id = ?']
+        params: list[Any] = [self.task_id]
+        # Formatted like sqlite3 stores datetimes, so text comparison works.
+        if self.since is not None:
+            conditions.append('created_at >= ?')
+            params.append(self.since.isoformat(' '))
+        if self.until is not None:
+            conditions.append('created_at < ?')
+            params.append(self.until.isoformat(' '))
+        if after is not None:
+            conditions.append(
+                f'(created_at, id) {"<" if self.newest_first else ">"} (?, ?)'
+            )
+            params += after
+        return ' AND '.join(conditions), params
+
+    def _batch_sql(
+        self, use_json1: bool, after: tuple[str, int] | None, size: int
+    ) -> tuple[str, list[Any]]:
+        conditions, params = self._conditions(after)
+        order = 'DESC' if self.newest_first else 'ASC'
+        value = 'result'
+        if use_json1 and self.items is not None and self.paths is not None:
+            item_value = self._json_array('e.value', self.paths)
+            value = (
+                f'(SELECT json_group_array(json({item_value})) FROM '
+                f'(SELECT value FROM json_each(result, ?) ORDER BY key) AS e)'
+            )
+            params = [*self.paths.values(), self.items] + params
+        elif use_json1 and self.items is not None:
+            value = 'json_quote(json_extract(result, ?))'
+            params = [self.items] + params
+        elif use_json1 and self.paths is not None:
+            value = self._json_array('result', self.paths)
+            params = [*self.paths.values()] + params
+        sql = (
+            f'SELECT id, created_at, {value} FROM "{_table_name()}" '
+            f'WHERE {conditions} '
+            f'ORDER BY created_at {order}, id {order} LIMIT {int(size)}'
+        )
+        return sql, params
+
+    @staticmethod
+    def _json_array(source: str, paths: dict[str, str]) -> str:
+        arguments = ', '.join(f'json_extract({source}, ?)' for _ in paths)
+        return f'json_array({arguments})'
+
+    def _row_data(self, use_json1: bool, value: str) -> Iterator[Any]:
+        if not use_json1:
+            yield from self._extract(json.loads(value))
+            return
+        data = json.loads(value)
+        if self.items is None:
+            yield dict(zip(self.paths, data)) if self.paths is not None else data
+        elif self.paths is not None:
+            for item in data:
+                yield dict(zip(self.paths, item))
+        elif isinstance(data, list):
+            yield from data
+
+    def _extract(self, payload: JsonDict) -> Iterator[Any]:
+        """Evaluates `items` and `fields` in Python when JSON1 is missing."""
+        items = [payload] if self.items is None else extract_path(payload, self.items)
+        if self.items is not None and not isinstance(items, list):
+            return
+        for item in items:
+            if self.paths is None:
+                yield item
+            else:
+                yield {
+                    name: extract_path(item, path) for name, path in self.paths.items()
+                }
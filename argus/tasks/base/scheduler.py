@@ -1,11 +1,16 @@
+import hashlib
+import json
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import datetime, timedelta
 from enum import Enum
+from typing import cast
 from zoneinfo import ZoneInfo
 
 from dateutil.relativedelta import relativedelta
 
+from argus.tasks.base.clock import SYSTEM_CLOCK, Clock
 from argus.tasks.base.serializable import JsonDict, Serializable
+from argus.tasks.base.state import load_state, save_state
 
 
 class Frequency(Enum):
@@ -27,6 +32,13 @@ FREQ_TO_DELTA = {
     Frequency.ANUALLY: relativedelta(year=1),
     Frequency.LIST: None,
 }
+# Frequencies with a fixed step, which lets a stale schedule catch up at once.
+FREQ_TO_STEP = {
+    Frequency.MINUTELY: timedelta(minutes=1),
+    Frequency.HOURLY: timedelta(hours=1),
+    Frequency.DAILY: timedelta(days=1),
+    Frequency.WEEKLY: timedelta(weeks=1),
+}
 
 
 class Day(Enum):
@@ -107,20 +119,24 @@ class Scheduler(Serializable):
         self,
         runtimes: list[datetime],
         config: SchedulerConfig | None = None,
+        clock: Clock | None = None,
     ) -> None:
         self.config = config if config else SchedulerConfig()
-        self._delta = FREQ_TO_DELTA[self.config.frequency]
+        self.clock = clock if clock else SYSTEM_CLOCK
+        # A fixed step is much cheaper to add than a relativedelta.
+        self._delta = FREQ_TO_STEP.get(
+            self.config.frequency, FREQ_TO_DELTA[self.config.frequency]
+        )
         self._runtimes = sorted(
             runtime.replace(tzinfo=ZoneInfo(self.config.timezone))
             for runtime in runtimes
         )
         self.next_runtime: datetime | None = self._runtimes[0]
         if self.config.adjust_to_current_time:
-            while self.next_runtime is not None and self.next_runtime < self.now():
-                self.set_next_runtime()
+            self._skip_past_runtimes()
 
     def now(self) -> datetime:
-        return datetime.now(ZoneInfo(self.config.timezone))
+        return self.clock.now(ZoneInfo(self.config.timezone))
 
     def _is_valid_runtime(self, runtime: datetime | None) -> bool:
         if runtime is None:
@@ -155,9 +171,33 @@ class Scheduler(Serializable):
                 self.next_runtime = self.next_runtime + self._delta
             raise RuntimeError('Infinite loop')
 
+    def _skip_past_runtimes(self) -> None:
+        """Moves to the first runtime that is not in the past."""
+        now = self.now()
+        step = FREQ_TO_STEP.get(self.config.frequency)
+        if step and self.next_runtime is not None and self.next_runtime < now:
+            n_steps = -((self.next_runtime - now) // step)
+            self.next_runtime += (n_steps - 1) * step
+            self.set_next_runtime()
+        while self.next_runtime is not None and self.next_runtime < now:
+            self.set_next_runtime()
+
     def is_due(self) -> bool:
         return self.next_runtime is not None and self.now() >= self.next_runtime
 
+    def attach(self, task_id: str) -> None:
+        """Called by the task that owns the scheduler."""
+
+    def replica(self, clock: Clock) -> 'Scheduler':
+        """Returns a copy of the schedule that runs on `clock`.
+
+        The copy is not attached to a task, so it keeps no state.
+        """
+        return Scheduler(self._runtimes, self.config, clock)
+
+    def observe(self, result: Serializable) -> None:
+        """Called with every result of the task; fixed schedules ignore it."""
+
     def __repr__(self) -> str:
         return (
             self.next_runtime.strftime('%Y-%m-%d %H:%M:%S')
@@ -173,7 +213,166 @@ class Scheduler(Serializable):
 
     @classmethod
     def from_dict(cls, data: JsonDict) -> 'Scheduler':
+        if data.get('__class__', 'Scheduler') != 'Scheduler':
+            return cast(Scheduler, Serializable.from_dict(data))
         return Scheduler(
             runtimes=[datetime.fromisoformat(runtime) for runtime in data['runtimes']],
             config=SchedulerConfig.from_dict(data['config']),
         )
+
+
+def result_hash(result: Serializable) -> str:
+    payload = json.dumps(result.to_dict(), sort_keys=True)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+class AdaptiveScheduler(Scheduler):
+    """Polls as often as the results of the task change.
+
+    Each result is hashed and compared with the previous one. The mean time
+    between changes is tracked as an EWMA, and the next run is scheduled
+    after `poll_fraction` of it, or of the time since the last change when
+    that is longer. The interval stays within `min_interval` and
+    `max_interval`. A source that changes hourly is polled every 15 minutes
+    by default, and one that has been quiet for days is polled daily.
+
+    The estimate is kept in the state store under the owning task, so it
+    survives restarts.
+    """
+
+    def __init__(
+        self,
+        min_interval: timedelta = timedelta(minutes=15),
+        max_interval: timedelta = timedelta(days=1),
+        poll_fraction: float = 0.25,
+        alpha: float = 0.3,
+        timezone: str = 'Europe/Sofia',
+        clock: Clock | None = None,
+    ) -> None:
+        clock = clock if clock else SYSTEM_CLOCK
+        super().__init__(
+            runtimes=[clock.now(ZoneInfo(timezone))],
+            config=SchedulerConfig(timezone=timezone, adjust_to_current_time=False),
+            clock=clock,
+        )
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.poll_fraction = poll_fraction
+        self.alpha = alpha
+        self.state_key: str | None = None
+        self.last_hash: str | None = None
+        self.first_run_at: datetime | None = None
+        self.last_change_at: datetime | None = None
+        self.mean_change_interval: float | None = None
+        self._loaded = False
+
+    @property
+    def interval(self) -> timedelta:
+        now = self.now()
+        since = self.last_change_at or self.first_run_at
+        estimate = max(
+            self.mean_change_interval or 0.0,
+            (now - since).total_seconds() if since else 0.0,
+        )
+        interval = timedelta(seconds=estimate * self.poll_fraction)
+        return min(max(interval, self.min_interval), self.max_interval)
+
+    def attach(self, task_id: str) -> None:
+        self.state_key = f'{task_id}:schedule'
+        self._loaded = False
+
+    def replica(self, clock: Clock) -> 'AdaptiveScheduler':
+        """Returns a copy that polls at the current interval, on `clock`.
+
+        Future changes of the results are unknown, so the copy keeps the
+        interval fixed.
+        """
+        if not self._loaded:
+            self._load()
+        interval = self.interval
+        return AdaptiveScheduler(
+            min_interval=interval,
+            max_interval=interval,
+            poll_fraction=self.poll_fraction,
+            alpha=self.alpha,
+            timezone=self.config.timezone,
+            clock=clock,
+        )
+
+    def _load(self) -> None:
+        state = load_state(self.state_key) if self.state_key else None
+        self._loaded = True
+        if state is None:
+            return
+        self.last_hash = state['last_hash']
+        self.mean_change_interval = state['mean_change_interval']
+        self.first_run_at, self.last_change_at, self.next_runtime = (
+            datetime.fromisoformat(state[key]) if state[key] else None
+            for key in ('first_run_at', 'last_change_at', 'next_runtime')
+        )
+
+    def _save(self) -> None:
+        if self.state_key is None:
+            return
+        save_state(
+            self.state_key,
+            {
+                'last_hash': self.last_hash,
+                'mean_change_interval': self.mean_change_interval,
+                'first_run_at': self.first_run_at and self.first_run_at.isoformat(),
+                'last_change_at': (
+                    self.last_change_at and self.last_change_at.isoformat()
+                ),
+                'next_runtime': self.next_runtime and self.next_runtime.isoformat(),
+            },
+        )
+
+    def is_due(self) -> bool:
+        if not self._loaded:
+            self._load()
+        return super().is_due()
+
+    def set_next_runtime(self) -> None:
+        # Reloaded, as the results may be observed by another process.
+        self._load()
+        self.next_runtime = self.now() + self.interval
+        self._save()
+
+    def observe(self, result: Serializable) -> None:
+        self._load()
+        now = self.now()
+        new_hash = result_hash(result)
+        if self.first_run_at is None:
+            self.first_run_at = now
+        elif new_hash != self.last_hash:
+            if self.last_change_at is not None:
+                elapsed = (now - self.last_change_at).total_seconds()
+                self.mean_change_interval = (
+                    elapsed
+                    if self.mean_change_interval is None
+                    else self.alpha * elapsed
+                    + (1 - self.alpha) * self.mean_change_interval
+                )
+            self.last_change_at = now
+        self.last_hash = new_hash
+        self._save()
+
+    def to_dict(self) -> JsonDict:
+        return {
+            '__class__': type(self).__name__,
+            'min_interval': self.min_interval.total_seconds(),
+            'max_interval': self.max_interval.total_seconds(),
+            'poll_fraction': self.poll_fraction,
+            'alpha': self.alpha,
+            'timezone': self.config.timezone,
+        }
+
+    @classmethod
+    def from_dict(cls, data: JsonDict) -> 'AdaptiveScheduler':
+        return AdaptiveScheduler(
+            min_interval=timedelta(seconds=data['min_interval']),
+            max_interval=timedelta(seconds=data['max_interval']),
+            poll_fraction=data['poll_fraction'],
+            alpha=data['alpha'],
+            timezone=data['timezone'],
+        )
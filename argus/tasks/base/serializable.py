@@ -1,6 +1,11 @@
-from typing import Any, TypeVar, cast
+import dataclasses
+import importlib
+import operator
+from collections.abc import Callable, Iterator
+from typing import Any, ClassVar, Generic, TypeVar, cast
 
 T = TypeVar('T', bound='Serializable')
+R = TypeVar('R')
 
 
 JsonValue = str | int | float | bool | list['JsonValue'] | dict[str, 'JsonValue']
@@ -10,27 +15,165 @@ JsonType = JsonValue | JsonArray | JsonDict
 
 
 class Serializable:
-    cls_registry: dict[str, type['Serializable']] = {}
+    cls_registry: ClassVar[dict[str, type['Serializable']]] = {}
+    # Class name -> module path, imported on the first lookup of the class.
+    module_registry: ClassVar[dict[str, str]] = {}
 
     def __init_subclass__(cls, **kwargs):
         """Auto-register subclasses for correct deserialization."""
         super().__init_subclass__(**kwargs)
         cls.cls_registry[cls.__name__] = cls
 
+    @classmethod
+    def register_modules(cls, module_registry: dict[str, str]) -> None:
+        """Registers classes that are imported only when first deserialized."""
+        cls.module_registry.update(module_registry)
+
+    @classmethod
+    def lookup(cls, class_name: str) -> type['Serializable'] | None:
+        subclass = cls.cls_registry.get(class_name)
+        if subclass is None and class_name in cls.module_registry:
+            importlib.import_module(cls.module_registry[class_name])
+            subclass = cls.cls_registry.get(class_name)
+        return subclass
+
     def to_dict(self) -> JsonDict:
         return {'__class__': self.__class__.__name__}
 
+    def metrics(self) -> Iterator[tuple[str, str, float]]:
+        """Yields `(entity, metric, value)` for numbers worth tracking over time."""
+        return iter(())
+
     @staticmethod
     def serialize_parameters(data: JsonDict) -> JsonDict:
         return data
 
     @classmethod
     def from_dict(cls: type[T], data: JsonDict) -> T:
-        class_name = data.pop('__class__', None)
+        """Builds the class named by `__class__`; `data` is left untouched."""
+        class_name = data.get('__class__')
         if class_name is None:
             return cls(**cls.serialize_parameters(data))
-        subclass = cls.cls_registry.get(class_name)
+        subclass = cls.lookup(class_name)
         if subclass is None:
             raise ValueError(f'Unknown class: {class_name}')
         subclass_type = cast(type[T], subclass)
-        return subclass_type.from_dict(data)
+        if _overrides_from_dict(subclass_type):
+            return subclass_type.from_dict(data)
+        fields = {key: value for key, value in data.items() if key != '__class__'}
+        return subclass_type(**subclass_type.serialize_parameters(fields))
+
+
+def _overrides_from_dict(cls: type[Serializable]) -> bool:
+    from_dict: Any = cls.from_dict
+    return from_dict.__func__ is not _BASE_FROM_DICT
+
+
+_BASE_FROM_DICT = vars(Serializable)['from_dict'].__func__
+
+
+def _field_reader(field: dataclasses.Field) -> Callable[[JsonDict], Any]:
+    """Returns a function reading the field from a JSON dict, with its default."""
+    name = field.name
+    if field.default is not dataclasses.MISSING:
+        default = field.default
+        return lambda data: data.get(name, default)
+    if field.default_factory is not dataclasses.MISSING:
+        factory = field.default_factory
+        return lambda data: data[name] if name in data else factory()
+    return operator.itemgetter(name)
+
+
+class RecordCodec(Generic[R]):
+    """Converts a flat dataclass to and from its JSON dict.
+
+    The conversion functions are built once per dataclass, so encoding does
+    not go through `dataclasses.asdict` and decoding sets the fields directly
+    instead of going through the (frozen) `__init__`. Field values are not
+    copied.
+    """
+
+    def __init__(self, record_type: type[R]) -> None:
+        fields = dataclasses.fields(record_type)  # type: ignore[arg-type]
+        names = tuple(field.name for field in fields)
+        readers = [(field.name, _field_reader(field)) for field in fields]
+        if len(names) > 1:
+            get_values = operator.attrgetter(*names)
+
+            def encode(record: R) -> JsonDict:
+                return dict(zip(names, get_values(record)))
+
+        else:
+
+            def encode(record: R) -> JsonDict:
+                return {name: getattr(record, name) for name in names}
+
+        if hasattr(record_type, '__post_init__'):
+
+            def decode(data: JsonDict) -> R:
+                return record_type(**{name: read(data) for name, read in readers})
+
+        elif '__slots__' in vars(record_type):
+            setters = [
+                (vars(record_type)[name].__set__, read) for name, read in readers
+            ]
+
+            def decode(data: JsonDict) -> R:
+                record = object.__new__(record_type)
+                for set_value, read in setters:
+                    set_value(record, read(data))
+                return record
+
+        else:
+
+            def decode(data: JsonDict) -> R:
+                record = object.__new__(record_type)
+                vars(record).update((name, read(data)) for name, read in readers)
+                return record
+
+        self.encode: Callable[[R], JsonDict] = encode
+        self.decode: Callable[[JsonDict], R] = decode
+
+
+_record_codecs: dict[type, RecordCodec] = {}
+
+
+def record_codec(record_type: type[R]) -> RecordCodec[R]:
+    codec = _record_codecs.get(record_type)
+    if codec is None:
+        codec = _record_codecs[record_type] = RecordCodec(record_type)
+    return codec
+
+
+class RecordList(list[R], Serializable):
+    """A list of flat dataclass records stored under `ITEMS_KEY`.
+
+    Set `WITH_CLASS_NAME` when the payload has to carry `__class__`, so that
+    `Serializable.from_dict` can rebuild it without knowing its type.
+    """
+
+    ITEM_TYPE: type[R]
+    ITEMS_KEY: str
+    WITH_CLASS_NAME = False
+    # Record field naming the entity, and the numeric fields tracked per entity.
+    METRIC_KEY: str | None = None
+    METRIC_FIELDS: tuple[str, ...] = ()
+
+    def to_dict(self) -> JsonDict:
+        data = super().to_dict() if self.WITH_CLASS_NAME else {}
+        data[self.ITEMS_KEY] = list(map(record_codec(self.ITEM_TYPE).encode, self))
+        return data
+
+    @classmethod
+    def from_dict(cls, data: JsonDict) -> 'RecordList[R]':
+        return cls(map(record_codec(cls.ITEM_TYPE).decode, data[cls.ITEMS_KEY]))
+
+    def metrics(self) -> Iterator[tuple[str, str, float]]:
+        if self.METRIC_KEY is None:
+            return
+        for record in self:
+            entity = getattr(record, self.METRIC_KEY)
+            for field in self.METRIC_FIELDS:
+                value = getattr(record, field)
+                if value is not None:
+                    yield entity, field, float(value)
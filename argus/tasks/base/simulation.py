@@ -0,0 +1,295 @@
+import heapq
+import json
+import logging
+from collections import Counter, defaultdict
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass, field
+from datetime import UTC, datetime, timedelta
+from itertools import pairwise
+from typing import Any
+from zoneinfo import ZoneInfo
+
+from argus.tasks.base.clock import VirtualClock
+from argus.tasks.base.database import Job, RunningTask
+from argus.tasks.base.format_utils import table_to_str
+from argus.tasks.base.job_queue import JobState, min_start_priority
+from argus.tasks.base.scheduler import Day
+from argus.tasks.base.task import Task
+
+logger = logging.getLogger(__name__)
+
+# Assumed duration of tasks that never finished a run.
+DEFAULT_DURATION = 60.0
+
+# Events at the same moment: runs finish before new runs are due.
+_FINISH, _DUE = 0, 1
+
+
+@dataclass(frozen=True, slots=True)
+class SimulatedRun:
+    task_id: str
+    due_at: datetime
+    started_at: datetime
+    finished_at: datetime
+    deadline: datetime | None = None
+
+    @property
+    def wait(self) -> timedelta:
+        return self.started_at - self.due_at
+
+    @property
+    def missed_sla(self) -> bool:
+        return self.deadline is not None and self.started_at > self.deadline
+
+
+@dataclass(slots=True)
+class _HourLoad:
+    n_runs: int = 0
+    peak: int = 0
+    busy_seconds: float = 0.0
+    n_hours: int = 0
+
+
+@dataclass(slots=True)
+class LoadReport:
+    """Runs of a simulation and the load they put on the workers.
+
+    The load is broken down by weekday and hour in `timezone`, which answers
+    questions like how many runs overlap at 09:00 on Mondays.
+    """
+
+    start: datetime
+    end: datetime
+    runs: list[SimulatedRun]
+    # Runs that were due while the previous run of the task was still active.
+    n_coalesced: Counter[str] = field(default_factory=Counter)
+    timezone: str = 'Europe/Sofia'
+
+    def concurrency(self) -> list[tuple[datetime, int]]:
+        """Returns the number of active runs after each change."""
+        changes = sorted(
+            [(run.finished_at, -1) for run in self.runs]
+            + [(run.started_at, 1) for run in self.runs]
+        )
+        levels: list[tuple[datetime, int]] = []
+        level = 0
+        for moment, change in changes:
+            level += change
+            if levels and levels[-1][0] == moment:
+                levels[-1] = (moment, level)
+            else:
+                levels.append((moment, level))
+        return levels
+
+    @property
+    def peak_concurrency(self) -> int:
+        return max((level for _moment, level in self.concurrency()), default=0)
+
+    @property
+    def peak_at(self) -> datetime | None:
+        levels = self.concurrency()
+        if not levels:
+            return None
+        return max(levels, key=lambda item: item[1])[0]
+
+    @property
+    def max_wait(self) -> timedelta:
+        return max((run.wait for run in self.runs), default=timedelta())
+
+    @property
+    def n_sla_misses(self) -> int:
+        return sum(run.missed_sla for run in self.runs)
+
+    def load_by_hour(self) -> dict[tuple[Day, int], _HourLoad]:
+        """Returns runs started, peak and mean concurrency per weekday and hour."""
+        zone = ZoneInfo(self.timezone)
+        loads: dict[tuple[Day, int], _HourLoad] = defaultdict(_HourLoad)
+
+        def bucket(moment: datetime) -> tuple[Day, int]:
+            local = moment.astimezone(zone)
+            return Day(local.weekday()), local.hour
+
+        hour = self.start.replace(minute=0, second=0, microsecond=0)
+        while hour < self.end:
+            loads[bucket(hour)].n_hours += 1
+            hour += timedelta(hours=1)
+        for run in self.runs:
+            loads[bucket(run.started_at)].n_runs += 1
+        levels = self.concurrency()
+        for (moment, level), (next_moment, _level) in pairwise(levels):
+            while level and moment < next_moment:
+                hour_start = moment.replace(minute=0, second=0, microsecond=0)
+                until = min(hour_start + timedelta(hours=1), next_moment)
+                load = loads[bucket(moment)]
+                load.peak = max(load.peak, level)
+                load.busy_seconds += level * (until - moment).total_seconds()
+                moment = until
+        return dict(loads)
+
+    def to_str(self, top: int | None = None) -> str:
+        """Renders the summary and the load table, busiest hours first."""
+        loads = sorted(
+            self.load_by_hour().items(),
+            key=lambda item: (-item[1].peak, -item[1].busy_seconds),
+        )
+        rows = [
+            [
+                day.name.capitalize(),
+                f'{hour:02d}:00',
+                load.n_runs,
+                load.peak,
+                load.busy_seconds / (3600 * load.n_hours) if load.n_hours else 0.0,
+            ]
+            for (day, hour), load in loads[:top]
+            if load.n_runs or load.peak
+        ]
+        lines = [
+            f'Simulated {self.start:%Y-%m-%d %H:%M} - {self.end:%Y-%m-%d %H:%M}',
+            f'Runs: {len(self.runs)}, coalesced: {sum(self.n_coalesced.values())}',
+            f'Peak concurrency: {self.peak_concurrency} at {self.peak_at}',
+            f'Longest wait for a worker: {self.max_wait}',
+            f'SLA misses: {self.n_sla_misses}',
+        ]
+        if rows:
+            lines.append(
+                table_to_str(rows, ['Day', 'Hour', 'Runs', 'Peak', 'Mean load'])
+            )
+        return '\n'.join(lines)
+
+
+@dataclass(order=True, slots=True)
+class _Pending:
+    sort_key: tuple[Any, ...]
+    task_id: str = field(compare=False)
+    due_at: datetime = field(compare=False)
+    priority: int = field(compare=False)
+    deadline: datetime | None = field(compare=False)
+
+
+def recorded_durations(task_ids: Sequence[str] | None = None) -> dict[str, float]:
+    """Returns the mean duration in seconds of the finished runs of each task."""
+    query = Job.select(Job.task_id, Job.started_at, Job.finished_at).where(
+        (Job.state == JobState.DONE.value)
+        & Job.started_at.is_null(False)
+        & Job.finished_at.is_null(False)
+    )
+    if task_ids is not None:
+        query = query.where(Job.task_id.in_(list(task_ids)))
+    rows: Any = query.tuples()
+    totals: dict[str, float] = defaultdict(float)
+    counts: Counter[str] = Counter()
+    for task_id, started_at, finished_at in rows:
+        totals[task_id] += (finished_at - started_at).total_seconds()
+        counts[task_id] += 1
+    return {task_id: totals[task_id] / counts[task_id] for task_id in counts}
+
+
+def load_running_tasks() -> list[Task]:
+    return [
+        Task.from_dict(json.loads(running_task.serialized_data))
+        for running_task in RunningTask.select()
+    ]
+
+
+def simulate(
+    tasks: Sequence[Task],
+    start: datetime,
+    horizon: timedelta,
+    durations: Mapping[str, float] | None = None,
+    default_duration: float = DEFAULT_DURATION,
+    max_workers: int | None = None,
+    reserved_workers: int = 0,
+    timezone: str = 'Europe/Sofia',
+) -> LoadReport:
+    """Replays the schedules of `tasks` from `start` for `horizon` on a virtual clock.
+
+    Runs are dispatched like `TaskManager` does: a task has at most one
+    active job, jobs start by priority and deadline, and the last
+    `reserved_workers` of `max_workers` only start critical jobs. Without
+    `max_workers` every run starts when due, so the report shows the
+    workers needed to never queue. Each run takes the duration recorded for
+    its task, or `default_duration` seconds. Tasks without a schedule are
+    skipped. Adaptive schedules poll at their current interval.
+    """
+    # Times are compared in UTC: aware times in the same zone compare by wall
+    # clock, which is ambiguous around DST changes.
+    start = (start if start.tzinfo else start.replace(tzinfo=UTC)).astimezone(UTC)
+    end = start + horizon
+    clock = VirtualClock(start)
+    durations = durations if durations is not None else {}
+    by_id = {task.task_id: task for task in tasks if task.scheduler}
+    schedulers = {
+        task_id: task.scheduler.replica(clock)
+        for task_id, task in by_id.items()
+        if task.scheduler
+    }
+    events: list[tuple[datetime, int, int, str]] = []
+    sequence = 0
+
+    def push(moment: datetime, kind: int, task_id: str) -> None:
+        nonlocal sequence
+        heapq.heappush(events, (moment.astimezone(UTC), kind, sequence, task_id))
+        sequence += 1
+
+    for task_id, scheduler in schedulers.items():
+        if scheduler.next_runtime is not None and scheduler.next_runtime < end:
+            push(max(scheduler.next_runtime, start), _DUE, task_id)
+
+    runs: list[SimulatedRun] = []
+    n_coalesced: Counter[str] = Counter()
+    active: set[str] = set()
+    pending: list[_Pending] = []
+    n_running = 0
+
+    def dispatch(now: datetime) -> None:
+        nonlocal n_running
+        while (
+            min_priority := min_start_priority(n_running, max_workers, reserved_workers)
+        ) is not None:
+            job = next(
+                (job for job in sorted(pending) if job.priority >= min_priority), None
+            )
+            if job is None:
+                return
+            pending.remove(job)
+            finished_at = now + timedelta(
+                seconds=durations.get(job.task_id, default_duration)
+            )
+            runs.append(
+                SimulatedRun(job.task_id, job.due_at, now, finished_at, job.deadline)
+            )
+            n_running += 1
+            push(finished_at, _FINISH, job.task_id)
+
+    while events:
+        moment, kind, _sequence, task_id = heapq.heappop(events)
+        if kind == _DUE and moment >= end:
+            continue
+        clock.set(moment)
+        now = clock.now()
+        if kind == _FINISH:
+            n_running -= 1
+            active.discard(task_id)
+        else:
+            task = by_id[task_id]
+            scheduler = schedulers[task_id]
+            if task_id in active:
+                n_coalesced[task_id] += 1
+            else:
+                active.add(task_id)
+                deadline = now + task.sla if task.sla is not None else None
+                pending.append(
+                    _Pending(
+                        (-task.priority, deadline is None, deadline, sequence),
+                        task_id,
+                        now,
+                        task.priority,
+                        deadline,
+                    )
+                )
+            scheduler.set_next_runtime()
+            if scheduler.next_runtime is not None and scheduler.next_runtime < end:
+                push(max(scheduler.next_runtime, now), _DUE, task_id)
+        dispatch(now)
+    logger.info('Simulated %d runs of %d tasks', len(runs), len(schedulers))
+    return LoadReport(start, end, runs, n_coalesced, timezone)
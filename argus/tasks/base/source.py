@@ -0,0 +1,98 @@
+import threading
+import time
+from collections.abc import Callable, Hashable
+from dataclasses import dataclass, field
+from typing import Any, Generic, TypeVar
+
+T = TypeVar('T')
+
+# Long enough to cover tasks scheduled together, short enough to stay fresh.
+SOURCE_TTL = 120.0
+
+
+@dataclass(slots=True)
+class _Flight:
+    done: threading.Event = field(default_factory=threading.Event)
+    value: Any = None
+    error: BaseException | None = None
+    expires_at: float = float('inf')
+
+
+class SharedSource(Generic[T]):
+    """Fetches and parses a source once for every task reading it.
+
+    Calls with the same arguments (the URL parameters of the source) share a
+    single load: callers arriving while it is in flight wait for its result,
+    and callers arriving within `ttl` seconds after it completed reuse it.
+    Failures are passed to the waiting callers but never cached. The shared
+    value must not be mutated, so loaders return tuples of frozen records.
+
+    Loads are only shared within a process, so tasks reading a shared source
+    are not isolated in worker processes.
+    """
+
+    def __init__(
+        self,
+        load: Callable[..., T],
+        ttl: float = SOURCE_TTL,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._load = load
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._flights: dict[Hashable, _Flight] = {}
+        self.n_loads = 0
+
+    def __call__(self, *args: Hashable, **kwargs: Hashable) -> T:
+        key = (args, tuple(sorted(kwargs.items())))
+        with self._lock:
+            now = self._clock()
+            for expired in [
+                other
+                for other, flight in self._flights.items()
+                if flight.expires_at <= now
+            ]:
+                del self._flights[expired]
+            flight = self._flights.get(key)
+            leader = flight is None
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+                self.n_loads += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+        try:
+            flight.value = self._load(*args, **kwargs)
+            flight.expires_at = self._clock() + self.ttl
+        except BaseException as error:
+            flight.error = error
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+            raise
+        finally:
+            flight.done.set()
+        return flight.value
+
+    def clear(self) -> None:
+        """Forgets completed loads; loads in flight still finish."""
+        with self._lock:
+            self._flights = {
+                key: flight
+                for key, flight in self._flights.items()
+                if not flight.done.is_set()
+            }
+
+
+def shared_source(
+    ttl: float = SOURCE_TTL,
+) -> Callable[[Callable[..., T]], SharedSource[T]]:
+    """Decorates a fetch-and-parse function as a `SharedSource`."""
+
+    def decorator(load: Callable[..., T]) -> SharedSource[T]:
+        return SharedSource(load, ttl)
+
+    return decorator
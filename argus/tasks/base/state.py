@@ -0,0 +1,62 @@
+import json
+from collections.abc import Iterable
+from typing import Any
+
+from argus.tasks.base.database import KeyValue, get_current_utc_time
+from argus.tasks.base.serializable import JsonDict
+
+# Rows per statement, well below SQLite's limit on bound parameters.
+BATCH_SIZE = 100
+
+
+def load_state(key: str) -> JsonDict | None:
+    """Returns the JSON state stored under `key`, if any."""
+    entry = KeyValue.get_or_none(KeyValue.key == key)
+    return json.loads(entry.value) if entry else None
+
+
+def load_states(keys: Iterable[str]) -> dict[str, JsonDict]:
+    """Returns the states stored under `keys`, omitting the missing ones."""
+    keys = list(keys)
+    states = {}
+    for start in range(0, len(keys), BATCH_SIZE):
+        rows: Any = (
+            KeyValue.select(KeyValue.key, KeyValue.value)
+            .where(KeyValue.key.in_(keys[start : start + BATCH_SIZE]))
+            .tuples()
+        )
+        for key, value in rows:
+            states[key] = json.loads(value)
+    return states
+
+
+def save_state(key: str, value: JsonDict) -> None:
+    KeyValue.insert(
+        key=key, value=json.dumps(value), updated_at=get_current_utc_time()
+    ).on_conflict_replace().execute()
+
+
+def save_states(values: dict[str, JsonDict]) -> None:
+    now = get_current_utc_time()
+    rows = [
+        {'key': key, 'value': json.dumps(value), 'updated_at': now}
+        for key, value in values.items()
+    ]
+    with KeyValue._meta.database.atomic():  # pylint: disable=protected-access
+        for start in range(0, len(rows), BATCH_SIZE):
+            KeyValue.insert_many(
+                rows[start : start + BATCH_SIZE]
+            ).on_conflict_replace().execute()
+
+
+def delete_state(key: str) -> None:
+    KeyValue.delete().where(KeyValue.key == key).execute()
+
+
+def delete_states_before(prefix: str, before: str) -> int:
+    """Deletes the states under `prefix` whose key sorts before `prefix + before`."""
+    return (
+        KeyValue.delete()
+        .where(KeyValue.key.startswith(prefix) & (KeyValue.key < prefix + before))
+        .execute()
+    )
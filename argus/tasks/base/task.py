@@ -1,36 +1,98 @@
 import json
 import logging
+import threading
 import time
 import uuid
 from abc import ABC, abstractmethod
-from typing import Generic
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import UTC, datetime, timedelta
+from functools import partial
+from typing import Any, Generic
 
-from argus.tasks.base.database import RunningTask, TaskResult
+from argus.tasks.base.circuit_breaker import CircuitBreaker, CircuitBreakerRegistry
+from argus.tasks.base.clock import SYSTEM_CLOCK, Clock
+from argus.tasks.base.database import (
+    Job,
+    RunningTask,
+    TaskResult,
+    get_current_utc_time,
+)
+from argus.tasks.base.dispatcher import NotificationDispatcher
+from argus.tasks.base.job_queue import (
+    JobQueue,
+    Priority,
+    backoff_delay,
+    min_start_priority,
+)
+from argus.tasks.base.journal import Outcome, get_failed_hosts, record_run
+from argus.tasks.base.logs import capture_logs, log_context
+from argus.tasks.base.metrics import record_metrics
 from argus.tasks.base.notifier import DataFormatter, Notifier
+from argus.tasks.base.results import ResultQuery
 from argus.tasks.base.scheduler import Scheduler
 from argus.tasks.base.serializable import JsonDict, Serializable, T, cast
+from argus.tasks.base.telegram_bots import telegram_bots
+from argus.tasks.base.usage import RunUsage, measure
+from argus.tasks.base.workers import (
+    ProcessWorkerPool,
+    TaskTimeoutError,
+    run_with_timeout,
+)
 
 logger = logging.getLogger(__name__)
 
+# Seconds before a job deferred by a half-open circuit is tried again.
+CIRCUIT_RECHECK = 60
+
 
 def camel_to_snake(s: str) -> str:
     return ''.join('_' + c.lower() if c.isupper() else c for c in s).lstrip('_')
 
 
 class Task(Serializable, ABC, Generic[T]):
+    # Defaults of the priority class and the allowed lateness of a run.
+    PRIORITY = Priority.NORMAL
+    SLA: timedelta | None = None
+    # Defaults of the wall-clock limit of a run in seconds and whether the
+    # task manager runs it in a worker process.
+    TIMEOUT: float | None = 900
+    ISOLATED = False
+    # Hosts the task fetches from, each guarded by a circuit breaker.
+    SOURCES: tuple[str, ...] = ()
+    # Backoff of `run_if_due` after a failed run.
+    RETRY_DELAY = timedelta(seconds=30)
+    MAX_RETRY_DELAY = timedelta(hours=1)
+
     def __init__(
         self,
         task_id: str | None = None,
         scheduler: Scheduler | None = None,
         formatter: DataFormatter | None = None,
         notifier: Notifier | None = None,
+        priority: Priority | None = None,
+        sla: timedelta | None = None,
+        timeout: float | None = None,
+        isolated: bool | None = None,
+        clock: Clock | None = None,
     ) -> None:
         self._scheduler = scheduler if scheduler else None
+        self.priority = priority if priority is not None else self.PRIORITY
+        self.sla = sla if sla is not None else self.SLA
+        self.timeout = timeout if timeout is not None else self.TIMEOUT
+        self.isolated = isolated if isolated is not None else self.ISOLATED
+        self._n_failures = 0
+        self._retry_at: float | None = None
         self._formatter = formatter
         self._notifier = notifier
+        self.use_outbox = False
+        # Times retries and deadlines; the task manager sets its own.
+        self.clock = clock if clock else SYSTEM_CLOCK
+        self._last_result: tuple[int, T] | None = None
         self.task_id = (
             task_id if task_id is not None else self.generate_unique_task_name()
         )
+        if self._scheduler:
+            self._scheduler.attach(self.task_id)
 
     @classmethod
     def generate_unique_task_name(cls) -> str:
@@ -42,22 +104,46 @@ class Task(Serializable, ABC, Generic[T]):
         """Runs the task and returns the result."""
         pass
 
-    def save_result(self, result: T) -> None:
-        """Stores the result in the database."""
+    def save_result(self, result: T, run_key: str | None = None) -> TaskResult:
+        """Stores the result and the metrics extracted from it."""
         serialized_result = json.dumps(result.to_dict())
-        TaskResult.create(task_id=self.task_id, result=serialized_result)
+        with TaskResult._meta.database.atomic():  # pylint: disable=protected-access
+            entry = TaskResult.create(
+                task_id=self.task_id, result=serialized_result, run_key=run_key
+            )
+            record_metrics(self.task_id, entry.created_at, result.metrics())
+        return entry
 
-    def get_last_result(self) -> T | None:
-        """Retrieve a result in the database."""
-        entry = (
+    def _get_last_entry(self) -> TaskResult | None:
+        return (
             TaskResult.select()
             .where(TaskResult.task_id == self.task_id)
             .order_by(TaskResult.created_at.desc())
             .first()
         )
-        return (
-            cast(T, Serializable.from_dict(json.loads(entry.result))) if entry else None
-        )
+
+    def get_last_payload(self) -> JsonDict | None:
+        """Retrieve the last stored result without deserializing it."""
+        entry = self._get_last_entry()
+        return json.loads(entry.result) if entry else None
+
+    def get_last_result(self) -> T | None:
+        """Retrieve a result in the database.
+
+        Stored results never change, so the last one is only deserialized again
+        once a newer result has been saved.
+        """
+        entry = self._get_last_entry()
+        if entry is None:
+            return None
+        if self._last_result is None or self._last_result[0] != entry.id:
+            result = cast(T, Serializable.from_dict(json.loads(entry.result)))
+            self._last_result = (entry.id, result)
+        return self._last_result[1]
+
+    def query_results(self, **kwargs: Any) -> ResultQuery:
+        """Streams stored results of this task, see `ResultQuery`."""
+        return ResultQuery(self.task_id, **kwargs)
 
     def notify_result(self, result: T) -> None:
         """Notifies using the notifier if available."""
@@ -67,18 +153,133 @@ class Task(Serializable, ABC, Generic[T]):
     def _should_notify(self, result: T) -> bool:
         return True
 
-    def run_if_due(self) -> None:
-        """Runs the task if it is due, handles scheduling, storing, and notifying."""
-        if not self._scheduler or self._scheduler.is_due():
+    @property
+    def scheduler(self) -> Scheduler | None:
+        return self._scheduler
+
+    def is_due(self) -> bool:
+        return not self._scheduler or self._scheduler.is_due()
+
+    def get_deadline(self) -> datetime | None:
+        """Returns the latest start of the due run that meets the SLA."""
+        if self.sla is None:
+            return None
+        runtime = self._scheduler.next_runtime if self._scheduler else None
+        if runtime is None:
+            return self.clock.utcnow() + self.sla
+        return runtime.astimezone(UTC).replace(tzinfo=None) + self.sla
+
+    def seconds_until_due(self) -> float | None:
+        if self._scheduler is None or self._scheduler.next_runtime is None:
+            return None
+        return (self._scheduler.next_runtime - self._scheduler.now()).total_seconds()
+
+    def schedule_next_run(self) -> None:
+        if self._scheduler:
+            self._scheduler.set_next_runtime()
+
+    def execute(self, run_key: str | None = None, timeout: float | None = None) -> T:
+        """Runs the task, stores the result and notifies if needed.
+
+        With `use_outbox` the notification is written to the outbox in the same
+        transaction as the result. `run_key` identifies the run, so retrying
+        the same run does not notify twice. A run that takes longer than
+        `timeout` seconds raises `TaskTimeoutError` and its result is dropped.
+        Every run is recorded in the run journal with the resources it used
+        and the records it logged.
+        """
+        with (
+            log_context(task_id=self.task_id, run_key=run_key),
+            capture_logs() as logs,
+        ):
             logger.info('%s running', self.task_id)
-            result = self.run()
-            should_notify = self._should_notify(result)
-            self.save_result(result)
+            usage = RunUsage()
+            started_at = get_current_utc_time()
+            started = time.monotonic()
+            outcome, error = Outcome.FAILURE, None
+            try:
+                result = (
+                    measure(usage, self.run)
+                    if timeout is None
+                    else run_with_timeout(partial(measure, usage, self.run), timeout)
+                )
+                self._store_result(result, run_key)
+                outcome = Outcome.SUCCESS
+            except Exception as exc:
+                if isinstance(exc, TaskTimeoutError):
+                    outcome = Outcome.TIMEOUT
+                error = repr(exc)
+                raise
+            finally:
+                record_run(
+                    self.task_id,
+                    started_at,
+                    time.monotonic() - started,
+                    outcome,
+                    usage,
+                    run_key,
+                    error,
+                    logs.to_text(),
+                )
+        return result
+
+    def _store_result(self, result: T, run_key: str | None) -> None:
+        if (
+            run_key
+            and TaskResult.select().where(TaskResult.run_key == run_key).exists()
+        ):
+            logger.info('%s result of %s is already stored', self.task_id, run_key)
+            return
+        if self._scheduler:
+            self._scheduler.observe(result)
+        should_notify = self._should_notify(result)
+        if not self.use_outbox:
+            self.save_result(result, run_key)
             if should_notify:
                 self.notify_result(result)
-            if self._scheduler:
-                self._scheduler.set_next_runtime()
-            logger.info('%s finished. Next run time: %s', self.task_id, self._scheduler)
+            return
+        text = (
+            self._formatter.format(result)
+            if should_notify and self._notifier and self._formatter
+            else None
+        )
+        with TaskResult._meta.database.atomic():  # pylint: disable=protected-access
+            entry = self.save_result(result, run_key)
+            if self._notifier and text is not None:
+                NotificationDispatcher.enqueue(
+                    self.task_id,
+                    self._notifier,
+                    text,
+                    run_key if run_key else f'result:{entry.id}',
+                )
+
+    def sources(self) -> set[str]:
+        return set(self.SOURCES)
+
+    def run_if_due(self) -> None:
+        """Runs the task if it is due, handles scheduling, storing, and notifying.
+
+        A failed run is logged and retried with backoff, independently of the
+        schedule, which only advances once a run succeeds.
+        """
+        if not self.is_due() or (
+            self._retry_at is not None and self.clock.monotonic() < self._retry_at
+        ):
+            return
+        try:
+            self.execute()
+        except Exception:  # pylint: disable=broad-exception-caught
+            self._n_failures += 1
+            delay = backoff_delay(
+                self._n_failures, self.RETRY_DELAY, self.MAX_RETRY_DELAY
+            )
+            self._retry_at = self.clock.monotonic() + delay.total_seconds()
+            logger.exception('%s failed, retrying in %s', self.task_id, delay)
+            return
+        self._n_failures = 0
+        self._retry_at = None
+        self.schedule_next_run()
+        logger.info('%s finished. Next run time: %s', self.task_id, self._scheduler)
 
     @staticmethod
     def serialize_parameters(data: JsonDict) -> JsonDict:
@@ -95,6 +296,14 @@ class Task(Serializable, ABC, Generic[T]):
             'notifier': (
                 Notifier.from_dict(data['notifier']) if data['notifier'] else None
             ),
+            'priority': (
+                Priority(data['priority']) if data.get('priority') is not None else None
+            ),
+            'sla': (
+                timedelta(seconds=data['sla']) if data.get('sla') is not None else None
+            ),
+            'timeout': data.get('timeout'),
+            'isolated': data.get('isolated'),
         }
 
     def to_dict(self) -> JsonDict:
@@ -104,6 +313,10 @@ class Task(Serializable, ABC, Generic[T]):
             'scheduler': self._scheduler.to_dict() if self._scheduler else None,
             'notifier': self._notifier.to_dict() if self._notifier else None,
             'formatter': self._formatter.to_dict() if self._formatter else None,
+            'priority': self.priority.value,
+            'sla': self.sla.total_seconds() if self.sla is not None else None,
+            'timeout': self.timeout,
+            'isolated': self.isolated,
         }
 
     def __repr__(self) -> str:
@@ -112,17 +325,61 @@ class Task(Serializable, ABC, Generic[T]):
 
 class ChangeDetectingTask(Task[T], ABC):
     def _should_notify(self, result: T) -> bool:
-        return result != self.get_last_result()
+        # Comparing payloads avoids rebuilding the previous result.
+        payload = self.get_last_payload()
+        return payload is None or result.to_dict() != payload
 
 
 class TaskManager:
-    def __init__(self, run_delay: int = 30) -> None:
+    def __init__(
+        self,
+        run_delay: int = 30,
+        job_queue: JobQueue | None = None,
+        dispatcher: NotificationDispatcher | None = None,
+        schedule: bool = True,
+        execute: bool = True,
+        max_workers: int = 1,
+        reserved_workers: int = 0,
+        process_pool: ProcessWorkerPool | None = None,
+        source_breakers: CircuitBreakerRegistry | None = None,
+        clock: Clock | None = None,
+    ) -> None:
+        if not 0 <= reserved_workers < max_workers:
+            raise ValueError('reserved_workers must be below max_workers')
+        self._clock = clock if clock else SYSTEM_CLOCK
         self._tasks: list[Task] = []
         self._run_delay = run_delay
         self._is_running = True
+        self._job_queue = job_queue if job_queue else JobQueue(clock=self._clock)
+        self._dispatcher = dispatcher if dispatcher else NotificationDispatcher()
+        self._schedule = schedule
+        self._execute = execute
         self._tasks = []
+        self._tasks_by_id: dict[str, Task] = {}
+        self._serialized_tasks: dict[str, str] = {}
         self._last_updated = None
         self._n_running_tasks = 0
+        self._max_workers = max_workers
+        self._reserved_workers = reserved_workers
+        self._executor = (
+            ThreadPoolExecutor(max_workers, thread_name_prefix='worker')
+            if max_workers > 1
+            else None
+        )
+        self._process_pool = process_pool if process_pool else ProcessWorkerPool()
+        self._source_breakers = (
+            source_breakers
+            if source_breakers
+            else CircuitBreakerRegistry(
+                failure_threshold=3,
+                reset_timeout=600,
+                state_prefix='circuit:',
+                clock=self._clock,
+            )
+        )
+        self._n_running_jobs = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
 
     def _check_for_updates(self):
         latest_update = (
@@ -144,21 +401,157 @@ class TaskManager:
         return updated
 
     def _load_running_tasks(self) -> None:
-        """Fetch and deserialize active tasks from the database."""
-        tasks = list(RunningTask.select().order_by())
-        self._tasks = [
-            Task.from_dict(json.loads(task.serialized_data)) for task in tasks
-        ]
+        """Fetch active tasks, deserializing only new or changed ones."""
+        running_tasks = list(RunningTask.select().order_by())
+        tasks = []
+        serialized_tasks = {}
+        for running_task in running_tasks:
+            task = self._tasks_by_id.get(running_task.task_id)
+            if (
+                task is None
+                or self._serialized_tasks.get(running_task.task_id)
+                != running_task.serialized_data
+            ):
+                task = Task.from_dict(json.loads(running_task.serialized_data))
+                task.use_outbox = True
+                task.clock = self._clock
+            tasks.append(task)
+            serialized_tasks[task.task_id] = running_task.serialized_data
+        self._tasks = tasks
+        self._tasks_by_id = {task.task_id: task for task in self._tasks}
+        self._serialized_tasks = serialized_tasks
         logger.info('New tasks: %s', self._tasks)
 
+    def schedule_due_tasks(self) -> None:
+        """Enqueues a job for every due task and advances its schedule."""
+        for task in self._tasks:
+            if task.is_due():
+                if self._job_queue.enqueue(
+                    task.task_id,
+                    priority=task.priority,
+                    deadline=task.get_deadline(),
+                ):
+                    logger.info('%s enqueued', task.task_id)
+                task.schedule_next_run()
+
+    def _min_priority(self) -> int | None:
+        """Returns the lowest priority that may start now, or None when busy."""
+        with self._lock:
+            n_running = self._n_running_jobs
+        return min_start_priority(n_running, self._max_workers, self._reserved_workers)
+
+    def process_jobs(self) -> None:
+        """Starts queued jobs until no job is visible or every worker is busy.
+
+        With a single worker the jobs are executed in the calling thread.
+        """
+        while (min_priority := self._min_priority()) is not None:
+            job = self._job_queue.dequeue(min_priority=min_priority)
+            if job is None:
+                return
+            task = self._tasks_by_id.get(job.task_id)
+            if task is None:
+                self._job_queue.fail(job, f'Unknown task: {job.task_id}')
+                continue
+            if self._executor is None:
+                self._execute_job(task, job)
+                continue
+            with self._lock:
+                self._n_running_jobs += 1
+            self._executor.submit(self._execute_job, task, job).add_done_callback(
+                self._job_done
+            )
+
+    def _open_source(self, breakers: dict[str, CircuitBreaker]) -> str | None:
+        """Returns a source whose circuit is open, or None if all may be called."""
+        allowed: list[CircuitBreaker] = []
+        for source, breaker in breakers.items():
+            if not breaker.allow():
+                for other in allowed:
+                    other.cancel_trial()
+                return source
+            allowed.append(breaker)
+        return None
+
+    def _execute_job(self, task: Task, job: Job) -> None:
+        """Executes a job, in a worker process if the task is isolated.
+
+        Jobs of tasks whose sources are failing are deferred until the
+        circuit of the source lets a trial call through. A failed run only
+        counts against the sources that failed at the HTTP layer during it,
+        so bugs and run timeouts do not open circuits.
+        """
+        breakers = {
+            source: self._source_breakers.get(source)
+            for source in sorted(task.sources())
+        }
+        source = self._open_source(breakers)
+        if source is not None:
+            retry_at = max(
+                breakers[source].retry_at or 0.0, self._clock.time() + CIRCUIT_RECHECK
+            )
+            self._job_queue.defer(
+                job,
+                datetime.fromtimestamp(retry_at, UTC).replace(tzinfo=None),
+                f'Circuit open for {source}',
+            )
+            return
+        run_key = f'job:{job.id}'
+        try:
+            if task.isolated:
+                self._process_pool.execute(task, run_key, task.timeout)
+            else:
+                task.execute(run_key=run_key, timeout=task.timeout)
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            logger.exception('%s failed', task.task_id)
+            failed_hosts = get_failed_hosts(run_key)
+            for source, breaker in breakers.items():
+                if source in failed_hosts:
+                    breaker.record_failure()
+                else:
+                    breaker.cancel_trial()
+            self._job_queue.fail(job, repr(exc))
+        else:
+            for breaker in breakers.values():
+                breaker.record_success()
+            self._job_queue.complete(job)
+            logger.info('%s finished', task)
+
+    def _job_done(self, _future: Future) -> None:
+        with self._lock:
+            self._n_running_jobs -= 1
+        self._wakeup.set()
+
+    def _sleep_time(self) -> float:
+        """Returns the seconds until the next scheduled run, at most `run_delay`."""
+        delays = [
+            delay
+            for task in (self._tasks if self._schedule else [])
+            if (delay := task.seconds_until_due()) is not None
+        ]
+        return max(min([self._run_delay, *delays]), 0.0)
+
     def run(self):
         logger.info('Task Manager started')
-        while self._is_running:
-            if self._check_for_updates():
-                logger.info('Tasks updated, reloading...')
-                self._load_running_tasks()
+        if self._execute:
+            self._dispatcher.start()
+        try:
+            while self._is_running:
+                if self._check_for_updates():
+                    logger.info('Tasks updated, reloading...')
+                    self._load_running_tasks()
 
-            for task in self._tasks:
-                task.run_if_due()
+                if self._schedule:
+                    self.schedule_due_tasks()
+                if self._execute:
+                    self.process_jobs()
 
-            time.sleep(self._run_delay)
+                self._clock.wait(self._wakeup, self._sleep_time())
+                self._wakeup.clear()
+        finally:
+            if self._execute:
+                self._dispatcher.stop()
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+            self._process_pool.shutdown()
+            telegram_bots.shutdown()
@@ -0,0 +1,84 @@
+import asyncio
+import logging
+import threading
+from collections.abc import Coroutine
+from typing import TYPE_CHECKING, Any, TypeVar
+
+if TYPE_CHECKING:
+    from telegram import Bot
+    from telegram.request import HTTPXRequest
+
+logger = logging.getLogger(__name__)
+
+R = TypeVar('R')
+
+
+class TelegramBotRegistry:
+    """Process-wide Telegram bots, one per token, sharing one event loop.
+
+    The loop runs in a daemon thread started on first use, so notifiers can
+    submit coroutines from any thread. Each bot keeps a single connection pool
+    that is reused by every notifier with the same token.
+    """
+
+    def __init__(self, connection_pool_size: int = 8) -> None:
+        self._connection_pool_size = connection_pool_size
+        self._bots: dict[str, Bot] = {}
+        self._requests: list[HTTPXRequest] = []
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def get_bot(self, bot_token: str) -> 'Bot':
+        # pylint: disable=import-outside-toplevel
+        from telegram import Bot
+        from telegram.request import HTTPXRequest
+
+        with self._lock:
+            bot = self._bots.get(bot_token)
+            if bot is None:
+                request = HTTPXRequest(connection_pool_size=self._connection_pool_size)
+                get_updates_request = HTTPXRequest()
+                self._requests += [request, get_updates_request]
+                bot = self._bots[bot_token] = Bot(
+                    token=bot_token,
+                    request=request,
+                    get_updates_request=get_updates_request,
+                )
+            return bot
+
+    def run(self, coroutine: Coroutine[Any, Any, R]) -> R:
+        """Runs the coroutine on the shared loop and waits for its result."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._get_loop()).result()
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever, name='telegram-loop', daemon=True
+                )
+                self._thread.start()
+            return self._loop
+
+    def shutdown(self) -> None:
+        """Closes every bot connection pool and stops the shared loop."""
+        with self._lock:
+            requests = self._requests
+            self._bots.clear()
+            self._requests = []
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None or thread is None:
+            return
+        for request in requests:
+            try:
+                asyncio.run_coroutine_threadsafe(request.shutdown(), loop).result()
+            except Exception:  # pylint: disable=broad-exception-caught
+                logger.exception('Failed to shut down Telegram connection pool')
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+
+telegram_bots = TelegramBotRegistry()
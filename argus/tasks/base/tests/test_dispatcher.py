@@ -0,0 +1,325 @@
+# pylint: disable=W0212
+import json
+import os
+import tempfile
+from datetime import timedelta
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+import requests
+from peewee import SqliteDatabase
+
+from argus.tasks.base.circuit_breaker import CircuitBreaker, CircuitState
+from argus.tasks.base.database import (
+    MODELS,
+    Delivery,
+    Notification,
+    TaskResult,
+    get_current_utc_time,
+)
+from argus.tasks.base.delivery import (
+    RateLimitedError,
+    RetryPolicy,
+    deliver,
+    deliver_all,
+    destination_breakers,
+)
+from argus.tasks.base.dispatcher import (
+    DEAD,
+    SENDING,
+    SENT,
+    NotificationDispatcher,
+    pack_messages,
+    split_message,
+)
+from argus.tasks.base.notifier import (
+    Notifier,
+    SimpleFormatter,
+    SlackNotifier,
+    StaticTelegramNotifier,
+    TelegramNotifier,
+)
+from argus.tasks.base.serializable import JsonDict
+from argus.tasks.todo import TodoTask
+
+
+class _RecordingNotifier(Notifier):
+    MAX_MESSAGE_LENGTH = 20
+
+    def __init__(
+        self,
+        destinations: list[str],
+        rate_limited: int = 0,
+        failing: bool = False,
+        rejecting: bool = False,
+    ) -> None:
+        self._destinations = destinations
+        self._rate_limited = rate_limited
+        self._failing = failing
+        self._rejecting = rejecting
+        self.sent: list[tuple[str, str]] = []
+
+    def notify(self, text: str) -> None:
+        for destination in self._destinations:
+            self.send(destination, text)
+
+    def destinations(self) -> list[str]:
+        return self._destinations
+
+    def send(self, destination: str, text: str) -> None:
+        if self._rate_limited:
+            self._rate_limited -= 1
+            raise RateLimitedError(0)
+        if self._failing:
+            raise ConnectionError(destination)
+        if self._rejecting:
+            raise ValueError(text)
+        self.sent.append((destination, text))
+
+    def to_dict(self) -> JsonDict:
+        return super().to_dict() | {
+            'destinations': self._destinations,
+            'rate_limited': self._rate_limited,
+            'failing': self._failing,
+            'rejecting': self._rejecting,
+        }
+
+    @classmethod
+    def from_dict(cls, data: JsonDict) -> '_RecordingNotifier':
+        return cls(
+            data['destinations'],
+            data['rate_limited'],
+            data['failing'],
+            data['rejecting'],
+        )
+
+
+class _NotifyOnlyNotifier(Notifier):
+    def __init__(self) -> None:
+        self.texts: list[str] = []
+
+    def notify(self, text: str) -> None:
+        self.texts.append(text)
+
+
+class _StaticRecordingNotifier(_RecordingNotifier):
+    """Sends the same text whatever it is notified with."""
+
+    def send(self, destination: str, text: str) -> None:
+        super().send(destination, 'static')
+
+    def digest_key(self, destination: str) -> str:
+        return f'{super().digest_key(destination)}:static'
+
+
+def _dispatcher(*notifiers: Notifier, **kwargs) -> NotificationDispatcher:
+    """Creates a dispatcher that sends through the given notifier instances."""
+    dispatcher = NotificationDispatcher(**kwargs)
+    for notifier in notifiers:
+        serialized_notifier = json.dumps(notifier.to_dict(), sort_keys=True)
+        dispatcher._notifiers[serialized_notifier] = notifier
+    return dispatcher
+
+
+class _FileDatabaseTestCase(TestCase):
+    """Notifications are sent from worker threads, so tests need a file DB."""
+
+    def setUp(self) -> None:
+        handle, self.db_path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+        self.test_db = SqliteDatabase(self.db_path)
+        self.test_db.bind(MODELS)
+        self.test_db.connect()
+        self.test_db.create_tables(MODELS)
+
+    def tearDown(self) -> None:
+        self.test_db.close()
+        os.remove(self.db_path)
+
+
+class TestPackMessages(TestCase):
+    def test_pack_respects_limit(self) -> None:
+        self.assertEqual(
+            pack_messages(['aaaa', 'bbbb', 'cccc'], 11, separator='\n'),
+            ['aaaa\nbbbb', 'cccc'],
+        )
+
+    def test_oversized_message_is_kept_whole(self) -> None:
+        self.assertEqual(pack_messages(['a', 'b' * 30], 10), ['a', 'b' * 30])
+
+    def test_split_message(self) -> None:
+        self.assertEqual(split_message('aaa\nbbb\ncc', 8), ['aaa', 'bbb\ncc'])
+        self.assertEqual(split_message('a' * 7, 4), ['aaa', 'aaa', 'a'])
+        self.assertEqual(split_message('', 4), [''])
+        self.assertEqual(split_message('a' * 7, None), ['a' * 7])
+
+    def test_no_limit(self) -> None:
+        self.assertEqual(pack_messages(['a', 'b'], None, separator=' '), ['a b'])
+        self.assertEqual(pack_messages([], None), [])
+
+
+class TestNotificationDispatcher(_FileDatabaseTestCase):
+    def test_messages_are_coalesced_per_destination(self) -> None:
+        both, first = (
+            _RecordingNotifier(['chat1', 'chat2']),
+            _RecordingNotifier(['chat1']),
+        )
+        dispatcher = _dispatcher(both, first, window=60, min_interval=0)
+        dispatcher.enqueue('first', both, 'one', '1')
+        dispatcher.enqueue('second', first, 'two', '2')
+        self.assertEqual(dispatcher.drain(), 0)
+        self.assertEqual(dispatcher.drain(flush=True), 3)
+        self.assertEqual(
+            sorted(both.sent + first.sent),
+            [('chat1', 'one\n\ntwo'), ('chat2', 'one')],
+        )
+
+    def test_notifiers_with_different_texts_are_not_merged(self) -> None:
+        formatted, static = (
+            _RecordingNotifier(['chat']),
+            _StaticRecordingNotifier(['chat']),
+        )
+        dispatcher = _dispatcher(formatted, static, window=0, min_interval=0)
+        dispatcher.enqueue('digest', formatted, 'one', '1')
+        dispatcher.enqueue('reminder', static, 'ignored', '2')
+        dispatcher.enqueue('digest', formatted, 'two', '3')
+        self.assertEqual(dispatcher.drain(), 3)
+        self.assertEqual(formatted.sent, [('chat', 'one\n\ntwo')])
+        self.assertEqual(static.sent, [('chat', 'static')])
+        token, chat = '123:token', 'chat'
+        self.assertNotEqual(
+            TelegramNotifier(token, [chat]).digest_key(chat),
+            StaticTelegramNotifier('reminder', token, [chat]).digest_key(chat),
+        )
+
+    def test_long_messages_are_split_and_rejected_ones_dead_lettered(
+        self,
+    ) -> None:
+        notifier = _RecordingNotifier(['chat'], rejecting=True)
+        dispatcher = _dispatcher(notifier, window=0, min_interval=0)
+        dispatcher.enqueue('task', notifier, 'x' * 30, '1')
+        self.assertEqual(
+            [row.text for row in Notification.select()], ['x' * 19, 'x' * 11]
+        )
+        self.assertEqual(dispatcher.drain(), 0)
+        self.assertEqual(
+            [(row.state, row.attempts) for row in Notification.select()],
+            [(DEAD, 1), (DEAD, 1)],
+        )
+        breaker = destination_breakers.get(notifier.destination_key('chat'))
+        self.assertEqual(breaker.state, CircuitState.CLOSED)
+
+    def test_enqueue_is_idempotent(self) -> None:
+        notifier = _RecordingNotifier(['chat'])
+        NotificationDispatcher.enqueue('task', notifier, 'text', 'job:1')
+        NotificationDispatcher.enqueue('task', notifier, 'text', 'job:1')
+        _dispatcher(notifier, window=0).drain()
+        self.assertEqual(notifier.sent, [('chat', 'text')])
+
+    def test_rate_limited_send_is_retried(self) -> None:
+        notifier = _RecordingNotifier(['chat'], 1)
+        dispatcher = _dispatcher(notifier, window=0, min_interval=0)
+        dispatcher.enqueue('task', notifier, 'text', '1')
+        dispatcher.start()
+        dispatcher.stop(timeout=5)
+        self.assertEqual(notifier.sent, [('chat', 'text')])
+
+    def test_failing_notification_is_dead_lettered(self) -> None:
+        dispatcher = NotificationDispatcher(
+            window=0,
+            retry_delay=timedelta(),
+            max_attempts=2,
+            retry_policy=RetryPolicy(max_attempts=1),
+        )
+        notifier = _RecordingNotifier(['dead_chat'], failing=True)
+        dispatcher.enqueue('task', notifier, 'text', '1')
+        dispatcher.drain()
+        dispatcher.drain()
+        self.assertEqual(Notification.get().state, DEAD)
+
+    def test_expired_lease_is_recovered(self) -> None:
+        notifier = _RecordingNotifier(['chat'])
+        NotificationDispatcher.enqueue('task', notifier, 'a', '1')
+        Notification.update(
+            state=SENDING,
+            locked_by='crashed_worker',
+            available_at=get_current_utc_time() - timedelta(seconds=1),
+        ).execute()
+        _dispatcher(notifier, window=0).drain()
+        self.assertEqual(Notification.get().state, SENT)
+        self.assertEqual(notifier.sent, [('chat', 'a')])
+
+    def test_task_writes_result_and_notification_together(self) -> None:
+        notifier = _RecordingNotifier(['chat'])
+        task = TodoTask(
+            title='Todo',
+            scheduler=None,
+            formatter=SimpleFormatter(),
+            notifier=notifier,
+        )
+        task.use_outbox = True
+        task.execute(run_key='job:1')
+        n_rows = len(Notification.select())
+        self.assertGreater(n_rows, 0)
+        task.execute(run_key='job:1')
+        self.assertEqual(len(TaskResult.select()), 1)
+        self.assertEqual(len(Notification.select()), n_rows)
+        self.assertEqual(notifier.sent, [])
+        task.execute(run_key='job:2')
+        self.assertEqual(len(TaskResult.select()), 2)
+
+
+class TestDelivery(_FileDatabaseTestCase):
+    def test_failing_destination_does_not_block_others(self) -> None:
+        notifier = _RecordingNotifier(['chat1', 'chat2'])
+        results = deliver_all(
+            _RecordingNotifier(['dead_hook'], failing=True),
+            'text',
+            RetryPolicy(max_attempts=2, base_delay=0),
+        ) + deliver_all(notifier, 'text')
+        self.assertEqual(
+            [(result.success, result.attempts) for result in results],
+            [(False, 2), (True, 1), (True, 1)],
+        )
+        self.assertEqual(len(notifier.sent), 2)
+        self.assertEqual(len(Delivery.select().where(Delivery.success)), 2)
+
+    @patch('requests.post')
+    def test_slack_error_response_fails_delivery(self, post: MagicMock) -> None:
+        response = requests.Response()
+        response.status_code = 404
+        post.return_value = response
+        hook = 'https://hooks/missing'
+        result = deliver(SlackNotifier([hook]), hook, 'text', RetryPolicy(1))
+        self.assertFalse(result.success)
+        self.assertIn('404', result.error or '')
+
+    def test_send_falls_back_to_notify(self) -> None:
+        notifier = _NotifyOnlyNotifier()
+        self.assertTrue(deliver(notifier, 'channel', 'text').success)
+        self.assertEqual(notifier.texts, ['text'])
+
+    def test_destination_keys_hide_secrets(self) -> None:
+        keys = [
+            TelegramNotifier('123:bot_secret', ['chat']).destination_key('chat'),
+            SlackNotifier(['https://hooks/hook_secret']).destination_key(
+                'https://hooks/hook_secret'
+            ),
+        ]
+        self.assertFalse([key for key in keys if 'secret' in key])
+        self.assertTrue(keys[0].startswith('telegram:'))
+        self.assertTrue(keys[0].endswith(':chat'))
+        self.assertNotEqual(
+            keys[0], TelegramNotifier('456:other', ['chat']).destination_key('chat')
+        )
+
+    def test_circuit_breaker(self) -> None:
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitState.CLOSED)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitState.HALF_OPEN)
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitState.CLOSED)
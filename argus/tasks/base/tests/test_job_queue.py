@@ -0,0 +1,295 @@
+# pylint: disable=W0212
+import os
+import tempfile
+import threading
+import time
+from datetime import UTC, datetime, timedelta
+from unittest import TestCase
+
+from peewee import SqliteDatabase
+
+from argus.tasks.base import http
+from argus.tasks.base.circuit_breaker import CircuitBreakerRegistry, CircuitState
+from argus.tasks.base.clock import VirtualClock
+from argus.tasks.base.database import MODELS, Job, TaskResult, get_current_utc_time
+from argus.tasks.base.job_queue import JobQueue, JobState, Priority, backoff_delay
+from argus.tasks.base.serializable import JsonDict, Serializable
+from argus.tasks.base.task import Task, TaskManager
+
+
+class _Result(Serializable):
+    def to_dict(self) -> JsonDict:
+        return super().to_dict()
+
+
+class _FailingTask(Task[_Result]):
+    def run(self) -> _Result:
+        raise RuntimeError('boom')
+
+
+class _FlakyTask(Task[_Result]):
+    SOURCES = ('example.com',)
+    RETRY_DELAY = timedelta(seconds=10)
+    n_runs = 0
+
+    def run(self) -> _Result:
+        self.n_runs += 1
+        if self.n_runs < 3:
+            raise RuntimeError('boom')
+        return _Result()
+
+
+class _UnreachableTask(Task[_Result]):
+    SOURCES: tuple[str, ...] = ('127.0.0.1',)
+
+    def run(self) -> _Result:
+        http.get('http://127.0.0.1:9/', timeout=5)
+        return _Result()
+
+
+class _OkTask(Task[_Result]):
+    def run(self) -> _Result:
+        return _Result()
+
+
+class _BlockedTask(Task[_Result]):
+    PRIORITY = Priority.BULK
+    release = threading.Event()
+
+    def run(self) -> _Result:
+        self.release.wait(5)
+        return _Result()
+
+
+class TestJobQueue(TestCase):
+    def setUp(self) -> None:
+        self.test_db = SqliteDatabase(':memory:')
+        self.test_db.bind(MODELS)
+        self.test_db.connect()
+        self.test_db.create_tables(MODELS)
+        self.queue = JobQueue(retry_delay=timedelta(), max_attempts=2)
+
+    def tearDown(self) -> None:
+        self.test_db.drop_tables(MODELS)
+        self.test_db.close()
+
+    def test_enqueue_is_unique_per_task(self) -> None:
+        self.assertIsNotNone(self.queue.enqueue('task'))
+        self.assertIsNone(self.queue.enqueue('task'))
+        self.assertIsNotNone(self.queue.enqueue('other_task'))
+
+    def test_priority_order(self) -> None:
+        self.queue.enqueue('low', priority=0)
+        self.queue.enqueue('high', priority=10)
+        job = self.queue.dequeue()
+        assert job
+        self.assertEqual(job.task_id, 'high')
+        self.assertEqual(job.state, JobState.RUNNING.value)
+
+    def test_deadline_order_and_sla_misses(self) -> None:
+        now = get_current_utc_time()
+        self.queue.enqueue('no_deadline', priority=Priority.CRITICAL)
+        self.queue.enqueue(
+            'late', priority=Priority.CRITICAL, deadline=now - timedelta(minutes=1)
+        )
+        self.queue.enqueue('soon', priority=Priority.CRITICAL, deadline=now)
+        self.queue.enqueue('bulk', priority=Priority.BULK)
+        order = []
+        while job := self.queue.dequeue(min_priority=Priority.CRITICAL):
+            order.append(job.task_id)
+        self.assertEqual(order, ['late', 'soon', 'no_deadline'])
+        self.assertEqual(
+            [job.task_id for job in self.queue.sla_misses()], ['soon', 'late']
+        )
+
+    def test_leased_job_is_invisible(self) -> None:
+        self.queue.enqueue('task')
+        self.assertIsNotNone(self.queue.dequeue())
+        self.assertIsNone(self.queue.dequeue())
+
+    def test_expired_lease_is_retried(self) -> None:
+        queue = JobQueue(visibility_timeout=timedelta(seconds=-1))
+        queue.enqueue('task')
+        first = queue.dequeue()
+        second = queue.dequeue()
+        assert first and second
+        self.assertEqual(first.id, second.id)
+        self.assertEqual(second.attempts, 2)
+
+    def test_retry_then_dead_letter(self) -> None:
+        self.queue.enqueue('task')
+        job = self.queue.dequeue()
+        assert job
+        self.queue.fail(job, 'error')
+        job = self.queue.dequeue()
+        assert job
+        self.assertEqual(job.attempts, 2)
+        self.queue.fail(job, 'error')
+        self.assertIsNone(self.queue.dequeue())
+        self.assertEqual([job.task_id for job in self.queue.dead_letters()], ['task'])
+
+    def test_manager_captures_failures(self) -> None:
+        manager = TaskManager(job_queue=self.queue)
+        manager._tasks = [_FailingTask(task_id='failing'), _OkTask(task_id='ok')]
+        manager._tasks_by_id = {task.task_id: task for task in manager._tasks}
+        manager.schedule_due_tasks()
+        manager.process_jobs()
+        self.assertEqual(len(TaskResult.select()), 1)
+        states = {job.task_id: job.state for job in Job.select()}
+        self.assertEqual(
+            states, {'failing': JobState.DEAD.value, 'ok': JobState.DONE.value}
+        )
+
+    def test_backoff_delay(self) -> None:
+        base, maximum = timedelta(seconds=10), timedelta(seconds=60)
+        for attempt, full in [(1, 10), (2, 20), (3, 40), (4, 60), (9, 60)]:
+            delay = backoff_delay(attempt, base, maximum)
+            self.assertLessEqual(delay, timedelta(seconds=full))
+            self.assertGreaterEqual(delay, timedelta(seconds=full / 2))
+        self.assertEqual(backoff_delay(3, base, maximum, jitter=0), 4 * base)
+
+    def test_run_if_due_backs_off(self) -> None:
+        clock = VirtualClock(datetime(2025, 1, 6, tzinfo=UTC))
+        task = _FlakyTask(task_id='flaky', clock=clock)
+        task.run_if_due()
+        self.assertEqual(task.n_runs, 1)
+        task.run_if_due()
+        self.assertEqual(task.n_runs, 1)
+        clock.advance(task.RETRY_DELAY)
+        task.run_if_due()
+        self.assertEqual(task.n_runs, 2)
+        # The second retry waits 10 to 20 seconds.
+        clock.advance(timedelta(seconds=9))
+        task.run_if_due()
+        self.assertEqual(task.n_runs, 2)
+        clock.advance(timedelta(seconds=11))
+        task.run_if_due()
+        self.assertEqual((task.n_runs, task._n_failures), (3, 0))
+        self.assertEqual(len(TaskResult.select()), 1)
+
+    def test_queue_and_breakers_follow_the_clock(self) -> None:
+        clock = VirtualClock(datetime(2025, 1, 6, tzinfo=UTC))
+        queue = JobQueue(retry_delay=timedelta(minutes=1), jitter=0, clock=clock)
+        queue.enqueue('task')
+        job = queue.dequeue()
+        assert job
+        self.assertEqual(job.started_at, clock.utcnow())
+        queue.fail(job, 'boom')
+        clock.advance(timedelta(seconds=59))
+        self.assertIsNone(queue.dequeue())
+        clock.advance(timedelta(seconds=1))
+        self.assertIsNotNone(queue.dequeue())
+
+        breaker = CircuitBreakerRegistry(
+            failure_threshold=1, reset_timeout=60, clock=clock
+        ).get('example.com')
+        breaker.record_failure()
+        self.assertEqual(breaker.retry_at, clock.time() + 60)
+        clock.advance(timedelta(seconds=60))
+        self.assertEqual(breaker.state, CircuitState.HALF_OPEN)
+        task = _OkTask(sla=timedelta(minutes=5), clock=clock)
+        self.assertEqual(task.get_deadline(), clock.utcnow() + timedelta(minutes=5))
+
+    def test_open_circuit_defers_jobs(self) -> None:
+        def breakers() -> CircuitBreakerRegistry:
+            return CircuitBreakerRegistry(
+                failure_threshold=2, reset_timeout=600, state_prefix='circuit:'
+            )
+
+        queue = JobQueue(retry_delay=timedelta(), max_attempts=5)
+        manager = TaskManager(job_queue=queue, source_breakers=breakers())
+        failing = _UnreachableTask(task_id='failing')
+        same_host = _FlakyTask(task_id='same_host')
+        same_host.SOURCES = ('127.0.0.1',)
+        manager._tasks = [failing, same_host, _OkTask(task_id='ok')]
+        manager._tasks_by_id = {task.task_id: task for task in manager._tasks}
+        queue.enqueue('failing')
+        manager.process_jobs()
+        queue.enqueue('same_host')
+        queue.enqueue('ok')
+        manager.process_jobs()
+
+        jobs = {job.task_id: job for job in Job.select()}
+        self.assertEqual(jobs['ok'].state, JobState.DONE.value)
+        self.assertEqual(same_host.n_runs, 0)
+        for task_id, attempts in [('failing', 2), ('same_host', 0)]:
+            job = jobs[task_id]
+            self.assertEqual(job.state, JobState.PENDING.value)
+            self.assertEqual(job.attempts, attempts)
+            self.assertEqual(job.last_error, 'Circuit open for 127.0.0.1')
+            self.assertGreater(
+                job.available_at, get_current_utc_time() + timedelta(minutes=9)
+            )
+        restarted = breakers().get('127.0.0.1')
+        self.assertFalse(restarted.allow())
+        self.assertEqual(restarted.state, CircuitState.OPEN)
+
+    def test_only_failed_sources_open_circuits(self) -> None:
+        breakers = CircuitBreakerRegistry(failure_threshold=1, reset_timeout=600)
+        manager = TaskManager(job_queue=self.queue, source_breakers=breakers)
+        failing = _FailingTask(task_id='failing')
+        failing.SOURCES = ('example.com',)
+        unreachable = _UnreachableTask(task_id='unreachable')
+        unreachable.SOURCES = ('127.0.0.1', 'example.com')
+        manager._tasks = [failing, unreachable]
+        manager._tasks_by_id = {task.task_id: task for task in manager._tasks}
+        self.queue.enqueue('failing')
+        self.queue.enqueue('unreachable')
+        manager.process_jobs()
+        jobs = {job.task_id: job for job in Job.select()}
+        self.assertEqual(jobs['failing'].state, JobState.DEAD.value)
+        self.assertEqual(jobs['unreachable'].last_error, 'Circuit open for 127.0.0.1')
+        self.assertEqual(breakers.get('127.0.0.1').state, CircuitState.OPEN)
+        self.assertEqual(breakers.get('example.com').state, CircuitState.CLOSED)
+
+
+class TestReservedWorkers(TestCase):
+    """Jobs run on worker threads, so the test needs a file DB."""
+
+    def setUp(self) -> None:
+        handle, self.db_path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+        self.test_db = SqliteDatabase(self.db_path)
+        self.test_db.bind(MODELS)
+        self.test_db.connect()
+        self.test_db.create_tables(MODELS)
+        _BlockedTask.release.clear()
+
+    def tearDown(self) -> None:
+        _BlockedTask.release.set()
+        self.test_db.close()
+        os.remove(self.db_path)
+
+    def test_critical_jobs_use_reserved_workers(self) -> None:
+        manager = TaskManager(max_workers=2, reserved_workers=1)
+        scrapers: list[Task] = [_BlockedTask(task_id=f'scraper{i}') for i in range(3)]
+        reminder = _OkTask(task_id='reminder', priority=Priority.CRITICAL)
+        manager._tasks = scrapers
+        manager._tasks_by_id = {task.task_id: task for task in manager._tasks}
+        manager.schedule_due_tasks()
+        manager.process_jobs()
+        # The scraper blocks the only general worker; the reminder still runs.
+        manager._tasks = [*scrapers, reminder]
+        manager._tasks_by_id[reminder.task_id] = reminder
+        manager.schedule_due_tasks()
+        manager.process_jobs()
+        deadline = time.monotonic() + 5
+        while not TaskResult.select().exists() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(
+            [result.task_id for result in TaskResult.select()], ['reminder']
+        )
+        states = {job.task_id: job.state for job in Job.select()}
+        self.assertEqual(
+            sorted(states.values()),
+            [JobState.DONE.value]
+            + [JobState.PENDING.value] * 2
+            + [JobState.RUNNING.value],
+        )
+        _BlockedTask.release.set()
+        while TaskResult.select().count() < 4 and time.monotonic() < deadline:
+            manager.process_jobs()
+            time.sleep(0.01)
+        assert manager._executor
+        manager._executor.shutdown(wait=True)
+        self.assertEqual(TaskResult.select().count(), 4)
@@ -0,0 +1,153 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import TestCase
+
+from peewee import SqliteDatabase
+
+from argus.tasks.base import http
+from argus.tasks.base.database import MODELS, TaskRun
+from argus.tasks.base.journal import (
+    Outcome,
+    get_failed_hosts,
+    prune_runs,
+    query_runs,
+    record_run,
+    usage_by_task,
+    usage_to_str,
+)
+from argus.tasks.base.serializable import JsonDict, Serializable
+from argus.tasks.base.task import Task
+from argus.tasks.base.usage import RunUsage, measure
+from argus.tasks.base.workers import TaskTimeoutError
+
+BODY = b'x' * 10_000
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:  # pylint: disable=invalid-name
+        if self.path == '/down':
+            self.send_response(503)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+class _Result(Serializable):
+    def to_dict(self) -> JsonDict:
+        return super().to_dict()
+
+
+class _DownloadTask(Task[_Result]):
+    url = ''
+
+    def run(self) -> _Result:
+        http.get(self.url, timeout=5)
+        # Requests from other threads count if the session is created here.
+        with http.session() as session:
+            thread = threading.Thread(target=session.get, args=(self.url,))
+            thread.start()
+            thread.join()
+        return _Result()
+
+
+class _FailingTask(Task[_Result]):
+    def run(self) -> _Result:
+        raise RuntimeError('boom')
+
+
+class _SlowTask(Task[_Result]):
+    def run(self) -> _Result:
+        time.sleep(1)
+        return _Result()
+
+
+class TestJournal(TestCase):
+    def setUp(self) -> None:
+        self.test_db = SqliteDatabase(':memory:')
+        self.test_db.bind(MODELS)
+        self.test_db.connect()
+        self.test_db.create_tables(MODELS)
+
+    def tearDown(self) -> None:
+        self.test_db.drop_tables(MODELS)
+        self.test_db.close()
+
+    def test_runs_are_journaled_with_usage(self) -> None:
+        server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        _DownloadTask.url = f'http://127.0.0.1:{server.server_port}/'
+
+        _DownloadTask(task_id='download').execute(run_key='job:1')
+        with self.assertRaises(RuntimeError):
+            _FailingTask(task_id='failing').execute()
+        with self.assertRaises(TaskTimeoutError):
+            _SlowTask(task_id='slow').execute(timeout=0.05)
+
+        run = TaskRun.get(TaskRun.task_id == 'download')
+        self.assertEqual((run.outcome, run.run_key), ('success', 'job:1'))
+        self.assertEqual(run.n_requests, 2)
+        self.assertIsNone(run.failed_hosts)
+        self.assertEqual(run.bytes_downloaded, 2 * len(BODY))
+        self.assertIsNotNone(run.cpu_time)
+        self.assertGreater(run.duration, 0)
+        failed = query_runs(outcomes=[Outcome.FAILURE, Outcome.TIMEOUT])
+        self.assertEqual(
+            [(run.task_id, run.outcome) for run in failed],
+            [('slow', 'timeout'), ('failing', 'failure')],
+        )
+        self.assertEqual(failed[1].error, "RuntimeError('boom')")
+
+        _DownloadTask.url += 'down'
+        _DownloadTask(task_id='download').execute(run_key='job:2')
+        self.assertEqual(get_failed_hosts('job:2'), {'127.0.0.1'})
+        self.assertEqual(get_failed_hosts('job:1'), set())
+
+    def test_measure(self) -> None:
+        usage = RunUsage()
+        self.assertEqual(measure(usage, lambda: sum(range(100_000))), 4999950000)
+        assert usage.cpu_time is not None
+        self.assertGreater(usage.cpu_time, 0)
+        self.assertGreaterEqual(usage.peak_rss_delta or 0, 0)
+
+    def test_usage_by_task(self) -> None:
+        started_at = datetime(2025, 1, 1)
+        for task_id, cpu_time, n_bytes, outcome in [
+            ('light', 1.0, 100, Outcome.SUCCESS),
+            ('heavy', 5.0, 10, Outcome.SUCCESS),
+            ('heavy', 7.0, 10, Outcome.FAILURE),
+            ('old', 100.0, 10, Outcome.SUCCESS),
+        ]:
+            record_run(
+                task_id,
+                started_at - timedelta(days=30) if task_id == 'old' else started_at,
+                duration=cpu_time * 2,
+                outcome=outcome,
+                usage=RunUsage(
+                    n_requests=1, bytes_downloaded=n_bytes, cpu_time=cpu_time
+                ),
+            )
+        usages = usage_by_task(since=started_at - timedelta(days=1))
+        self.assertEqual([usage.task_id for usage in usages], ['heavy', 'light'])
+        heavy = usages[0]
+        self.assertEqual((heavy.n_runs, heavy.n_failures), (2, 1))
+        self.assertEqual((heavy.cpu_time, heavy.duration), (12.0, 24.0))
+        self.assertEqual(
+            [usage.task_id for usage in usage_by_task(order_by='bytes_downloaded')],
+            ['light', 'heavy', 'old'],
+        )
+        self.assertEqual(len(usage_by_task(limit=1)), 1)
+        self.assertIn('heavy', usage_to_str(usages))
+        with self.assertRaises(ValueError):
+            usage_by_task(order_by='task_id; DROP TABLE taskrun')
+        self.assertEqual(prune_runs(before=started_at), 1)
+        self.assertEqual(len(query_runs(task_id='heavy', limit=None)), 2)
@@ -0,0 +1,109 @@
+import glob
+import json
+import logging
+import os
+import sys
+import tempfile
+from unittest import TestCase
+
+from peewee import SqliteDatabase
+
+from argus.logger_setup import setup_logging
+from argus.tasks.base.database import MODELS, TaskRun
+from argus.tasks.base.logs import ContextFilter, JsonFormatter, log_context
+from argus.tasks.base.serializable import JsonDict, Serializable
+from argus.tasks.base.task import Task
+
+logger = logging.getLogger(__name__)
+
+
+class _Result(Serializable):
+    def to_dict(self) -> JsonDict:
+        return super().to_dict()
+
+
+class _ChattyTask(Task[_Result]):
+    def run(self) -> _Result:
+        logger.info('fetched %d items', 3)
+        logger.debug('not captured')
+        return _Result()
+
+
+class TestLogs(TestCase):
+    def setUp(self) -> None:
+        self.test_db = SqliteDatabase(':memory:')
+        self.test_db.bind(MODELS)
+        self.test_db.connect()
+        self.test_db.create_tables(MODELS)
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        root = logging.getLogger()
+        handlers, level = root.handlers[:], root.level
+        self.addCleanup(logging.basicConfig, level=level, handlers=handlers, force=True)
+
+    def tearDown(self) -> None:
+        self.test_db.drop_tables(MODELS)
+        self.test_db.close()
+
+    def test_json_formatter(self) -> None:
+        try:
+            raise ValueError('boom')
+        except ValueError:
+            exc_info = sys.exc_info()
+        record = logger.makeRecord(
+            logger.name,
+            logging.ERROR,
+            __file__,
+            1,
+            'failed %s',
+            ('x',),
+            exc_info,
+            extra={'attempt': 2},
+        )
+        with log_context(task_id='task', run_key='job:1'):
+            ContextFilter().filter(record)
+        data = json.loads(JsonFormatter().format(record))
+        self.assertEqual(data['message'], 'failed x')
+        self.assertEqual(data['level'], 'ERROR')
+        self.assertEqual((data['task_id'], data['run_key']), ('task', 'job:1'))
+        self.assertEqual(data['attempt'], 2)
+        self.assertIn('ValueError: boom', data['exception'])
+
+    def test_background_json_file_and_run_capture(self) -> None:
+        log_file = os.path.join(self.directory.name, 'argus.log')
+        listener = setup_logging(
+            json_format=True,
+            log_file=log_file,
+            max_bytes=1000,
+            background=True,
+            capture_runs=True,
+        )
+        assert listener
+        for i in range(3):
+            _ChattyTask(task_id='chatty').execute(run_key=f'job:{i}')
+        logger.info('outside of a run')
+        listener.stop()
+
+        # Rotated files are `argus.log.1`, `argus.log.2`, ..., oldest last.
+        paths = sorted(glob.glob(f'{log_file}*'), reverse=True)
+        self.assertGreater(len(paths), 1)
+        records: list[JsonDict] = []
+        for path in paths:
+            with open(path, encoding='utf-8') as file:
+                records.extend(json.loads(line) for line in file)
+        self.assertEqual(records[-1]['message'], 'outside of a run')
+        self.assertNotIn('task_id', records[-1])
+        fetched = [
+            record for record in records if record['message'] == 'fetched 3 items'
+        ]
+        self.assertEqual(fetched[-1]['task_id'], 'chatty')
+        self.assertEqual(fetched[-1]['run_key'], 'job:2')
+
+        run = TaskRun.select().order_by(TaskRun.id.desc()).get()
+        assert run.logs
+        captured = [json.loads(line) for line in run.logs.splitlines()]
+        self.assertEqual(
+            [record['message'] for record in captured],
+            ['chatty running', 'fetched 3 items'],
+        )
+        self.assertEqual(captured[1]['run_key'], 'job:2')
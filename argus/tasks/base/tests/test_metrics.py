@@ -0,0 +1,91 @@
+import json
+from datetime import datetime, timedelta
+from unittest import TestCase
+
+import numpy as np
+from peewee import SqliteDatabase
+
+from argus.tasks.base.database import MODELS, MetricPoint, TaskResult
+from argus.tasks.base.metrics import (
+    DAY,
+    HOUR,
+    RAW_RETENTION,
+    backfill_metrics,
+    query_metric,
+    query_metrics,
+    record_metrics,
+)
+from argus.tasks.github import Repo, Repos
+from argus.tasks.snow import SnowReportData
+
+START = datetime(2024, 1, 1)
+
+
+class TestMetrics(TestCase):
+    def setUp(self) -> None:
+        self.test_db = SqliteDatabase(':memory:')
+        self.test_db.bind(MODELS)
+        self.test_db.connect()
+        self.test_db.create_tables(MODELS)
+
+    def tearDown(self) -> None:
+        self.test_db.drop_tables(MODELS)
+        self.test_db.close()
+
+    def test_raw_points_and_rollups(self) -> None:
+        for minutes, value in [(0, 1.0), (30, 3.0), (90, 8.0)]:
+            record_metrics(
+                'prices',
+                START + timedelta(minutes=minutes),
+                [('a', 'price', value), ('b', 'price', 10 * value)],
+            )
+        series = query_metric('prices', 'price', 'a')
+        np.testing.assert_array_equal(series.values, [1.0, 3.0, 8.0])
+        self.assertEqual(series.timestamps[-1], np.datetime64('2024-01-01T01:30'))
+        hourly = query_metric('prices', 'price', 'a', resolution=HOUR)
+        np.testing.assert_array_equal(hourly.values, [2.0, 8.0])
+        daily = query_metrics('prices', 'price', resolution=DAY, aggregate='max')
+        self.assertEqual(sorted(daily), ['a', 'b'])
+        np.testing.assert_array_equal(daily['b'].values, [80.0])
+        self.assertEqual(
+            len(query_metric('prices', 'price', 'a', since=START.replace(hour=1))), 1
+        )
+        self.assertEqual(len(query_metric('prices', 'missing', 'a')), 0)
+
+    def test_old_raw_points_are_pruned(self) -> None:
+        later = START + RAW_RETENTION + timedelta(days=1)
+        record_metrics('prices', START, [('a', 'price', 1.0)])
+        record_metrics('repos', START, [('r', 'n_stars', 5.0)])
+        record_metrics('prices', later, [('a', 'price', 3.0)])
+        self.assertEqual(len(query_metric('prices', 'price', 'a')), 1)
+        self.assertEqual(len(query_metric('repos', 'n_stars', 'r')), 1)
+        np.testing.assert_array_equal(
+            query_metric('prices', 'price', 'a', resolution=DAY).values, [1.0, 3.0]
+        )
+        record_metrics('prices', later, [('b', 'price', 2.0)], raw_retention=None)
+        self.assertEqual(MetricPoint.select().count(), 3)
+
+    def test_result_metrics(self) -> None:
+        repos = Repos([Repo('d', 10, 2, 'Python', 'url')])
+        self.assertEqual(
+            list(repos.metrics()),
+            [('url', 'n_stars', 10.0), ('url', 'n_recent_stars', 2.0)],
+        )
+        snow = SnowReportData({'bansko/top': {'Mon': 5, 'Tue': 2.5}})
+        self.assertEqual(list(snow.metrics()), [('bansko/top', 'snow_total', 7.5)])
+
+    def test_backfill(self) -> None:
+        for day in range(3):
+            repos = Repos([Repo('d', 10 + day, day, 'Python', 'url')])
+            TaskResult.create(
+                task_id='repos',
+                result=json.dumps(repos.to_dict()),
+                created_at=START + timedelta(days=day),
+            )
+        record_metrics('repos', START, [('stale', 'n_stars', 1)])
+        self.assertEqual(backfill_metrics('repos', Repos), 6)
+        self.assertEqual(MetricPoint.select().count(), 6)
+        np.testing.assert_array_equal(
+            query_metric('repos', 'n_stars', 'url', resolution=DAY).values,
+            [10, 11, 12],
+        )
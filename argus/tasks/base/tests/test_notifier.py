@@ -0,0 +1,70 @@
+# pylint: disable=W0212
+import json
+from unittest import TestCase
+
+from peewee import SqliteDatabase
+
+from argus.tasks.base.database import MODELS, RunningTask
+from argus.tasks.base.notifier import TelegramNotifier
+from argus.tasks.base.task import TaskManager
+from argus.tasks.base.telegram_bots import TelegramBotRegistry, telegram_bots
+from argus.tasks.todo import TodoTask
+
+
+class TestTelegramBotRegistry(TestCase):
+    def test_notifiers_share_bot(self) -> None:
+        first = TelegramNotifier('token', ['chat1'])
+        second = TelegramNotifier('token', ['chat2'])
+        other = TelegramNotifier('other_token', ['chat1'])
+        self.assertIs(first._telegram_bot, second._telegram_bot)
+        self.assertIsNot(first._telegram_bot, other._telegram_bot)
+
+    def test_run_and_shutdown(self) -> None:
+        registry = TelegramBotRegistry()
+        registry.get_bot('token')
+
+        async def answer() -> int:
+            return 42
+
+        self.assertEqual(registry.run(answer()), 42)
+        registry.shutdown()
+        self.assertEqual(registry.run(answer()), 42)
+        registry.shutdown()
+
+    def tearDown(self) -> None:
+        telegram_bots.shutdown()
+
+
+class TestTaskManagerReload(TestCase):
+    def setUp(self) -> None:
+        self.test_db = SqliteDatabase(':memory:')
+        self.test_db.bind(MODELS)
+        self.test_db.connect()
+        self.test_db.create_tables(MODELS)
+
+    def tearDown(self) -> None:
+        self.test_db.drop_tables(MODELS)
+        self.test_db.close()
+
+    @staticmethod
+    def _add_task(task_id: str, title: str) -> None:
+        task = TodoTask(title=title, task_id=task_id, scheduler=None)
+        RunningTask.insert(
+            task_id=task_id,
+            task_type='TodoTask',
+            serialized_data=json.dumps(task.to_dict()),
+        ).on_conflict_replace().execute()
+
+    def test_only_changed_tasks_are_rebuilt(self) -> None:
+        self._add_task('first', 'First')
+        self._add_task('second', 'Second')
+        manager = TaskManager()
+        manager._load_running_tasks()
+        first, second = manager._tasks
+        self._add_task('second', 'Second changed')
+        manager._load_running_tasks()
+        self.assertIs(manager._tasks_by_id['first'], first)
+        self.assertIsNot(manager._tasks_by_id['second'], second)
+        reloaded = manager._tasks_by_id['second']
+        assert isinstance(reloaded, TodoTask)
+        self.assertEqual(reloaded._title, 'Second changed')
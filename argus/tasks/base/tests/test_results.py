@@ -0,0 +1,139 @@
+# pylint: disable=W0212
+import json
+from dataclasses import asdict
+from datetime import datetime, timedelta
+from unittest import TestCase
+
+from peewee import IntegrityError, SqliteDatabase
+
+from argus.tasks.base import results
+from argus.tasks.base.database import MODELS, TaskResult, add_missing_columns
+from argus.tasks.base.results import ResultQuery, extract_path
+from argus.tasks.product import ProductPrice, ProductPrices
+
+START = datetime(2024, 1, 1)
+
+
+class TestResultQuery(TestCase):
+    def setUp(self) -> None:
+        self.test_db = SqliteDatabase(':memory:')
+        self.test_db.bind(MODELS)
+        self.test_db.connect()
+        self.test_db.create_tables(MODELS)
+        for hour in range(5):
+            prices = ProductPrices(
+                [
+                    ProductPrice(f'p{i}', hour + i + 0.5, 'url', 'shop', 0)
+                    for i in range(2)
+                ]
+            )
+            TaskResult.create(
+                task_id='prices',
+                result=json.dumps(prices.to_dict()),
+                created_at=START + timedelta(hours=hour),
+            )
+        TaskResult.create(task_id='other', result='{}', created_at=START)
+
+    def tearDown(self) -> None:
+        results._json1_support.clear()
+        self.test_db.drop_tables(MODELS)
+        self.test_db.close()
+
+    def _check_both_backends(self, query: ResultQuery, expected: list) -> None:
+        for json1 in (True, False):
+            results._json1_support[self.test_db] = json1
+            self.assertEqual([(row.id, row.data) for row in query], expected)
+
+    def test_streams_in_batches(self) -> None:
+        query = ResultQuery('prices', since=START + timedelta(hours=1), batch_size=2)
+        self.assertEqual([row.id for row in query], [2, 3, 4, 5])
+        self.assertEqual(query.count(), 4)
+        newest = ResultQuery('prices', newest_first=True, limit=3, batch_size=2)
+        self.assertEqual([row.id for row in newest], [5, 4, 3])
+
+    def test_projection(self) -> None:
+        query = ResultQuery(
+            'prices',
+            until=START + timedelta(hours=2),
+            fields={'first': '$.discounts[0].price', 'missing': '$.missing'},
+        )
+        self._check_both_backends(
+            query,
+            [
+                (1, {'first': 0.5, 'missing': None}),
+                (2, {'first': 1.5, 'missing': None}),
+            ],
+        )
+
+    def test_items(self) -> None:
+        self._check_both_backends(
+            ResultQuery(
+                'prices', items='$.discounts', fields=['name', 'price'], limit=1
+            ),
+            [(1, {'name': 'p0', 'price': 0.5}), (1, {'name': 'p1', 'price': 1.5})],
+        )
+        self._check_both_backends(
+            ResultQuery('prices', items='$.discounts', newest_first=True, limit=1),
+            [
+                (5, asdict(ProductPrice(name, price, 'url', 'shop', 0)))
+                for name, price in [('p0', 4.5), ('p1', 5.5)]
+            ],
+        )
+
+    def test_results(self) -> None:
+        created_at, result = next(ResultQuery('prices').results())
+        self.assertEqual(created_at, START)
+        self.assertEqual(
+            result,
+            ProductPrices(
+                [ProductPrice(f'p{i}', i + 0.5, 'url', 'shop', 0) for i in range(2)]
+            ),
+        )
+
+    def test_extract_path(self) -> None:
+        data = {'a': [{'b c': 1}]}
+        self.assertEqual(extract_path(data, '$.a[0]."b c"'), 1)
+        self.assertIsNone(extract_path(data, '$.a[1]'))
+        with self.assertRaises(ValueError):
+            extract_path(data, '$a')
+
+
+class TestAddMissingColumns(TestCase):
+    def setUp(self) -> None:
+        self.test_db = SqliteDatabase(':memory:')
+        self.test_db.bind(MODELS)
+        self.test_db.connect()
+        self.test_db.execute_sql(
+            'CREATE TABLE "taskresult" ('
+            '"id" INTEGER NOT NULL PRIMARY KEY, "task_id" VARCHAR(255) NOT NULL, '
+            '"result" TEXT NOT NULL, "created_at" DATETIME NOT NULL)'
+        )
+        self.test_db.execute_sql(
+            'INSERT INTO "taskresult" ("task_id", "result", "created_at") '
+            "VALUES ('old', '{}', '2024-01-01 00:00:00')"
+        )
+
+    def tearDown(self) -> None:
+        self.test_db.drop_tables(MODELS)
+        self.test_db.close()
+
+    def test_existing_table_gains_new_columns(self) -> None:
+        add_missing_columns(self.test_db)
+        self.test_db.create_tables(MODELS)
+
+        columns = {column.name for column in self.test_db.get_columns('taskresult')}
+        self.assertIn('run_key', columns)
+        TaskResult.create(task_id='new', result='{}', run_key='run')
+        with self.assertRaises(IntegrityError):
+            TaskResult.create(task_id='new', result='{}', run_key='run')
+        self.assertEqual(
+            ['old', 'new'],
+            [row.task_id for row in TaskResult.select().order_by(TaskResult.id)],
+        )
+
+    def test_is_idempotent(self) -> None:
+        add_missing_columns(self.test_db)
+        add_missing_columns(self.test_db)
+
+        columns = [column.name for column in self.test_db.get_columns('taskresult')]
+        self.assertEqual(1, columns.count('run_key'))
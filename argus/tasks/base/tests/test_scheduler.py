@@ -1,14 +1,28 @@
 import unittest
+from dataclasses import replace
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 
+from peewee import SqliteDatabase
+
+from argus.tasks.base.database import MODELS
 from argus.tasks.base.scheduler import (
     WEEKDAYS,
+    AdaptiveScheduler,
     Frequency,
     Month,
     Scheduler,
     SchedulerConfig,
 )
+from argus.tasks.base.serializable import JsonDict, Serializable
+
+
+class _Version(Serializable):
+    def __init__(self, version: int) -> None:
+        self.version = version
+
+    def to_dict(self) -> JsonDict:
+        return super().to_dict() | {'version': self.version}
 
 
 class TestScheduler(unittest.TestCase):
@@ -107,6 +121,17 @@ class TestScheduler(unittest.TestCase):
         )
         self.assertLess(scheduler.next_runtime, scheduler.now())
 
+    def test_adjust_skips_to_first_future_runtime(self):
+        for frequency in [Frequency.HOURLY, Frequency.DAILY]:
+            config = SchedulerConfig(frequency=frequency, days_only=WEEKDAYS)
+            scheduler = Scheduler([self.now], config)
+            expected = Scheduler(
+                [self.now], replace(config, adjust_to_current_time=False)
+            )
+            while expected.next_runtime < expected.now():
+                expected.set_next_runtime()
+            self.assertEqual(scheduler.next_runtime, expected.next_runtime)
+
     def test_infinite_loop_protection(self):
         scheduler = Scheduler(
             [self.now],
@@ -132,5 +157,63 @@ class TestScheduler(unittest.TestCase):
         self.assertEqual(scheduler.config, deserialized_scheduler.config)
 
 
+class TestAdaptiveScheduler(unittest.TestCase):
+    def setUp(self):
+        self.test_db = SqliteDatabase(':memory:')
+        self.test_db.bind(MODELS)
+        self.test_db.connect()
+        self.test_db.create_tables(MODELS)
+        self.now = datetime.now(ZoneInfo('Europe/Sofia')) + timedelta(seconds=1)
+
+    def tearDown(self):
+        self.test_db.drop_tables(MODELS)
+        self.test_db.close()
+
+    def _scheduler(self):
+        scheduler = AdaptiveScheduler(
+            min_interval=timedelta(minutes=10), max_interval=timedelta(days=1)
+        )
+        scheduler.now = lambda: self.now
+        scheduler.attach('task')
+        return scheduler
+
+    def _poll(self, scheduler, changes_every, n_runs):
+        """Runs the task whenever due; the result changes every `changes_every`."""
+        start = self.now
+        for _ in range(n_runs):
+            self.now = scheduler.next_runtime
+            version = (self.now - start) // changes_every
+            scheduler.observe(_Version(version))
+            scheduler.set_next_runtime()
+        return scheduler.next_runtime - self.now
+
+    def test_quiet_source_is_polled_less(self):
+        scheduler = self._scheduler()
+        self.assertTrue(scheduler.is_due())
+        self.assertEqual(
+            self._poll(scheduler, timedelta(days=30), 30), timedelta(days=1)
+        )
+
+    def test_active_source_is_polled_more(self):
+        scheduler = self._scheduler()
+        self._poll(scheduler, timedelta(days=30), 30)
+        interval = self._poll(scheduler, timedelta(minutes=30), 50)
+        self.assertLessEqual(interval, timedelta(minutes=30))
+
+    def test_state_survives_restart(self):
+        scheduler = self._scheduler()
+        self._poll(scheduler, timedelta(days=30), 10)
+        restarted = self._scheduler()
+        self.assertFalse(restarted.is_due())
+        self.assertEqual(restarted.next_runtime, scheduler.next_runtime)
+        self.assertEqual(restarted.last_hash, scheduler.last_hash)
+
+    def test_serialization(self):
+        scheduler = self._scheduler()
+        deserialized = Scheduler.from_dict(scheduler.to_dict())
+        self.assertIsInstance(deserialized, AdaptiveScheduler)
+        self.assertEqual(deserialized.to_dict(), scheduler.to_dict())
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,164 @@
+from datetime import UTC, datetime, timedelta
+from unittest import TestCase
+from zoneinfo import ZoneInfo
+
+from peewee import SqliteDatabase
+
+from argus.tasks.base.clock import VirtualClock
+from argus.tasks.base.database import MODELS, Job
+from argus.tasks.base.job_queue import JobState, Priority
+from argus.tasks.base.scheduler import (
+    WEEKDAYS,
+    Day,
+    Frequency,
+    Scheduler,
+    SchedulerConfig,
+)
+from argus.tasks.base.serializable import JsonDict, Serializable
+from argus.tasks.base.simulation import recorded_durations, simulate
+from argus.tasks.base.task import Task
+
+SOFIA = ZoneInfo('Europe/Sofia')
+# A Monday.
+START = datetime(2025, 1, 6, tzinfo=SOFIA)
+
+
+class _Result(Serializable):
+    def to_dict(self) -> JsonDict:
+        return super().to_dict()
+
+
+class _Task(Task[_Result]):
+    def run(self) -> _Result:
+        return _Result()
+
+
+def _hourly(minute: int = 0) -> Scheduler:
+    return Scheduler(
+        [START.replace(minute=minute)],
+        SchedulerConfig(frequency=Frequency.HOURLY, adjust_to_current_time=False),
+    )
+
+
+class TestVirtualClock(TestCase):
+    def test_year_of_weekday_runs(self) -> None:
+        clock = VirtualClock(START)
+        scheduler = Scheduler(
+            [START.replace(hour=9)],
+            SchedulerConfig(frequency=Frequency.DAILY, days_only=WEEKDAYS),
+            clock=clock,
+        )
+        runs = []
+        while scheduler.next_runtime and scheduler.next_runtime.year == 2025:
+            clock.advance(timedelta(minutes=30))
+            if scheduler.is_due():
+                runs.append(clock.now(SOFIA))
+                scheduler.set_next_runtime()
+        self.assertEqual(len(runs), 258)
+        self.assertEqual({run.hour for run in runs}, {9})
+        self.assertFalse({Day(run.weekday()) for run in runs} - set(WEEKDAYS))
+        self.assertEqual(clock.monotonic(), (runs[-1] - START).total_seconds())
+
+
+class TestSimulation(TestCase):
+    def setUp(self) -> None:
+        self.test_db = SqliteDatabase(':memory:')
+        self.test_db.bind(MODELS)
+        self.test_db.connect()
+        self.test_db.create_tables(MODELS)
+
+    def tearDown(self) -> None:
+        self.test_db.drop_tables(MODELS)
+        self.test_db.close()
+
+    def test_recorded_durations(self) -> None:
+        started_at = datetime(2025, 1, 1)
+        for task_id, seconds, state in [
+            ('a', 10, JobState.DONE),
+            ('a', 30, JobState.DONE),
+            ('a', 1000, JobState.DEAD),
+            ('b', 5, JobState.DONE),
+        ]:
+            Job.create(
+                task_id=task_id,
+                state=state.value,
+                started_at=started_at,
+                finished_at=started_at + timedelta(seconds=seconds),
+            )
+        self.assertEqual(recorded_durations(), {'a': 20.0, 'b': 5.0})
+        self.assertEqual(recorded_durations(['b']), {'b': 5.0})
+
+    def test_peak_concurrency(self) -> None:
+        tasks = [
+            _Task(task_id='a', scheduler=_hourly()),
+            _Task(task_id='b', scheduler=_hourly()),
+            _Task(task_id='c', scheduler=_hourly(minute=30)),
+            _Task(task_id='unscheduled'),
+        ]
+        report = simulate(
+            tasks,
+            START,
+            timedelta(days=7),
+            durations={'a': 600, 'b': 2400, 'c': 60},
+        )
+        self.assertEqual(len(report.runs), 3 * 24 * 7)
+        self.assertEqual(report.peak_concurrency, 2)
+        self.assertEqual(report.max_wait, timedelta())
+        loads = report.load_by_hour()
+        monday_nine = loads[(Day.MONDAY, 9)]
+        self.assertEqual((monday_nine.n_runs, monday_nine.peak), (3, 2))
+        self.assertAlmostEqual(monday_nine.busy_seconds, 600 + 2400 + 60)
+        self.assertIn('Peak concurrency: 2', report.to_str(top=3))
+
+    def test_limited_workers(self) -> None:
+        tasks = [
+            _Task(task_id=f'bulk_{i}', scheduler=_hourly(), priority=Priority.BULK)
+            for i in range(3)
+        ]
+        tasks.append(
+            _Task(
+                task_id='reminder',
+                scheduler=_hourly(minute=5),
+                priority=Priority.CRITICAL,
+                sla=timedelta(minutes=1),
+            )
+        )
+        report = simulate(
+            tasks,
+            START,
+            timedelta(hours=2),
+            durations={'reminder': 10},
+            default_duration=1800,
+            max_workers=3,
+            reserved_workers=1,
+        )
+        starts = {
+            (run.task_id, run.due_at): run.started_at - START for run in report.runs
+        }
+        self.assertEqual(starts[('bulk_2', START)], timedelta(minutes=30))
+        self.assertEqual(
+            starts[('bulk_2', START + timedelta(hours=1))], timedelta(minutes=90)
+        )
+        self.assertEqual(report.n_sla_misses, 0)
+        self.assertEqual(report.peak_concurrency, 3)
+        self.assertEqual(report.max_wait, timedelta(minutes=30))
+
+    def test_year_of_hourly_runs(self) -> None:
+        start = datetime(2025, 1, 1, tzinfo=UTC)
+        tasks = [
+            _Task(
+                task_id=f'task_{i}',
+                scheduler=Scheduler(
+                    [start.replace(minute=i, tzinfo=None)],
+                    SchedulerConfig(
+                        frequency=Frequency.HOURLY,
+                        timezone='UTC',
+                        adjust_to_current_time=False,
+                    ),
+                ),
+            )
+            for i in range(10)
+        ]
+        report = simulate(tasks, start, timedelta(days=365))
+        self.assertEqual(len(report.runs), 10 * 24 * 365)
+        self.assertEqual(report.peak_concurrency, 1)
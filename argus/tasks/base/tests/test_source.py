@@ -0,0 +1,48 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest import TestCase
+
+from argus.tasks.base.source import SharedSource
+
+
+class TestSharedSource(TestCase):
+    def setUp(self) -> None:
+        self.now = 0.0
+        self.calls: list[str] = []
+        self.release = threading.Event()
+
+    def _load(self, url: str) -> tuple[str, ...]:
+        self.calls.append(url)
+        self.release.wait(5)
+        if url == 'broken':
+            raise ValueError(url)
+        return (url,)
+
+    def test_concurrent_callers_share_one_load(self) -> None:
+        source = SharedSource(self._load, ttl=10, clock=lambda: self.now)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            futures = [executor.submit(source, 'a') for _ in range(8)]
+            self.release.set()
+            values = [future.result() for future in futures]
+        self.assertEqual(values, [('a',)] * 8)
+        self.assertEqual(self.calls, ['a'])
+        self.assertEqual(source('b'), ('b',))
+        self.assertEqual(self.calls, ['a', 'b'])
+
+    def test_ttl_and_failures(self) -> None:
+        self.release.set()
+        source = SharedSource(self._load, ttl=10, clock=lambda: self.now)
+        source('a')
+        self.now = 9.9
+        source('a')
+        self.assertEqual(self.calls, ['a'])
+        self.now = 10
+        source('a')
+        self.assertEqual(self.calls, ['a', 'a'])
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                source('broken')
+        self.assertEqual(self.calls, ['a', 'a', 'broken', 'broken'])
+        source.clear()
+        source('a')
+        self.assertEqual(self.calls.count('a'), 3)
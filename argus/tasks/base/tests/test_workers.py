@@ -0,0 +1,116 @@
+import json
+import logging
+import os
+import tempfile
+import time
+from unittest import TestCase
+
+from peewee import SqliteDatabase
+
+from argus.tasks.base.database import MODELS, TaskResult, TaskRun
+from argus.tasks.base.logs import RunLogCaptureHandler
+from argus.tasks.base.serializable import JsonDict, Serializable
+from argus.tasks.base.task import Task
+from argus.tasks.base.workers import (
+    ProcessWorkerPool,
+    TaskTimeoutError,
+    run_with_timeout,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class _Pid(Serializable):
+    def __init__(self, pid: int) -> None:
+        self.pid = pid
+
+    def to_dict(self) -> JsonDict:
+        return super().to_dict() | {'pid': self.pid}
+
+
+class _PidTask(Task[_Pid]):
+    def run(self) -> _Pid:
+        return _Pid(os.getpid())
+
+
+class _ChattyTask(Task[_Pid]):
+    def run(self) -> _Pid:
+        logger.info('running in %d', os.getpid())
+        return _Pid(os.getpid())
+
+
+class _HangingTask(Task[_Pid]):
+    def run(self) -> _Pid:
+        time.sleep(60)
+        return _Pid(os.getpid())
+
+
+class _MemoryHogTask(Task[_Pid]):
+    def run(self) -> _Pid:
+        blocks = [bytearray(1 << 20) for _ in range(1024)]
+        return _Pid(len(blocks))
+
+
+class TestProcessWorkerPool(TestCase):
+    """Workers open the database themselves, so the tests need a file DB."""
+
+    def setUp(self) -> None:
+        handle, self.db_path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+        self.test_db = SqliteDatabase(self.db_path)
+        self.test_db.bind(MODELS)
+        self.test_db.connect()
+        self.test_db.create_tables(MODELS)
+        self.pool = ProcessWorkerPool(size=1, memory_limit=512 << 20)
+
+    def tearDown(self) -> None:
+        self.pool.shutdown()
+        self.test_db.close()
+        os.remove(self.db_path)
+
+    def test_results_are_stored_by_reused_worker(self) -> None:
+        task = _PidTask(task_id='pid')
+        self.pool.execute(task, 'job:1')
+        self.pool.execute(task, 'job:2')
+        pids = [
+            json.loads(result.result)['pid']
+            for result in TaskResult.select().order_by(TaskResult.id)
+        ]
+        self.assertEqual(len(pids), 2)
+        self.assertEqual(pids[0], pids[1])
+        self.assertNotEqual(pids[0], os.getpid())
+
+    def test_worker_logs_are_captured_and_forwarded(self) -> None:
+        root = logging.getLogger()
+        capture_handler = RunLogCaptureHandler()
+        root.addHandler(capture_handler)
+        self.addCleanup(root.removeHandler, capture_handler)
+        self.addCleanup(root.setLevel, root.level)
+        root.setLevel(logging.INFO)
+        with self.assertLogs(logger, logging.INFO) as logs:
+            self.pool.execute(_ChattyTask(task_id='chatty'), 'job:1')
+        pid = json.loads(TaskResult.get().result)['pid']
+        message = f'running in {pid}'
+        self.assertIn(message, [record.getMessage() for record in logs.records])
+        self.assertEqual(vars(logs.records[-1])['task_id'], 'chatty')
+        run = TaskRun.get(TaskRun.task_id == 'chatty')
+        assert run.logs
+        messages = [json.loads(line)['message'] for line in run.logs.splitlines()]
+        self.assertIn(message, messages)
+
+    def test_runaway_runs_are_killed(self) -> None:
+        with self.assertRaises(TaskTimeoutError):
+            self.pool.execute(_HangingTask(task_id='hanging'), timeout=0.5)
+        with self.assertRaisesRegex(RuntimeError, 'MemoryError'):
+            self.pool.execute(_MemoryHogTask(task_id='hog'), timeout=30)
+        self.pool.execute(_PidTask(task_id='pid'), timeout=30)
+        self.assertEqual(TaskResult.select().count(), 1)
+
+
+class TestRunWithTimeout(TestCase):
+    def test_timeout(self) -> None:
+        self.assertEqual(run_with_timeout(lambda: 1, 1), 1)
+        with self.assertRaises(TaskTimeoutError):
+            run_with_timeout(lambda: time.sleep(1), 0.05)
+        with self.assertRaises(ZeroDivisionError):
+            run_with_timeout(lambda: 1 / 0, 1)
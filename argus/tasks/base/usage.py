@@ -0,0 +1,74 @@
+import sys
+import threading
+import time
+from collections.abc import Callable
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import TypeVar
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None  # type: ignore[assignment]
+
+R = TypeVar('R')
+
+# `ru_maxrss` is in kilobytes on Linux and in bytes on macOS.
+_RSS_UNIT = 1 if sys.platform == 'darwin' else 1024
+
+
+@dataclass(slots=True)
+class RunUsage:
+    """Resources used by one run of a task."""
+
+    n_requests: int = 0
+    bytes_downloaded: int = 0
+    cpu_time: float | None = None
+    peak_rss_delta: int | None = None
+    # Hosts that refused, timed out or answered with a server error.
+    failed_hosts: set[str] = field(default_factory=set)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add_response(self, n_bytes: int) -> None:
+        with self._lock:
+            self.n_requests += 1
+            self.bytes_downloaded += n_bytes
+
+    def add_failed_host(self, host: str) -> None:
+        with self._lock:
+            self.failed_hosts.add(host)
+
+
+_current_usage: ContextVar[RunUsage | None] = ContextVar('run_usage', default=None)
+
+
+def current_usage() -> RunUsage | None:
+    """Returns the usage of the run executing in this context, if any."""
+    return _current_usage.get()
+
+
+def _peak_rss() -> int | None:
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * _RSS_UNIT
+
+
+def measure(usage: RunUsage, function: Callable[[], R]) -> R:
+    """Calls `function` with `usage` as the current usage.
+
+    Adds the CPU time of the calling thread and how much the peak RSS of the
+    process grew. Both are read once before and once after the call, so the
+    overhead does not depend on the run. CPU time of threads started by the
+    run is not included.
+    """
+    token = _current_usage.set(usage)
+    cpu_time = time.thread_time()
+    peak_rss = _peak_rss()
+    try:
+        return function()
+    finally:
+        usage.cpu_time = time.thread_time() - cpu_time
+        new_peak_rss = _peak_rss()
+        if peak_rss is not None and new_peak_rss is not None:
+            usage.peak_rss_delta = new_peak_rss - peak_rss
+        _current_usage.reset(token)
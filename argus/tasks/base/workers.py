@@ -0,0 +1,313 @@
+import contextvars
+import importlib
+import json
+import logging
+import multiprocessing
+import pickle
+import queue
+import threading
+import time
+from collections.abc import Callable
+from datetime import datetime
+from multiprocessing.connection import Connection
+from typing import TYPE_CHECKING, Any, TypeVar
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None  # type: ignore[assignment]
+
+from peewee import SqliteDatabase
+
+from argus.logger_setup import setup_worker_logging
+from argus.tasks.base.database import MODELS, TaskResult, get_current_utc_time
+from argus.tasks.base.journal import Outcome, record_run
+from argus.tasks.base.logs import RunLogCaptureHandler
+from argus.tasks.base.usage import RunUsage
+
+if TYPE_CHECKING:
+    from argus.tasks.base.task import Task
+
+logger = logging.getLogger(__name__)
+
+R = TypeVar('R')
+
+
+class TaskTimeoutError(Exception):
+    pass
+
+
+class WorkerCrashedError(Exception):
+    pass
+
+
+def run_with_timeout(function: Callable[[], R], timeout: float) -> R:
+    """Calls `function` on a helper thread and waits at most `timeout` seconds.
+
+    A thread cannot be killed, so on timeout it is abandoned and its result
+    is discarded. The abandoned thread keeps running, though, and can still
+    write state afterwards, e.g. `save_state(self.session_key, ...)` racing
+    the next run. Use `ProcessWorkerPool` for runs that must be stopped.
+    """
+    outcome: list[tuple[bool, Any]] = []
+    # The thread runs in a copy of the context, to keep the log context.
+    context = contextvars.copy_context()
+
+    def target() -> None:
+        database = TaskResult._meta.database  # pylint: disable=protected-access
+        try:
+            outcome.append((True, function()))
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            outcome.append((False, exc))
+        finally:
+            if not database.is_closed():
+                database.close()
+
+    thread = threading.Thread(
+        target=context.run, args=(target,), daemon=True, name='task-timeout'
+    )
+    thread.start()
+    thread.join(timeout)
+    if not outcome:
+        raise TaskTimeoutError(f'Timed out after {timeout:g} s')
+    succeeded, value = outcome[0]
+    if not succeeded:
+        raise value
+    return value
+
+
+def _limit_memory(memory_limit: int | None) -> None:
+    if resource is None or memory_limit is None:
+        return
+    _soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        memory_limit = min(memory_limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (memory_limit, hard))
+
+
+def _limit_cpu(cpu_limit: float | None) -> None:
+    """Allows `cpu_limit` more CPU seconds; the worker gets SIGXCPU after."""
+    if resource is None or cpu_limit is None:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    limit = int(usage.ru_utime + usage.ru_stime + cpu_limit) + 1
+    _soft, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (limit, hard))
+
+
+def _drain(log_queue: queue.SimpleQueue) -> list[logging.LogRecord]:
+    records = []
+    while not log_queue.empty():
+        records.append(log_queue.get())
+    return records
+
+
+def _send_reply(
+    connection: Connection, error: str | None, log_queue: queue.SimpleQueue
+) -> None:
+    """Sends the outcome of a run with the records logged since the last one."""
+    records = _drain(log_queue)
+    try:
+        connection.send((error, records))
+    except (pickle.PicklingError, TypeError, AttributeError):
+        # A record carried an `extra` value that cannot be pickled.
+        connection.send((error, []))
+
+
+def _worker_main(
+    connection: Connection,
+    database_path: str,
+    memory_limit: int | None,
+    cpu_limit: float | None,
+    log_level: int,
+    capture_runs: bool,
+) -> None:
+    # Imported here, as the task module imports this one.
+    from argus.tasks.base.task import Task  # pylint: disable=import-outside-toplevel
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    setup_worker_logging(log_queue, log_level, capture_runs)
+    _limit_memory(memory_limit)
+    SqliteDatabase(database_path).bind(MODELS)
+    while True:
+        try:
+            module, serialized_task, run_key, use_outbox = connection.recv()
+        except EOFError:
+            return
+        _limit_cpu(cpu_limit)
+        try:
+            importlib.import_module(module)
+            task: Task = Task.from_dict(json.loads(serialized_task))
+            task.use_outbox = use_outbox
+            task.execute(run_key=run_key)
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            logger.exception('Isolated run failed')
+            _send_reply(connection, repr(exc), log_queue)
+        else:
+            _send_reply(connection, None, log_queue)
+
+
+def _handle_records(records: list[logging.LogRecord]) -> None:
+    """Passes records logged by a worker to the handlers of this process."""
+    for record in records:
+        record_logger = logging.getLogger(record.name)
+        if record_logger.isEnabledFor(record.levelno):
+            record_logger.handle(record)
+
+
+def _record_lost_run(
+    task: 'Task',
+    run_key: str | None,
+    started_at: datetime,
+    started: float,
+    outcome: Outcome,
+    error: Exception,
+) -> None:
+    """Journals a run whose worker was killed before it could."""
+    record_run(
+        task.task_id,
+        started_at,
+        time.monotonic() - started,
+        outcome,
+        RunUsage(),
+        run_key,
+        repr(error),
+    )
+
+
+class _Worker:
+    def __init__(
+        self,
+        context: Any,
+        database_path: str,
+        memory_limit: int | None,
+        cpu_limit: float | None,
+    ) -> None:
+        root = logging.getLogger()
+        capture_runs = any(
+            isinstance(handler, RunLogCaptureHandler) for handler in root.handlers
+        )
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main,
+            args=(
+                child_connection,
+                database_path,
+                memory_limit,
+                cpu_limit,
+                root.getEffectiveLevel(),
+                capture_runs,
+            ),
+            name='task-worker',
+            daemon=True,
+        )
+        self.process.start()
+        child_connection.close()
+
+    def is_alive(self) -> bool:
+        return self.process.is_alive()
+
+    def kill(self) -> None:
+        self.process.kill()
+        self.process.join()
+        self.connection.close()
+
+
+class ProcessWorkerPool:
+    """Executes tasks in reusable worker processes.
+
+    Each worker is limited to `memory_limit` bytes of address space and to
+    `cpu_limit` CPU seconds per run. A run that exceeds `timeout` is killed
+    with its worker. So is a worker that crashes. Either way a failure is
+    raised and the worker is replaced on the next run. Workers are started on
+    first use and kept between runs, so only those runs pay the spawn cost.
+
+    Workers open the same SQLite file as the manager and store results
+    themselves, so tasks keep state between `run` and `save_result`. They
+    capture the logs of runs if this process does, and send the records they
+    log back with the outcome of each run, to be handled here. The records of
+    a killed run are lost.
+    """
+
+    def __init__(
+        self,
+        size: int = 2,
+        memory_limit: int | None = 1 << 30,
+        cpu_limit: float | None = 600,
+        start_method: str = 'spawn',
+    ) -> None:
+        self._context = multiprocessing.get_context(start_method)
+        self._memory_limit = memory_limit
+        self._cpu_limit = cpu_limit
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._idle: list[_Worker] = []
+
+    def _acquire(self) -> _Worker:
+        with self._lock:
+            while self._idle:
+                worker = self._idle.pop()
+                if worker.is_alive():
+                    return worker
+                worker.kill()
+        database = TaskResult._meta.database  # pylint: disable=protected-access
+        if database.database == ':memory:':
+            raise RuntimeError('Isolated tasks need a database file')
+        return _Worker(
+            self._context, database.database, self._memory_limit, self._cpu_limit
+        )
+
+    def execute(
+        self, task: 'Task', run_key: str | None = None, timeout: float | None = None
+    ) -> None:
+        """Executes the task in a worker, raising if it fails or times out."""
+        message = (
+            type(task).__module__,
+            json.dumps(task.to_dict()),
+            run_key,
+            task.use_outbox,
+        )
+        with self._slots:
+            worker = self._acquire()
+            started_at = get_current_utc_time()
+            started = time.monotonic()
+            try:
+                worker.connection.send(message)
+                if not worker.connection.poll(timeout):
+                    worker.kill()
+                    timeout_error = TaskTimeoutError(f'Killed after {timeout:g} s')
+                    _record_lost_run(
+                        task,
+                        run_key,
+                        started_at,
+                        started,
+                        Outcome.TIMEOUT,
+                        timeout_error,
+                    )
+                    raise timeout_error
+                error, records = worker.connection.recv()
+            except (EOFError, OSError) as exc:
+                worker.kill()
+                crash_error = WorkerCrashedError(
+                    f'Worker exited with code {worker.process.exitcode}'
+                )
+                _record_lost_run(
+                    task, run_key, started_at, started, Outcome.FAILURE, crash_error
+                )
+                raise crash_error from exc
+            with self._lock:
+                self._idle.append(worker)
+        _handle_records(records)
+        if error is not None:
+            raise RuntimeError(error)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            workers, self._idle = self._idle, []
+        for worker in workers:
+            worker.connection.close()
+            worker.process.join(timeout=5)
+            if worker.is_alive():
+                worker.kill()
@@ -1,39 +1,57 @@
 import re
 import time
-from dataclasses import asdict, dataclass
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 
-import pandas as pd
-import requests
-from bs4 import BeautifulSoup
-from telegram.helpers import escape_markdown
-
-from argus.tasks.base.format_utils import dataframe_to_str
+from argus.tasks.base import http
+from argus.tasks.base.format_utils import table_to_str
 from argus.tasks.base.notifier import DataFormatter
-from argus.tasks.base.serializable import JsonDict, Serializable
+from argus.tasks.base.serializable import JsonDict, RecordList
+from argus.tasks.base.state import load_state, save_state
 from argus.tasks.base.task import ChangeDetectingTask
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class BillEntry:
     name: str
     id: str
     amount: float
 
 
-class Bills(list[BillEntry], Serializable):
-    def to_dict(self) -> JsonDict:
-        return super().to_dict() | {'bills': [asdict(entry) for entry in self]}
+class Bills(RecordList[BillEntry]):
+    ITEM_TYPE = BillEntry
+    ITEMS_KEY = 'bills'
+    WITH_CLASS_NAME = True
 
-    @classmethod
-    def from_dict(cls, data: JsonDict) -> 'Bills':
-        return Bills([BillEntry(**entry) for entry in data['bills']])
+
+class SessionExpiredError(Exception):
+    pass
 
 
 class EpayClient:
-    def __init__(self, username: str, password: str) -> None:
-        self.session = requests.Session()
+    """ePay client that keeps its session between runs.
+
+    The cookies of a previous session can be passed in and exported again
+    with `export_cookies`, so a run only logs in when they have expired.
+    Bills are read `page_size` rows at a time; once the first page is full
+    the following pages are fetched `max_workers` at a time.
+    """
+
+    def __init__(
+        self,
+        username: str,
+        password: str,
+        cookies: list[JsonDict] | None = None,
+        page_size: int = 50,
+        max_workers: int = 4,
+        timeout: float = 60,
+    ) -> None:
+        self.session = http.session()
         self.username = username
         self.password = password
+        self.page_size = page_size
+        self.max_workers = max_workers
+        self.timeout = timeout
         self.base_url = 'https://www.epay.bg'
         self.headers = {
             'User-Agent': (
@@ -44,21 +62,38 @@ class EpayClient:
             'Origin': self.base_url,
             'Referer': f'{self.base_url}/v3main/login',
         }
+        for cookie in cookies or []:
+            self.session.cookies.set(**cookie)
 
     def __enter__(self):
-        """Logs in to ePay upon entering the context."""
-        if not self.login():
-            raise RuntimeError('Failed to log in.')
+        """Logs in to ePay unless a previous session is being reused."""
+        if not self.session.cookies:
+            self.ensure_login()
         return self  # Returns the instance for use within the 'with' block
 
     def __exit__(self, exc_type, exc_val, exc_tb) -> None:
-        """Logs out of ePay upon exiting the context."""
-        self.logout()
+        """Closes the connections but stays logged in for the next run."""
+        self.session.close()
+
+    def export_cookies(self) -> list[JsonDict]:
+        return [
+            {
+                'name': cookie.name,
+                'value': cookie.value,
+                'domain': cookie.domain,
+                'path': cookie.path,
+                'expires': cookie.expires,
+                'secure': cookie.secure,
+            }
+            for cookie in self.session.cookies
+        ]
 
     def get_login_salt(self) -> str:
         """Fetches the login salt required for logging in."""
+        from bs4 import BeautifulSoup  # pylint: disable=import-outside-toplevel
+
         url = f'{self.base_url}/v3main/front'
-        response = self.session.get(url, headers=self.headers)
+        response = self.session.get(url, headers=self.headers, timeout=self.timeout)
         soup = BeautifulSoup(response.text, 'html.parser')
         login_salt_input = soup.find('input', {'name': 'loginsalt'})
         assert login_salt_input
@@ -78,14 +113,21 @@ class EpayClient:
             'submit': 'Вход в ePay.bg',
         }
 
-        response = self.session.post(url, data=login_data, headers=self.headers)
+        response = self.session.post(
+            url, data=login_data, headers=self.headers, timeout=self.timeout
+        )
         return response.ok  # Returns True if login was successful, False otherwise
 
-    def get_bills(self, rows: int = 10, page_num: int = 1) -> Bills:
-        """Fetches a list of bills after successful login."""
+    def ensure_login(self) -> None:
+        self.session.cookies.clear()
+        if not self.login():
+            raise RuntimeError('Failed to log in.')
+
+    def get_page(self, page_num: int) -> list[BillEntry]:
+        """Fetches one page of bills, raising `SessionExpiredError` if logged out."""
         bills_url = f'{self.base_url}/v3main/bills/list'
         bills_data = {
-            'rows': str(rows),
+            'rows': str(self.page_size),
             'action': 'init',
             'grid_type': 'default',
             'page_num': str(page_num),
@@ -104,9 +146,18 @@ class EpayClient:
             }
         )
 
-        response = self.session.post(bills_url, data=bills_data, headers=bills_headers)
-        assert response.ok
-        data = response.json()
+        response = self.session.post(
+            bills_url, data=bills_data, headers=bills_headers, timeout=self.timeout
+        )
+        try:
+            data = response.json() if response.ok else None
+        except ValueError:
+            # An expired session is redirected to the login page.
+            data = None
+        if not isinstance(data, dict) or 'DATA' not in data:
+            raise SessionExpiredError(
+                f'Unexpected bills response: {response.status_code}'
+            )
         bills = []
         for bill_entry in data['DATA']:
             float_match = re.search(r'\d+\.\d+', bill_entry['BILL_STATUS_DESC'])
@@ -118,30 +169,83 @@ class EpayClient:
                     amount=amount,
                 )
             )
-        return Bills(bills)
+        return bills
+
+    def get_bills(self) -> Bills:
+        """Fetches every page of bills, logging in again once if needed."""
+        try:
+            return self._get_all_pages()
+        except SessionExpiredError:
+            self.ensure_login()
+            return self._get_all_pages()
+
+    def _get_all_pages(self) -> Bills:
+        bills = self.get_page(1)
+        if len(bills) < self.page_size:
+            return Bills(bills)
+        next_page = 2
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while True:
+                pages = list(
+                    executor.map(
+                        self.get_page, range(next_page, next_page + self.max_workers)
+                    )
+                )
+                for page in pages:
+                    bills.extend(page)
+                    if len(page) < self.page_size:
+                        return Bills(bills)
+                next_page += self.max_workers
 
     def logout(self) -> bool:
         """Logs out of the ePay session."""
         logout_url = f'{self.base_url}/v3main/logout'
-        response = self.session.get(logout_url, headers=self.headers)
+        response = self.session.get(
+            logout_url, headers=self.headers, timeout=self.timeout
+        )
         return response.ok  # Returns True if logout was successful
 
 
 class EPayTask(ChangeDetectingTask[Bills]):
-    def __init__(self, username: str, password: str, *args, **kwargs) -> None:
+    """Reports changes in the ePay bills of an account.
+
+    The session cookies are kept in the state store, so in steady state a run
+    is a single request for the bills. Runs are isolated in a worker process,
+    so a run that times out cannot keep writing the session state afterwards.
+    """
+
+    ISOLATED = True
+    SOURCES = ('www.epay.bg',)
+
+    def __init__(
+        self, username: str, password: str, *args, page_size: int = 50, **kwargs
+    ) -> None:
         super().__init__(*args, **kwargs)
         self._username = username
         self._password = password
+        self.page_size = page_size
+
+    @property
+    def session_key(self) -> str:
+        return f'{self.task_id}:epay_session'
 
     def run(self) -> Bills:
-        with EpayClient(self._username, self._password) as epay_client:
+        state = load_state(self.session_key)
+        cookies = state['cookies'] if state else None
+        with EpayClient(
+            self._username, self._password, cookies=cookies, page_size=self.page_size
+        ) as epay_client:
             bills = epay_client.get_bills()
+            new_cookies = epay_client.export_cookies()
+        if new_cookies != cookies:
+            save_state(self.session_key, {'cookies': new_cookies})
         return bills
 
     def to_dict(self) -> JsonDict:
         return super().to_dict() | {
             'username': self._username,
             'password': self._password,
+            'page_size': self.page_size,
         }
 
     @classmethod
@@ -149,21 +253,27 @@ class EPayTask(ChangeDetectingTask[Bills]):
         return EPayTask(
             username=data['username'],
             password=data['password'],
+            page_size=data.get('page_size', 50),
             **cls.serialize_parameters(data),
         )
 
 
 class EPayMarkdownFormatter(DataFormatter[Bills]):
     def format(self, data: Bills) -> str:
-        df = pd.DataFrame(data.to_dict()['bills'], columns=['name', 'id', 'amount'])
-        df = df[df.amount > 0]
-        df = df.sort_values('name')
-        df['id'] = df['id'].str[-8:]
-        df = pd.concat(
-            [df, pd.DataFrame([{'name': 'Total', 'id': '', 'amount': df.amount.sum()}])]
-        ).reset_index(drop=True)
+        # pylint: disable=import-outside-toplevel
+        from telegram.helpers import escape_markdown
+
+        # Amounts stay ints only when every bill has an int amount.
+        to_amount = (
+            float if any(isinstance(entry.amount, float) for entry in data) else int
+        )
+        bills = sorted(
+            (entry for entry in data if entry.amount > 0), key=lambda entry: entry.name
+        )
+        rows = [[entry.name, entry.id[-8:], to_amount(entry.amount)] for entry in bills]
+        rows.append(['Total', '', sum((row[2] for row in rows), to_amount(0))])
         return (
             '💸 *Bills* 💸\n```\n'
-            + escape_markdown(dataframe_to_str(df), version=2)
+            + escape_markdown(table_to_str(rows, ['name', 'id', 'amount']), version=2)
             + '\n```'
         )
@@ -1,17 +1,17 @@
-from dataclasses import asdict, dataclass
+import math
+from dataclasses import dataclass
 from enum import Enum
 
-import pandas as pd
-import requests
-from bs4 import BeautifulSoup
-
-from argus.tasks.base.format_utils import dataframe_to_str
+from argus.tasks.base import http
+from argus.tasks.base.format_utils import table_to_str
+from argus.tasks.base.job_queue import Priority
 from argus.tasks.base.notifier import DataFormatter
-from argus.tasks.base.serializable import JsonDict, Serializable
+from argus.tasks.base.serializable import JsonDict, RecordList
+from argus.tasks.base.source import shared_source
 from argus.tasks.base.task import Task
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Repo:
     description: str
     n_stars: int
@@ -31,16 +31,53 @@ class RepoLanguage(Enum):
     JUPYTER = 'Jupyter Notebook'
 
 
-class Repos(list[Repo], Serializable):
-    def to_dict(self) -> JsonDict:
-        return {'repos': [asdict(repo) for repo in self]}
-
-    @classmethod
-    def from_dict(cls, data: JsonDict) -> 'Repos':
-        return Repos([Repo(**repo) for repo in data['repos']])
+class Repos(RecordList[Repo]):
+    ITEM_TYPE = Repo
+    ITEMS_KEY = 'repos'
+    METRIC_KEY = 'url'
+    METRIC_FIELDS = ('n_stars', 'n_recent_stars')
+
+
+@shared_source()
+def fetch_trending_repos(date_range: str) -> tuple[Repo, ...]:
+    """Scrapes GitHub trending once for all tasks with the same date range."""
+    from bs4 import BeautifulSoup  # pylint: disable=import-outside-toplevel
+
+    soup = BeautifulSoup(
+        http.get(
+            f'https://github.com/trending?since={date_range}',
+            timeout=300,
+        ).text,
+        features='html.parser',
+    )
+    repos = []
+    for article in soup.find_all('article', {'class': 'Box-row'}):
+        name_element = article.find('span', {'class': 'text-normal'}).parent
+        description_element = article.find('p')
+        description = description_element.text if description_element else ''
+        n_stars_element, recent_stars_element = article.find_all(
+            'a', {'class': 'Link--muted'}
+        )
+        n_stars = n_stars_element.text.strip().replace(',', '')
+        n_recent_stars = recent_stars_element.text.strip().replace(',', '')
+        language_element = article.find('span', {'itemprop': 'programmingLanguage'})
+        language = language_element.text if language_element else ''
+        repos.append(
+            Repo(
+                description=description,
+                n_stars=int(n_stars),
+                n_recent_stars=int(n_recent_stars),
+                language=language,
+                url='https://github.com' + name_element['href'],
+            )
+        )
+    return tuple(repos)
 
 
 class TrendingGithubReposTask(Task[Repos]):
+    PRIORITY = Priority.BULK
+    TIMEOUT = 600
+    SOURCES = ('github.com',)
     LIMIT = 10
 
     def __init__(
@@ -56,38 +93,10 @@ class TrendingGithubReposTask(Task[Repos]):
         )
 
     def run(self) -> Repos:
-        soup = BeautifulSoup(
-            requests.get(
-                f'https://github.com/trending?since={self.date_range}',
-                timeout=300,
-            ).text,
-            features='html.parser',
-        )
-        articles = soup.find_all('article', {'class': 'Box-row'})
-        repos = []
-        for article in articles:
-            name_element = article.find('span', {'class': 'text-normal'}).parent
-            description_element = article.find('p')
-            description = description_element.text if description_element else ''
-            n_stars_element, recent_stars_element = article.find_all(
-                'a', {'class': 'Link--muted'}
-            )
-            n_stars = n_stars_element.text.strip().replace(',', '')
-            n_recent_stars = recent_stars_element.text.strip().replace(',', '')
-            language_element = article.find('span', {'itemprop': 'programmingLanguage'})
-            language = language_element.text if language_element else ''
-            if self.languages and language not in self.languages:
-                continue
-            repos.append(
-                Repo(
-                    description=description,
-                    n_stars=int(n_stars),
-                    n_recent_stars=int(n_recent_stars),
-                    language=language,
-                    url='https://github.com' + name_element['href'],
-                )
-            )
-        return Repos(repos)
+        repos = fetch_trending_repos(self.date_range)
+        if self.languages:
+            repos = tuple(repo for repo in repos if repo.language in self.languages)
+        return Repos(list(repos))
 
     def to_dict(self) -> JsonDict:
         return super().to_dict() | {
@@ -110,14 +119,22 @@ class TrendingGithubReposTask(Task[Repos]):
         )
 
 
+def _star_gain(repo: Repo) -> float:
+    if repo.n_stars:
+        return repo.n_recent_stars / repo.n_stars
+    return math.inf if repo.n_recent_stars else -math.inf
+
+
 class GithubSlackFormatter(DataFormatter[Repos]):
     TOP_K = 10
 
     def format(self, data: Repos) -> str:
-        df = pd.DataFrame(data.to_dict()['repos'])
-        df['gain'] = df['n_recent_stars'] / df['n_stars']
-        df = df.sort_values('gain', ascending=False)
-        df['description'] = df.description.str.strip()
-        df = df[['url', 'description', 'n_stars', 'n_recent_stars']]
-        df['description'] = df['description'].apply(lambda s: s[:75])
-        return '🐙 *Github Repos*\n```' + dataframe_to_str(df) + '```'
+        rows = [
+            [repo.url, repo.description.strip()[:75], repo.n_stars, repo.n_recent_stars]
+            for repo in sorted(data, key=_star_gain, reverse=True)
+        ]
+        return (
+            '🐙 *Github Repos*\n```'
+            + table_to_str(rows, ['url', 'description', 'n_stars', 'n_recent_stars'])
+            + '```'
+        )
@@ -1,112 +1,199 @@
-from dataclasses import asdict, dataclass
-from datetime import datetime, timedelta
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
 
-import pandas as pd
-import requests
-from bs4 import BeautifulSoup
-
-from argus.tasks.base.format_utils import dataframe_to_str
+from argus.tasks.base import http
+from argus.tasks.base.format_utils import table_to_str
+from argus.tasks.base.job_queue import Priority
 from argus.tasks.base.notifier import DataFormatter
-from argus.tasks.base.serializable import JsonDict, Serializable
+from argus.tasks.base.serializable import JsonDict, RecordList
+from argus.tasks.base.source import shared_source
+from argus.tasks.base.state import delete_states_before, load_states, save_states
 from argus.tasks.base.task import Task
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class ModelInfo:
     model_id: str
     n_likes: int
     n_downloads: int
 
 
-class TrendingModelsData(list[ModelInfo], Serializable):
-    def to_dict(self) -> JsonDict:
-        return {'models': [asdict(model_info) for model_info in self]}
-
-    @classmethod
-    def from_dict(cls, data: JsonDict) -> 'TrendingModelsData':
-        return TrendingModelsData([ModelInfo(**entry) for entry in data['models']])
+class TrendingModelsData(RecordList[ModelInfo]):
+    ITEM_TYPE = ModelInfo
+    ITEMS_KEY = 'models'
+    METRIC_KEY = 'model_id'
+    METRIC_FIELDS = ('n_likes', 'n_downloads')
+
+
+@shared_source()
+def fetch_trending_models(limit: int) -> tuple[ModelInfo, ...]:
+    response = http.get(
+        f'https://huggingface.co/api/trending?limit={limit}&type=model',
+        timeout=300,
+    ).json()
+    return tuple(
+        ModelInfo(
+            model_id=sample['repoData']['id'],
+            n_likes=sample['repoData']['likes'],
+            n_downloads=sample['repoData']['downloads'],
+        )
+        for sample in response['recentlyTrending']
+    )
 
 
 class HuggingFaceTrendingModelsTask(Task[TrendingModelsData]):
+    PRIORITY = Priority.BULK
+    TIMEOUT = 600
+    SOURCES = ('huggingface.co',)
     LIMIT = 10
 
     def run(self) -> TrendingModelsData:
-        response = requests.get(
-            f'https://huggingface.co/api/trending?limit={self.LIMIT}&type=model',
-            timeout=300,
-        ).json()
-        return TrendingModelsData(
-            [
-                ModelInfo(
-                    model_id=sample['repoData']['id'],
-                    n_likes=sample['repoData']['likes'],
-                    n_downloads=sample['repoData']['downloads'],
-                )
-                for sample in response['recentlyTrending']
-            ]
-        )
+        return TrendingModelsData(list(fetch_trending_models(self.LIMIT)))
 
 
 class HuggingFaceModelFormatter(DataFormatter[TrendingModelsData]):
     TOP_K = 10
 
     def format(self, data: TrendingModelsData) -> str:
-        df = pd.DataFrame(data.to_dict()['models'])
-        df = df.sort_values('n_likes', ascending=False)
-        df['model_id'] = 'https://huggingface.co/' + df['model_id'].str.lstrip('/')
-        df = df.iloc[: self.TOP_K]
-        return '🤗 *HuggingFace Trending Models*\n```' + dataframe_to_str(df) + '```'
+        models = sorted(data, key=lambda model: model.n_likes, reverse=True)
+        rows = [
+            [
+                'https://huggingface.co/' + model.model_id.lstrip('/'),
+                model.n_likes,
+                model.n_downloads,
+            ]
+            for model in models[: self.TOP_K]
+        ]
+        return (
+            '🤗 *HuggingFace Trending Models*\n```'
+            + table_to_str(rows, ['model_id', 'n_likes', 'n_downloads'])
+            + '```'
+        )
 
 
-@dataclass(frozen=True, order=True)
+@dataclass(frozen=True, order=True, slots=True)
 class Paper:
     url: str
     title: str
     n_likes: int
 
 
-class Papers(list[Paper], Serializable):
-    def to_dict(self) -> JsonDict:
-        return {'papers': [asdict(paper) for paper in self]}
+class Papers(RecordList[Paper]):
+    ITEM_TYPE = Paper
+    ITEMS_KEY = 'papers'
+    METRIC_KEY = 'url'
+    METRIC_FIELDS = ('n_likes',)
 
-    @classmethod
-    def from_dict(cls, data: JsonDict) -> 'Papers':
-        return Papers([Paper(**entry) for entry in data['papers']])
+
+@shared_source()
+def fetch_daily_papers(day: str) -> tuple[Paper, ...]:
+    """Scrapes the papers listed for one `YYYY-MM-DD` date."""
+    from bs4 import BeautifulSoup  # pylint: disable=import-outside-toplevel
+
+    url = f'https://huggingface.co/papers?date={day}'
+    soup = BeautifulSoup(http.get(url, timeout=300).text, features='lxml')
+    papers = []
+    for div in soup.find_all(
+        lambda tag: (
+            tag.name == 'article'
+            and tag.get('class')
+            and {'flex', 'flex-col'} <= set(tag.get('class'))
+        )
+    ):
+        parent = div.find('div', {'class': 'w-full'})
+        a = parent.find('a', {'class': 'cursor-pointer'})
+        n_likes = parent.find('div', {'class': 'leading-none'}).text.strip()
+        n_likes = int(n_likes) if n_likes.isdigit() else 0
+        papers.append(Paper(url=a['href'], title=a.text.strip(), n_likes=n_likes))
+    return tuple(papers)
 
 
 class HuggingFaceTrendingPapersTask(Task[Papers]):
+    """Collects the papers of the last `last_n_days` daily pages.
+
+    Parsed pages are cached per task and date in the state store, so tasks
+    with different windows do not prune each other's pages. Only pages that are
+    missing, or that were fetched within `refresh_days` of their date while
+    likes were still coming in, are fetched again, so a daily run costs about
+    `refresh_days` requests however long the window is.
+    """
+
+    PRIORITY = Priority.BULK
+    TIMEOUT = 600
+    SOURCES = ('huggingface.co',)
     LIMIT = 10
     LAST_N_DAYS = 7
+    REFRESH_DAYS = 2
+    PAGE_KEY = 'hf_papers:{task_id}:{date}'
+
+    def __init__(
+        self,
+        last_n_days: int = LAST_N_DAYS,
+        refresh_days: int = REFRESH_DAYS,
+        **kwargs,
+    ) -> None:
+        super().__init__(**kwargs)
+        self.last_n_days = last_n_days
+        self.refresh_days = refresh_days
 
     def run(self) -> Papers:
-        current_date = datetime.now()
+        today = datetime.now().date()
+        refresh = timedelta(days=self.refresh_days)
+        keys = {
+            self.PAGE_KEY.format(task_id=self.task_id, date=day.isoformat()): day
+            for day in (
+                today - timedelta(days=days_delta)
+                for days_delta in range(1, self.last_n_days + 1)
+            )
+        }
+        pages = load_states(keys)
         papers: list[Paper] = []
-        for days_delta in range(1, self.LAST_N_DAYS + 1):
-            date = current_date - timedelta(days=days_delta)
-            url = date.strftime('https://huggingface.co/papers?date=%Y-%m-%d')
-            soup = BeautifulSoup(requests.get(url, timeout=300).text, features='lxml')
-            for div in soup.find_all(
-                lambda tag: tag.name == 'article'
-                and tag.get('class')
-                and {'flex', 'flex-col'} <= set(tag.get('class'))
-            ):
-                parent = div.find('div', {'class': 'w-full'})
-                a = parent.find('a', {'class': 'cursor-pointer'})
-                n_likes = parent.find('div', {'class': 'leading-none'}).text.strip()
-                n_likes = int(n_likes) if n_likes.isdigit() else 0
-                papers.append(
-                    Paper(url=a['href'], title=a.text.strip(), n_likes=n_likes)
-                )
+        fetched: dict[str, JsonDict] = {}
+        for key, day in keys.items():
+            page = pages.get(key)
+            if page is None or date.fromisoformat(page['fetched_on']) - day <= refresh:
+                page = fetched[key] = {'fetched_on': today.isoformat()} | Papers(
+                    list(fetch_daily_papers(day.isoformat()))
+                ).to_dict()
+            papers.extend(Papers.from_dict(page))
+        save_states(fetched)
+        delete_states_before(
+            self.PAGE_KEY.format(task_id=self.task_id, date=''),
+            (today - timedelta(days=self.last_n_days)).isoformat(),
+        )
 
         return Papers(sorted(set(papers)))
 
+    def to_dict(self) -> JsonDict:
+        return super().to_dict() | {
+            'last_n_days': self.last_n_days,
+            'refresh_days': self.refresh_days,
+        }
+
+    @classmethod
+    def from_dict(cls, data: JsonDict) -> 'HuggingFaceTrendingPapersTask':
+        return HuggingFaceTrendingPapersTask(
+            last_n_days=data.get('last_n_days', cls.LAST_N_DAYS),
+            refresh_days=data.get('refresh_days', cls.REFRESH_DAYS),
+            **cls.serialize_parameters(data),
+        )
+
 
 class HuggingFacePapersFormatter(DataFormatter[Papers]):
     TOP_K = 10
 
     def format(self, data: Papers) -> str:
-        df = pd.DataFrame(data.to_dict()['papers'])
-        df = df.sort_values('n_likes', ascending=False)
-        df['url'] = 'https://huggingface.co/' + df['url'].str.lstrip('/')
-        df = df.iloc[: self.TOP_K]
-        return '🤗 *HuggingFace Trending Papers*\n```' + dataframe_to_str(df) + '```'
+        papers = sorted(data, key=lambda paper: paper.n_likes, reverse=True)
+        rows = [
+            [
+                'https://huggingface.co/' + paper.url.lstrip('/'),
+                paper.title,
+                paper.n_likes,
+            ]
+            for paper in papers[: self.TOP_K]
+        ]
+        return (
+            '🤗 *HuggingFace Trending Papers*\n```'
+            + table_to_str(rows, ['url', 'title', 'n_likes'])
+            + '```'
+        )
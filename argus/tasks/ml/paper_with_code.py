@@ -1,16 +1,15 @@
-from dataclasses import asdict, dataclass
+from dataclasses import dataclass
 
-import pandas as pd
-import requests
-from bs4 import BeautifulSoup
-
-from argus.tasks.base.format_utils import dataframe_to_str
+from argus.tasks.base import http
+from argus.tasks.base.format_utils import table_to_str
+from argus.tasks.base.job_queue import Priority
 from argus.tasks.base.notifier import DataFormatter
-from argus.tasks.base.serializable import JsonDict, Serializable
+from argus.tasks.base.serializable import RecordList
+from argus.tasks.base.source import shared_source
 from argus.tasks.base.task import Task
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Paper:
     title: str
     stars: int
@@ -18,49 +17,59 @@ class Paper:
     url: str
 
 
-class Papers(list[Paper], Serializable):
-    def to_dict(self) -> JsonDict:
-        return {'papers': [asdict(paper) for paper in self]}
+class Papers(RecordList[Paper]):
+    ITEM_TYPE = Paper
+    ITEMS_KEY = 'papers'
+    METRIC_KEY = 'url'
+    METRIC_FIELDS = ('stars', 'stars_per_hour')
+
 
-    @classmethod
-    def from_dict(cls, data: JsonDict) -> 'Papers':
-        return Papers([Paper(**entry) for entry in data['papers']])
+@shared_source()
+def fetch_trending_papers() -> tuple[Paper, ...]:
+    from bs4 import BeautifulSoup  # pylint: disable=import-outside-toplevel
+
+    soup = BeautifulSoup(
+        http.get('https://paperswithcode.com/', timeout=300).text,
+        features='html.parser',
+    )
+    return tuple(
+        Paper(
+            title=item.find('h1').text.strip(),
+            stars=int(
+                item.find('span', {'class': 'badge-secondary'})
+                .text.strip()
+                .replace(',', '')
+            ),
+            stars_per_hour=float(
+                item.find('div', {'class': 'stars-accumulated'}).text.strip().split()[0]
+            ),
+            url='https://paperswithcode.com' + item.find('a')['href'],
+        )
+        for item in soup.find_all('div', {'class': 'infinite-item'})
+    )
 
 
 class TrendingPapersWithCodeTask(Task[Papers]):
+    PRIORITY = Priority.BULK
+    TIMEOUT = 600
+    SOURCES = ('paperswithcode.com',)
     LIMIT = 10
 
     def run(self) -> Papers:
-        soup = BeautifulSoup(
-            requests.get('https://paperswithcode.com/', timeout=300).text,
-            features='html.parser',
-        )
-        return Papers(
-            [
-                Paper(
-                    title=item.find('h1').text.strip(),
-                    stars=int(
-                        item.find('span', {'class': 'badge-secondary'})
-                        .text.strip()
-                        .replace(',', '')
-                    ),
-                    stars_per_hour=float(
-                        item.find('div', {'class': 'stars-accumulated'})
-                        .text.strip()
-                        .split()[0]
-                    ),
-                    url='https://paperswithcode.com' + item.find('a')['href'],
-                )
-                for item in soup.find_all('div', {'class': 'infinite-item'})
-            ]
-        )
+        return Papers(list(fetch_trending_papers()))
 
 
 class PapersWithCodeSlackFormatter(DataFormatter[Papers]):
     TOP_K = 10
 
     def format(self, data: Papers) -> str:
-        df = pd.DataFrame(data.to_dict()['papers'])
-        df = df.sort_values('stars', ascending=False)
-        df = df.iloc[: self.TOP_K]
-        return '📝 *PaperWithCode Trending Papers*\n```' + dataframe_to_str(df) + '```'
+        papers = sorted(data, key=lambda paper: paper.stars, reverse=True)
+        rows = [
+            [paper.title, paper.stars, paper.stars_per_hour, paper.url]
+            for paper in papers[: self.TOP_K]
+        ]
+        return (
+            '📝 *PaperWithCode Trending Papers*\n```'
+            + table_to_str(rows, ['title', 'stars', 'stars_per_hour', 'url'])
+            + '```'
+        )
@@ -2,21 +2,22 @@ import logging
 import re
 from abc import ABC, abstractmethod
 from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from urllib.parse import urlparse
 
-import pandas as pd
-import requests
-from bs4 import BeautifulSoup
-from telegram.helpers import escape_markdown
-
-from argus.tasks.base.format_utils import dataframe_to_str
+from argus.tasks.base import http
+from argus.tasks.base.database import TaskResult, get_current_utc_time
+from argus.tasks.base.format_utils import table_to_str
+from argus.tasks.base.job_queue import Priority
 from argus.tasks.base.notifier import DataFormatter
-from argus.tasks.base.serializable import JsonDict, Serializable
+from argus.tasks.base.serializable import JsonDict, RecordList, Serializable
+from argus.tasks.base.state import load_state, save_state
 from argus.tasks.base.task import Task
 
 logger = logging.getLogger(__name__)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class ProductPrice:
     name: str
     price: float
@@ -39,44 +40,149 @@ class PriceFetcher(ABC, Serializable):
         return super().to_dict() | {'url': self.url}
 
 
-class ProductPrices(list[ProductPrice], Serializable):
-    def to_dict(self) -> JsonDict:
-        return super().to_dict() | {
-            'discounts': [asdict(discount) for discount in self]
-        }
+class ProductPrices(RecordList[ProductPrice]):
+    ITEM_TYPE = ProductPrice
+    ITEMS_KEY = 'discounts'
+    WITH_CLASS_NAME = True
+    METRIC_KEY = 'url'
+    METRIC_FIELDS = ('price', 'discount')
+
+
+@dataclass(slots=True)
+class PriceStats:
+    """Running statistics of a product price, updated once per run.
+
+    `window` holds `(timestamp, price)` pairs with increasing prices, so its
+    first price is the lowest one within the window and each update is
+    amortized O(1).
+    """
+
+    n_samples: int
+    minimum: float
+    maximum: float
+    ewma: float
+    last: list[float]
+    window: list[tuple[str, float]]
 
     @classmethod
-    def from_dict(cls, data: JsonDict) -> 'ProductPrices':
-        return ProductPrices(
-            [ProductPrice(**discount) for discount in data['discounts']]
-        )
+    def first(cls, price: float, timestamp: datetime) -> 'PriceStats':
+        return cls(1, price, price, price, [price], [(timestamp.isoformat(), price)])
+
+    @property
+    def last_price(self) -> float:
+        return self.last[-1]
+
+    @property
+    def window_minimum(self) -> float:
+        return self.window[0][1]
+
+    def update(
+        self,
+        price: float,
+        timestamp: datetime,
+        window: timedelta,
+        ewma_alpha: float,
+        n_last: int,
+    ) -> None:
+        self.n_samples += 1
+        self.minimum = min(self.minimum, price)
+        self.maximum = max(self.maximum, price)
+        self.ewma += ewma_alpha * (price - self.ewma)
+        self.last = (self.last + [price])[-n_last:]
+        while self.window and self.window[-1][1] >= price:
+            self.window.pop()
+        self.window.append((timestamp.isoformat(), price))
+        start = (timestamp - window).isoformat()
+        while self.window[0][0] < start:
+            self.window.pop(0)
+
+    @classmethod
+    def from_dict(cls, data: JsonDict) -> 'PriceStats':
+        return cls(**data | {'window': [tuple(entry) for entry in data['window']]})
 
 
 class PriceDiscountsTask(Task[ProductPrices]):
-    def __init__(self, fetchers: list[PriceFetcher], *args, **kwargs) -> None:
+    """Reports products whose price dropped since the previous run.
+
+    Per-product statistics are kept in the state store and updated on each
+    run, so a run costs O(products) however long the history is. A drop is
+    only notified when it exceeds `min_discount` and sets a new low for the
+    last `window_days`, so a price that recovers and drops back to the same
+    level is not reported again.
+    """
+
+    PRIORITY = Priority.BULK
+    TIMEOUT = 600
+    ISOLATED = True
+    EWMA_ALPHA = 0.2
+    N_LAST = 10
+
+    def __init__(
+        self,
+        fetchers: list[PriceFetcher],
+        *args,
+        min_discount: float = 0.0,
+        window_days: int = 90,
+        **kwargs,
+    ) -> None:
         super().__init__(*args, **kwargs)
         self.fetchers = fetchers
+        self.min_discount = min_discount
+        self.window_days = window_days
+        self._stats: dict[str, PriceStats] | None = None
+        self._new_lows: set[str] = set()
+
+    def sources(self) -> set[str]:
+        return {
+            urlparse(fetcher.url).hostname or fetcher.url for fetcher in self.fetchers
+        }
+
+    @property
+    def stats_key(self) -> str:
+        return f'{self.task_id}:price_stats'
+
+    def get_price_stats(self) -> dict[str, PriceStats]:
+        """Loads the stored statistics, seeding them from the last result."""
+        state = load_state(self.stats_key)
+        if state is not None:
+            return {url: PriceStats.from_dict(data) for url, data in state.items()}
+        now = get_current_utc_time()
+        return {
+            product.url: PriceStats.first(product.price, now)
+            for product in self.get_last_result() or []
+        }
 
     def _should_notify(self, result: ProductPrices) -> bool:
-        return any(product.discount > 0 for product in result)
+        return any(
+            product.discount > self.min_discount and product.url in self._new_lows
+            for product in result
+        )
 
     def run(self) -> ProductPrices:
-        product_discounts = (
-            product_discounts
-            if (product_discounts := self.get_last_result())
-            else ProductPrices([])
-        )
+        stats = self.get_price_stats()
+        now = get_current_utc_time()
+        window = timedelta(days=self.window_days)
+        new_stats: dict[str, PriceStats] = {}
+        self._new_lows = set()
         product_prices = [fetcher.fetch() for fetcher in self.fetchers]
-        old_products_by_url = {product.url: product for product in product_discounts}
         new_products_by_url = {product.url: product for product in product_prices}
         discounted_products = []
         for url, new_product in new_products_by_url.items():
-            old_product = old_products_by_url.get(url)
-            discount = (
-                (old_product.price - new_product.price) / old_product.price
-                if old_product and old_product.price
-                else 0
-            )
+            product_stats = stats.get(url)
+            if product_stats is None:
+                new_stats[url] = PriceStats.first(new_product.price, now)
+                discount: float = 0
+            else:
+                old_price = product_stats.last_price
+                discount = (
+                    (old_price - new_product.price) / old_price if old_price else 0
+                )
+                if new_product.price < product_stats.window_minimum:
+                    self._new_lows.add(url)
+                product_stats.update(
+                    new_product.price, now, window, self.EWMA_ALPHA, self.N_LAST
+                )
+                new_stats[url] = product_stats
             discounted_products.append(
                 ProductPrice(
                     name=new_product.name,
@@ -86,17 +192,36 @@ class PriceDiscountsTask(Task[ProductPrices]):
                     discount=discount,
                 )
             )
+        self._stats = new_stats
         return ProductPrices(discounted_products)
 
+    def save_result(
+        self, result: ProductPrices, run_key: str | None = None
+    ) -> TaskResult:
+        """Stores the result together with the statistics computed by `run`."""
+        with TaskResult._meta.database.atomic():  # pylint: disable=protected-access
+            entry = super().save_result(result, run_key)
+            if self._stats is not None:
+                save_state(
+                    self.stats_key,
+                    {url: asdict(stats) for url, stats in self._stats.items()},
+                )
+                self._stats = None
+        return entry
+
     def to_dict(self) -> JsonDict:
         return super().to_dict() | {
-            'fetchers': [fetcher.to_dict() for fetcher in self.fetchers]
+            'fetchers': [fetcher.to_dict() for fetcher in self.fetchers],
+            'min_discount': self.min_discount,
+            'window_days': self.window_days,
         }
 
     @classmethod
     def from_dict(cls, data: JsonDict) -> 'PriceDiscountsTask':
         return PriceDiscountsTask(
             fetchers=[PriceFetcher.from_dict(fetcher) for fetcher in data['fetchers']],
+            min_discount=data.get('min_discount', 0.0),
+            window_days=data.get('window_days', 90),
             **cls.serialize_parameters(data),
         )
 
@@ -105,8 +230,10 @@ class LillyPriceFetcher(PriceFetcher):
     VENDOR = 'Lilly'
 
     def fetch(self) -> ProductPrice:
+        from bs4 import BeautifulSoup  # pylint: disable=import-outside-toplevel
+
         logger.info('Fetching %s', self.url)
-        response = requests.get(self.url)
+        response = http.get(self.url, timeout=60)
         soup = BeautifulSoup(response.text, features='lxml')
         price_text = (
             soup.find('div', {'class': 'price-box'})
@@ -127,13 +254,26 @@ class LillyPriceFetcher(PriceFetcher):
 
 class PriceDiscountsFormatter(DataFormatter[ProductPrices]):
     def format(self, data: ProductPrices) -> str:
-        df = pd.DataFrame(data.to_dict()['discounts'])
-        df = df[['vendor', 'name', 'discount']]
-        df['name'] = df['name'].str[:15]
-        df = df[df.discount > 0]
-        df = df.sort_values('name')
+        # pylint: disable=import-outside-toplevel
+        from telegram.helpers import escape_markdown
+
+        to_discount = (
+            float
+            if any(isinstance(product.discount, float) for product in data)
+            else int
+        )
+        rows = sorted(
+            (
+                [product.vendor, product.name[:15], to_discount(product.discount)]
+                for product in data
+                if product.discount > 0
+            ),
+            key=lambda row: row[1],
+        )
         return (
             '💸 *Discounts* 💸\n```\n'
-            + escape_markdown(dataframe_to_str(df), version=2)
+            + escape_markdown(
+                table_to_str(rows, ['vendor', 'name', 'discount']), version=2
+            )
             + '\n```'
         )
@@ -1,10 +1,10 @@
+import math
+from collections.abc import Iterator
 from itertools import product
 
-import pandas as pd
-import requests
-from bs4 import BeautifulSoup
-
-from argus.tasks.base.format_utils import dataframe_to_str
+from argus.tasks.base import http
+from argus.tasks.base.format_utils import table_to_str
+from argus.tasks.base.job_queue import Priority
 from argus.tasks.base.notifier import DataFormatter
 from argus.tasks.base.serializable import JsonDict, Serializable
 from argus.tasks.base.task import Task
@@ -18,8 +18,17 @@ class SnowReportData(dict[str, dict[str, float]], Serializable):
     def from_dict(cls: type['SnowReportData'], data: JsonDict) -> 'SnowReportData':
         return SnowReportData(data)
 
+    def metrics(self) -> Iterator[tuple[str, str, float]]:
+        for location, report in self.items():
+            yield location, 'snow_total', float(sum(report.values()))
+
 
 class SnowForecastTask(Task):
+    PRIORITY = Priority.BULK
+    TIMEOUT = 600
+    ISOLATED = True
+    SOURCES = ('www.snow-forecast.com',)
+
     def __init__(self, resorts: list[str], levels: list[str], *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
         self.resorts = resorts
@@ -29,7 +38,9 @@ class SnowForecastTask(Task):
 
     @staticmethod
     def get_snow_forecast(resort: str, level: str) -> dict[str, float]:
-        response = requests.get(
+        from bs4 import BeautifulSoup  # pylint: disable=import-outside-toplevel
+
+        response = http.get(
             f'https://www.snow-forecast.com/resorts/{resort}/6day/{level}',
             timeout=30,
         )
@@ -51,10 +62,11 @@ class SnowForecastTask(Task):
                 'tr', {'class': 'forecast-table__row', 'data-row': 'snow'}
             ).find_all('td')
         ]
-        df = pd.DataFrame([day, time, snow], index=['day', 'time', 'snow']).T
-        df = df.loc[(df.time == 'AM').idxmax() :]
-        snow_report = df.groupby('day', sort=False).snow.sum()
-        return snow_report.to_dict()
+        start = time.index('AM') if 'AM' in time else 0
+        snow_report: dict[str, float] = {}
+        for day_value, snow_value in zip(day[start:], snow[start:]):
+            snow_report[day_value] = snow_report.get(day_value, 0) + snow_value
+        return snow_report
 
     def run(self) -> SnowReportData:
         data = {}
@@ -79,8 +91,13 @@ class SnowForecastTask(Task):
 
 class SnowReportFormatter(DataFormatter[SnowReportData]):
     def format(self, data: SnowReportData) -> str:
+        days = list(dict.fromkeys(day for report in data.values() for day in report))
+        rows = [[report.get(day, math.nan) for report in data.values()] for day in days]
+        # The table is numeric, so one float turns every cell into a float.
+        if any(isinstance(value, float) for row in rows for value in row):
+            rows = [[float(value) for value in row] for row in rows]
         return (
             '❄️ *Snow Report \\(cm\\)*\n```\n'
-            + dataframe_to_str(pd.DataFrame(data), show_index=True)
+            + table_to_str(rows, list(data), index=days)
             + '```'
         )
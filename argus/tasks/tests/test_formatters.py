@@ -1,7 +1,8 @@
 from unittest import TestCase
 
-from argus.tasks.epay import Bills, EPayMarkdownFormatter
+from argus.tasks.epay import BillEntry, Bills, EPayMarkdownFormatter
 from argus.tasks.product import PriceDiscountsFormatter, ProductPrice, ProductPrices
+from argus.tasks.snow import SnowReportData, SnowReportFormatter
 
 
 class TestFormatter(TestCase):
@@ -16,3 +17,34 @@ class TestFormatter(TestCase):
                 [ProductPrice('test', 0, 'www.example.com', 'vendor', discount=0)]
             )
         )
+
+    def test_epay_total(self):
+        formatter = EPayMarkdownFormatter()
+        text = formatter.format(
+            Bills(
+                [
+                    BillEntry('water', '1234567890', 12.5),
+                    BillEntry('gas', '42', 0.0),
+                    BillEntry('electricity', '987654321', 100.25),
+                ]
+            )
+        )
+        self.assertIn('\\| electricity \\| 87654321 \\|   100\\.25 \\|', text)
+        self.assertIn('\\| Total       \\|          \\|   112\\.75 \\|', text)
+        self.assertNotIn('gas', text)
+
+    def test_snow_report(self):
+        formatter = SnowReportFormatter()
+        text = formatter.format(
+            SnowReportData({'a/top': {'Mon': 0, 'Tue': 12.5}, 'b/top': {'Tue': 3}})
+        )
+        self.assertEqual(
+            text,
+            '❄️ *Snow Report \\(cm\\)*\n```\n'
+            '+-----+---------+---------+\n'
+            '|     |   a/top |   b/top |\n'
+            '|-----+---------+---------|\n'
+            '| Mon |    0.00 |  nan    |\n'
+            '| Tue |   12.50 |    3.00 |\n'
+            '+-----+---------+---------+```',
+        )
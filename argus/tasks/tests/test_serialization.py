@@ -1,10 +1,14 @@
 # pylint: disable=W0212
 import json
+import subprocess
+import sys
+from dataclasses import asdict
 from datetime import datetime, timedelta
 from unittest import TestCase
 
 from argus.tasks.base.notifier import TelegramNotifier
-from argus.tasks.base.serializable import JsonDict
+from argus.tasks.base.serializable import JsonDict, Serializable, record_codec
+from argus.tasks.epay import BillEntry, Bills
 from argus.tasks.ml.hugging_face import (
     HuggingFaceTrendingModelsTask,
 )
@@ -16,6 +20,8 @@ from argus.tasks.product import (
 )
 from argus.tasks.todo import Todo, TodoFormatter, TodoTask
 
+TODO_TASK = TodoTask(title='Todo', scheduler=None, formatter=TodoFormatter()).to_dict()
+
 
 class TestDataSerialization(TestCase):
     def test_todo(self) -> None:
@@ -37,6 +43,21 @@ class TestDataSerialization(TestCase):
         )
         self.assertEqual(data, ProductPrices.from_dict(data.to_dict()))
 
+    def test_record_list_payload(self) -> None:
+        bills = Bills([BillEntry('water', '123', 1.5), BillEntry('gas', '456', 0.0)])
+        data = bills.to_dict()
+        self.assertEqual(
+            data,
+            {'__class__': 'Bills', 'bills': [asdict(entry) for entry in bills]},
+        )
+        self.assertEqual(Serializable.from_dict(data), bills)
+
+    def test_record_codec_defaults(self) -> None:
+        codec = record_codec(ProductPrice)
+        product = codec.decode({'name': 'a', 'price': 1.0, 'url': 'u', 'vendor': 'v'})
+        self.assertEqual(product.discount, 0)
+        self.assertEqual(codec.encode(product), asdict(product))
+
 
 class MockPriceFetcher(PriceFetcher):
     def __init__(self, url: str, price: float) -> None:
@@ -75,5 +96,26 @@ class TestTaskSerialization(TestCase):
 
     def test_product_discount_serialization(self) -> None:
         task = PriceDiscountsTask(fetchers=[MockPriceFetcher('www.example.com', 1.23)])
-        deserialized_task = PriceDiscountsTask.from_dict(task.to_dict())
+        data = task.to_dict()
+        deserialized_task = PriceDiscountsTask.from_dict(data)
         self.assertEqual(task.fetchers[0].url, deserialized_task.fetchers[0].url)
+        self.assertEqual(data, task.to_dict())
+
+
+class TestLazyRegistry(TestCase):
+    def test_task_module_is_imported_on_first_lookup(self) -> None:
+        code = (
+            'import json, sys\n'
+            'from argus.tasks.base.task import Task\n'
+            f'task = Task.from_dict(json.loads({json.dumps(TODO_TASK)!r}))\n'
+            'print(type(task).__name__, *sorted(name for name in sys.modules if name in'
+            " ('argus.tasks.epay', 'bs4', 'requests', 'tabulate', 'telegram')))"
+        )
+        output = subprocess.run(
+            [sys.executable, '-c', code], capture_output=True, check=True, text=True
+        ).stdout
+        self.assertEqual(output.split(), ['TodoTask'])
+
+    def test_unknown_class(self) -> None:
+        with self.assertRaises(ValueError):
+            Serializable.from_dict({'__class__': 'MissingTask'})
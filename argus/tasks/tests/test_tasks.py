@@ -1,20 +1,22 @@
 # pylint: disable=W0212
+from dataclasses import asdict
+from datetime import datetime, timedelta
+from typing import Any
 from unittest import TestCase
 from unittest.mock import MagicMock, patch
 
 from peewee import SqliteDatabase
 
-from argus.tasks.base.database import RunningTask, TaskResult
+from argus.tasks.base.database import MODELS, KeyValue, TaskResult
 from argus.tasks.base.notifier import Notifier, SimpleFormatter
-from argus.tasks.epay import BillEntry, Bills, EPayTask
+from argus.tasks.epay import BillEntry, Bills, EpayClient, EPayTask
 from argus.tasks.ml.hugging_face import (
     HuggingFaceTrendingModelsTask,
     HuggingFaceTrendingPapersTask,
+    Paper,
 )
 from argus.tasks.ml.paper_with_code import TrendingPapersWithCodeTask
-from argus.tasks.product import (
-    PriceDiscountsTask,
-)
+from argus.tasks.product import PriceDiscountsTask, PriceStats
 from argus.tasks.tests.test_serialization import MockPriceFetcher
 
 
@@ -29,12 +31,12 @@ class _MockNotifier(Notifier):
 class TestDataFetchers(TestCase):
     def setUp(self) -> None:
         self.test_db = SqliteDatabase(':memory:')
-        self.test_db.bind([TaskResult, RunningTask])
+        self.test_db.bind(MODELS)
         self.test_db.connect()
-        self.test_db.create_tables([TaskResult, RunningTask])
+        self.test_db.create_tables(MODELS)
 
     def tearDown(self) -> None:
-        self.test_db.drop_tables([TaskResult, RunningTask])
+        self.test_db.drop_tables(MODELS)
         self.test_db.close()
 
     def test_hugging_face_models(self) -> None:
@@ -57,6 +59,7 @@ class TestDataFetchers(TestCase):
         mock_client = MagicMock()
         MockEpayClient.return_value = mock_client
         mock_client.__enter__.return_value = mock_client
+        mock_client.export_cookies.return_value = []
         bills = [
             BillEntry(name='Electricity', id='12345678', amount=1),
             BillEntry(name='Water', id='87654321', amount=2),
@@ -75,6 +78,7 @@ class TestDataFetchers(TestCase):
         mock_client.get_bills.return_value = Bills(bills)
         task.run_if_due()
         self.assertFalse(notifier.notified)
+        self.assertEqual(MockEpayClient.call_args.kwargs['cookies'], [])
         notifier.notified = False
         mock_client.get_bills.return_value = Bills(
             [
@@ -95,3 +99,110 @@ class TestDataFetchers(TestCase):
         discounts = task.run()
         self.assertEqual(len(discounts), 1)
         self.assertAlmostEqual(discounts[0].discount, 0.75)
+
+    def test_product_discount_is_notified_once_per_low(self) -> None:
+        notifier = _MockNotifier()
+        task = PriceDiscountsTask(
+            fetchers=[],
+            notifier=notifier,
+            formatter=SimpleFormatter(),
+            min_discount=0.1,
+        )
+        notified = []
+        for price in [10, 8, 10, 8, 9.5, 7]:
+            notifier.notified = False
+            task.fetchers = [MockPriceFetcher('www.example.com', price)]
+            task.run_if_due()
+            notified.append(notifier.notified)
+        self.assertEqual(notified, [False, True, False, False, False, True])
+        stats = task.get_price_stats()['www.example.com']
+        self.assertEqual((stats.n_samples, stats.minimum, stats.maximum), (6, 7, 10))
+        self.assertEqual(stats.last[-2:], [9.5, 7])
+        self.assertEqual(stats.window_minimum, 7)
+
+    def test_price_stats_window(self) -> None:
+        start = datetime(2024, 1, 1)
+        stats = PriceStats.first(5, start)
+        for day, price in enumerate([7, 6, 8], start=1):
+            stats.update(price, start + timedelta(days=day), timedelta(days=2), 0.5, 2)
+        self.assertEqual(stats.window_minimum, 6)
+        self.assertEqual(stats.minimum, 5)
+        self.assertEqual(stats.last, [6, 8])
+        self.assertEqual(PriceStats.from_dict(asdict(stats)), stats)
+
+    @patch('argus.tasks.ml.hugging_face.datetime')
+    @patch('argus.tasks.ml.hugging_face.fetch_daily_papers')
+    def test_hugging_face_papers_cache(
+        self, mock_fetch: MagicMock, mock_datetime: MagicMock
+    ) -> None:
+        mock_fetch.side_effect = lambda day: (Paper(day, 'title', len(day)),)
+        mock_datetime.now.return_value = datetime(2024, 3, 1)
+        task = HuggingFaceTrendingPapersTask(
+            last_n_days=60, refresh_days=2, task_id='papers'
+        )
+        self.assertEqual(len(task.run()), 60)
+        self.assertEqual(mock_fetch.call_count, 60)
+        mock_fetch.reset_mock()
+        mock_datetime.now.return_value = datetime(2024, 3, 2)
+        papers = task.run()
+        self.assertEqual(
+            [call.args[0] for call in mock_fetch.call_args_list],
+            ['2024-03-01', '2024-02-29', '2024-02-28'],
+        )
+        self.assertEqual((papers[0].url, papers[-1].url), ('2024-01-02', '2024-03-01'))
+        keys = sorted(entry.key for entry in KeyValue.select())
+        self.assertEqual(len(keys), 60)
+        self.assertEqual(keys[0], 'hf_papers:papers:2024-01-02')
+
+    @patch('argus.tasks.ml.hugging_face.datetime')
+    @patch('argus.tasks.ml.hugging_face.fetch_daily_papers')
+    def test_hugging_face_papers_windows_do_not_prune_each_other(
+        self, mock_fetch: MagicMock, mock_datetime: MagicMock
+    ) -> None:
+        mock_fetch.side_effect = lambda day: (Paper(day, 'title', len(day)),)
+        mock_datetime.now.return_value = datetime(2024, 3, 1)
+        week = HuggingFaceTrendingPapersTask(
+            last_n_days=7, refresh_days=0, task_id='week'
+        )
+        short = HuggingFaceTrendingPapersTask(last_n_days=2, task_id='short')
+        week.run()
+        short.run()
+        mock_fetch.reset_mock()
+        self.assertEqual(len(week.run()), 7)
+        mock_fetch.assert_not_called()
+        keys = [entry.key for entry in KeyValue.select()]
+        self.assertEqual(sum(key.startswith('hf_papers:week:') for key in keys), 7)
+        self.assertEqual(sum(key.startswith('hf_papers:short:') for key in keys), 2)
+
+    @patch.object(EpayClient, 'get_login_salt', return_value='salt')
+    def test_epay_client_pages_and_relogin(self, get_login_salt: MagicMock) -> None:
+        session: Any = MagicMock()
+        session.cookies = {'session': 'expired'}
+        client = EpayClient('user', 'pass', page_size=2, max_workers=2)
+        client.session = session
+        rows = [
+            {'REG_DESCR': f'bill{i}', 'IDN': str(i), 'BILL_STATUS_DESC': '1.50 lv'}
+            for i in range(5)
+        ]
+        requested_pages = []
+
+        def post(url: str, data: dict, **kwargs: Any) -> MagicMock:
+            response = MagicMock(ok=True)
+            if url.endswith('/login'):
+                session.cookies = {'session': 'valid'}
+            elif session.cookies['session'] == 'expired':
+                response.json.side_effect = ValueError
+            else:
+                page_num = int(data['page_num'])
+                requested_pages.append(page_num)
+                response.json.return_value = {
+                    'DATA': rows[(page_num - 1) * 2 : page_num * 2]
+                }
+            return response
+
+        session.post.side_effect = post
+        with client:
+            bills = client.get_bills()
+        self.assertEqual([bill.id for bill in bills], ['0', '1', '2', '3', '4'])
+        self.assertEqual(sorted(requested_pages), [1, 2, 3])
+        get_login_salt.assert_called_once()
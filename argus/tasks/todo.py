@@ -1,6 +1,7 @@
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 
+from argus.tasks.base.job_queue import Priority
 from argus.tasks.base.notifier import DataFormatter
 from argus.tasks.base.scheduler import Frequency, Scheduler, SchedulerConfig
 from argus.tasks.base.serializable import JsonDict, Serializable
@@ -26,6 +27,9 @@ class Todo(Serializable):
 
 
 class TodoTask(Task[Todo]):
+    PRIORITY = Priority.CRITICAL
+    SLA = timedelta(minutes=1)
+
     def __init__(
         self,
         title: str,
@@ -46,6 +50,8 @@ class TodoTask(Task[Todo]):
             task_id=kwargs.get('task_id'),
             formatter=kwargs.get('formatter'),
             notifier=kwargs.get('notifier'),
+            priority=kwargs.get('priority'),
+            sla=kwargs.get('sla'),
         )
         self._title = title
         self._target_date = target_date
@@ -1,69 +1,638 @@
+import hashlib
 import json
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from typing import Any
+from zoneinfo import ZoneInfo
 
-import pandas as pd
-from flask import Flask, render_template
+from flask import (
+    Flask,
+    abort,
+    make_response,
+    render_template,
+    request,
+    stream_with_context,
+)
+from peewee import Tuple, fn
+from werkzeug.wrappers import Response
 
-from argus.tasks.base.database import TaskResult
+from argus.tasks.base.database import Job, RunningTask, TaskResult
+from argus.tasks.base.scheduler import Scheduler
 from argus.tasks.base.serializable import JsonDict
+from argus.tasks.base.state import load_states
+
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 
+PAGE_SIZE = 50
+
+HF_MODELS_TASK = 'weekly_huggingface_models'
+HF_PAPERS_TASK = 'weekly_huggingface_papers'
+GH_REPOS_TASK = 'weekly_github_ml_repos'
+
+
+@dataclass(frozen=True)
+class TableView:
+    columns: list[str]
+    rows: list[list[Any]]
+
+    @classmethod
+    def from_records(cls, records: list[JsonDict], columns: list[str]) -> 'TableView':
+        return cls(
+            columns, [[record[column] for column in columns] for record in records]
+        )
+
+
+def top_records(
+    records: list[JsonDict], key: str, limit: int | None = None
+) -> list[JsonDict]:
+    return sorted(records, key=lambda record: record[key], reverse=True)[:limit]
+
+
+ViewAdapter = Callable[[JsonDict], TableView]
+# Task type -> adapter rendering its result payload as a table.
+view_adapters: dict[str, ViewAdapter] = {}
+
+
+def view_adapter(*task_types: str) -> Callable[[ViewAdapter], ViewAdapter]:
+    def register(adapter: ViewAdapter) -> ViewAdapter:
+        for task_type in task_types:
+            view_adapters[task_type] = adapter
+        return adapter
+
+    return register
 
-def get_task_latest_result(task_name: str) -> JsonDict:
-    latest_task = (
-        TaskResult.select()
-        .where(TaskResult.task_id == task_name)
-        .order_by(TaskResult.created_at.desc())
-        .first()
+
+def build_result_view(task_type: str | None, payload: JsonDict) -> TableView:
+    adapter = view_adapters.get(task_type or '', build_generic_view)
+    return adapter(payload)
+
+
+def build_generic_view(payload: JsonDict) -> TableView:
+    """Shows the first list of records in the payload, or its fields."""
+    for key, value in payload.items():
+        if key != '__class__' and isinstance(value, list):
+            records = [
+                record if isinstance(record, dict) else {key: record}
+                for record in value
+            ]
+            columns = list(dict.fromkeys(name for record in records for name in record))
+            return TableView(
+                columns,
+                [[record.get(column) for column in columns] for record in records],
+            )
+    return TableView(
+        ['field', 'value'],
+        [[key, value] for key, value in payload.items() if key != '__class__'],
     )
-    return json.loads(latest_task.result)
 
 
-def get_huggingface_models():
-    models = get_task_latest_result('weekly_huggingface_models')
-    models_df = pd.DataFrame(models['models'])
-    models_df = models_df.sort_values('n_likes', ascending=False).head(10)
-    models_df['url'] = 'https://huggingface.co/' + models_df['model_id']
-    return models_df
+@view_adapter('HuggingFaceTrendingModelsTask')
+def build_huggingface_models(payload: JsonDict) -> TableView:
+    models = [
+        model | {'url': 'https://huggingface.co/' + model['model_id']}
+        for model in top_records(payload['models'], 'n_likes', 10)
+    ]
+    return TableView.from_records(models, _columns(payload['models'], ['url']))
 
 
-def get_huggingface_papers():
-    papers = get_task_latest_result('weekly_huggingface_papers')
-    papers_df = pd.DataFrame(papers['papers'])
-    papers_df = papers_df[['title', 'n_likes', 'url']]
-    papers_df = papers_df.sort_values('n_likes', ascending=False).head(10)
-    papers_df['url'] = 'https://huggingface.co' + papers_df['url']
-    return papers_df
+@view_adapter('HuggingFaceTrendingPapersTask')
+def build_huggingface_papers(payload: JsonDict) -> TableView:
+    papers = [
+        paper | {'url': 'https://huggingface.co' + paper['url']}
+        for paper in top_records(payload['papers'], 'n_likes', 10)
+    ]
+    return TableView.from_records(papers, ['title', 'n_likes', 'url'])
 
 
-def get_repos():
-    repos = get_task_latest_result('weekly_github_ml_repos')
-    repos_df = pd.DataFrame(repos['repos'])
-    repos_df = repos_df.sort_values('n_recent_stars', ascending=False)
-    repos_df.insert(
-        0, 'repo', repos_df.url.apply(lambda x: x.removeprefix('https://github.com/'))
+@view_adapter('TrendingGithubReposTask')
+def build_repos(payload: JsonDict) -> TableView:
+    repos = [
+        {'repo': repo['url'].removeprefix('https://github.com/')} | repo
+        for repo in top_records(payload['repos'], 'n_recent_stars')
+    ]
+    return TableView.from_records(repos, ['repo'] + _columns(payload['repos']))
+
+
+@view_adapter('SnowForecastTask')
+def build_snow_report(payload: JsonDict) -> TableView:
+    days = list(dict.fromkeys(day for report in payload.values() for day in report))
+    return TableView(
+        ['day', *payload],
+        [[day, *(report.get(day) for report in payload.values())] for day in days],
     )
-    return repos_df
 
 
-def get_date() -> str:
-    latest_task = (
-        TaskResult.select()
-        .where(TaskResult.task_id == 'weekly_huggingface_models')
-        .order_by(TaskResult.created_at.desc())
-        .first()
+def _columns(records: list[JsonDict], extra: list[str] | None = None) -> list[str]:
+    columns = list(records[0]) if records else []
+    return columns + [column for column in extra or [] if column not in columns]
+
+
+@dataclass(frozen=True)
+class TaskSummary:
+    task_id: str
+    task_type: str
+    frequency: str | None
+    next_runtime: datetime | None
+    last_result_at: datetime | None
+    last_latency: float | None
+    result_size: int | None
+
+    def cells(self) -> dict[str, str]:
+        """Displayed values of the task list columns, keyed by field."""
+        return {
+            'task_type': self.task_type,
+            'frequency': self.frequency or '',
+            'next_runtime': str(self.next_runtime or ''),
+            'last_result_at': str(self.last_result_at or ''),
+            'last_latency': (
+                f'{self.last_latency:.1f}' if self.last_latency is not None else ''
+            ),
+            'result_size': str(self.result_size)
+            if self.result_size is not None
+            else '',
+        }
+
+
+def _latest_result_id(task_id: Any) -> Any:
+    return (
+        TaskResult.select(TaskResult.id)
+        .where(TaskResult.task_id == task_id)
+        .order_by(TaskResult.created_at.desc(), TaskResult.id.desc())
+        .limit(1)
     )
-    return latest_task.created_at.strftime('%Y-%m-%d')
 
 
-@app.route('/ml')
-def ml_dashboard():
+def list_tasks(
+    after: str | None = None, limit: int = PAGE_SIZE
+) -> tuple[list[TaskSummary], str | None]:
+    """Returns a page of running tasks ordered by id, and the next cursor.
+
+    Each page takes five indexed queries, however many tasks and results
+    there are: the tasks with the ids of their latest result and finished
+    job, then those results and jobs, the pending jobs and the stored
+    schedules.
+    """
+    query = _select_tasks()
+    if after is not None:
+        query = query.where(RunningTask.task_id > after)
+    rows: list[Any] = list(
+        query.order_by(RunningTask.task_id).limit(limit + 1).tuples()
+    )
+    next_cursor = rows[limit - 1][0] if len(rows) > limit else None
+    return _summarize(rows[:limit]), next_cursor
+
+
+def get_task_summaries(task_ids: list[str]) -> list[TaskSummary]:
+    """Returns the summaries of the given running tasks, ordered by id."""
+    query = _select_tasks().where(RunningTask.task_id.in_(task_ids))
+    return _summarize(list(query.order_by(RunningTask.task_id).tuples()))
+
+
+def _select_tasks() -> Any:
+    latest_job_id = (
+        Job.select(Job.id)
+        .where((Job.task_id == RunningTask.task_id) & (Job.state == 'done'))
+        .order_by(Job.finished_at.desc())
+        .limit(1)
+    )
+    return RunningTask.select(
+        RunningTask.task_id,
+        RunningTask.task_type,
+        RunningTask.serialized_data,
+        _latest_result_id(RunningTask.task_id).alias('result_id'),
+        latest_job_id.alias('job_id'),
+    )
+
+
+def _summarize(rows: list[Any]) -> list[TaskSummary]:
+    result_rows: Any = (
+        TaskResult.select(
+            TaskResult.id,
+            TaskResult.created_at,
+            fn.LENGTH(TaskResult.result).coerce(False),
+        )
+        .where(TaskResult.id.in_([row[3] for row in rows if row[3] is not None]))
+        .tuples()
+    )
+    results = {
+        result_id: (created_at, size) for result_id, created_at, size in result_rows
+    }
+    latencies = {
+        job.id: (job.finished_at - job.started_at).total_seconds()
+        for job in Job.select(Job.id, Job.started_at, Job.finished_at).where(
+            Job.id.in_([row[4] for row in rows if row[4] is not None])
+        )
+        if job.started_at and job.finished_at
+    }
+    next_runtimes = _next_runtimes([row[0] for row in rows])
+    tasks = []
+    for task_id, task_type, serialized_data, result_id, job_id in rows:
+        scheduler_data = json.loads(serialized_data).get('scheduler')
+        scheduler = Scheduler.from_dict(scheduler_data) if scheduler_data else None
+        created_at, size = results.get(result_id, (None, None))
+        next_runtime = next_runtimes.get(task_id)
+        if scheduler and next_runtime:
+            next_runtime = next_runtime.astimezone(ZoneInfo(scheduler.config.timezone))
+        elif scheduler and type(scheduler) is Scheduler:
+            # Fixed schedules keep no state; they advance like their config.
+            next_runtime = scheduler.next_runtime
+        tasks.append(
+            TaskSummary(
+                task_id=task_id,
+                task_type=task_type,
+                frequency=scheduler.config.frequency.value if scheduler else None,
+                next_runtime=next_runtime,
+                last_result_at=created_at,
+                last_latency=latencies.get(job_id),
+                result_size=size,
+            )
+        )
+    return tasks
+
+
+def _next_runtimes(task_ids: list[str]) -> dict[str, datetime]:
+    """Returns when each task runs next, as known to the task manager.
+
+    A run already queued starts when its job becomes available. Otherwise
+    adaptive schedules keep their next run in the state store.
+    """
+    next_runtimes: dict[str, datetime] = {}
+    schedules = load_states(f'{task_id}:schedule' for task_id in task_ids)
+    for key, state in schedules.items():
+        if state.get('next_runtime'):
+            next_runtimes[key.removesuffix(':schedule')] = datetime.fromisoformat(
+                state['next_runtime']
+            )
+    pending: Any = (
+        Job.select(Job.task_id, fn.MIN(Job.available_at))
+        .where(Job.task_id.in_(task_ids) & (Job.state == 'pending'))
+        .group_by(Job.task_id)
+        .tuples()
+    )
+    for task_id, available_at in pending:
+        next_runtimes[task_id] = available_at.replace(tzinfo=UTC)
+    return next_runtimes
+
+
+@dataclass(frozen=True)
+class HistoryEntry:
+    id: int
+    created_at: datetime
+    size: int
+
+
+def list_history(
+    task_id: str, before: int | None = None, limit: int = PAGE_SIZE
+) -> tuple[list[HistoryEntry], int | None]:
+    """Returns a page of results of a task, newest first, and the next cursor."""
+    query = TaskResult.select(
+        TaskResult.id, TaskResult.created_at, fn.LENGTH(TaskResult.result).coerce(False)
+    ).where(TaskResult.task_id == task_id)
+    if before is not None:
+        cursor = TaskResult.get_or_none(TaskResult.id == before)
+        if cursor is not None:
+            query = query.where(
+                Tuple(TaskResult.created_at, TaskResult.id)
+                < Tuple(cursor.created_at, cursor.id)
+            )
+    rows: Any = (
+        query.order_by(TaskResult.created_at.desc(), TaskResult.id.desc())
+        .limit(limit + 1)
+        .tuples()
+    )
+    entries = [HistoryEntry(*row) for row in rows]
+    next_cursor = entries[limit - 1].id if len(entries) > limit else None
+    return entries[:limit], next_cursor
+
+
+def get_latest_result_ids(task_ids: list[str]) -> tuple[int | None, ...]:
+    """Returns the id of the latest result of each task in one query."""
+    database = TaskResult._meta.database  # pylint: disable=protected-access
+    table = TaskResult._meta.table_name  # pylint: disable=protected-access
+    latest_id = (
+        f'(SELECT id FROM "{table}" WHERE task_id = ? '
+        'ORDER BY created_at DESC, id DESC LIMIT 1)'
+    )
+    sql = 'SELECT ' + ', '.join([latest_id] * len(task_ids))
+    return tuple(database.execute_sql(sql, task_ids).fetchone())
+
+
+class CachedView:
+    """Renders a page from the latest results of some tasks, once per version.
+
+    The version is the tuple of latest result ids, checked with one indexed
+    query at most every `check_interval` seconds. Only a new result triggers
+    loading payloads and rendering, so repeated hits are served from memory
+    with an ETag derived from the version.
+    """
+
+    def __init__(
+        self,
+        task_ids: list[str],
+        render: Callable[[dict[str, TaskResult]], str],
+        check_interval: float = 1.0,
+    ) -> None:
+        self._task_ids = task_ids
+        self._render = render
+        self._check_interval = check_interval
+        self._lock = threading.Lock()
+        self._version: tuple[int | None, ...] | None = None
+        self._checked_at = 0.0
+        self._etag = ''
+        self._body = ''
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._version = None
+            self._checked_at = 0.0
+
+    def get(self) -> tuple[str, str]:
+        """Returns `(etag, body)` for the latest results."""
+        with self._lock:
+            now = time.monotonic()
+            if (
+                self._version is not None
+                and now - self._checked_at < self._check_interval
+            ):
+                return self._etag, self._body
+            version = get_latest_result_ids(self._task_ids)
+            self._checked_at = now
+            if version != self._version:
+                entries = {
+                    entry.task_id: entry
+                    for entry in TaskResult.select().where(
+                        TaskResult.id.in_([id_ for id_ in version if id_ is not None])
+                    )
+                }
+                self._body = self._render(entries)
+                self._etag = hashlib.sha1(repr(version).encode()).hexdigest()
+                self._version = version
+            return self._etag, self._body
+
+    def response(self) -> Response:
+        etag, body = self.get()
+        response = make_response(body)
+        response.set_etag(etag)
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+
+
+def render_ml_dashboard(entries: dict[str, TaskResult]) -> str:
+    def payload(task_id: str) -> JsonDict:
+        return json.loads(entries[task_id].result)
+
     return render_template(
         'ml.html',
-        hf_papers=get_huggingface_papers(),
-        hf_models=get_huggingface_models(),
-        gh_repos=get_repos(),
-        date=get_date(),
+        hf_papers=build_huggingface_papers(payload(HF_PAPERS_TASK)),
+        hf_models=build_huggingface_models(payload(HF_MODELS_TASK)),
+        gh_repos=build_repos(payload(GH_REPOS_TASK)),
+        date=entries[HF_MODELS_TASK].created_at.strftime('%Y-%m-%d'),
+        live='reload',
+        watch=list(entries),
+    )
+
+
+@dataclass(frozen=True)
+class Event:
+    id: int
+    type: str
+    data: JsonDict
+
+    def encode(self) -> str:
+        data = json.dumps(self.data, default=str)
+        return f'id: {self.id}\nevent: {self.type}\ndata: {data}\n\n'
+
+
+class EventBroadcaster:
+    """Fans database changes out to server-sent event streams.
+
+    A single background thread polls for new results and updated tasks
+    every `poll_interval` seconds, so the database load does not depend on
+    the number of connected clients. Events carry the changed data, which
+    pages apply in place instead of reloading. Each client reads from its
+    own bounded queue. A client that falls `max_queue` events behind is
+    disconnected and catches up from the last `history` events when the
+    browser reconnects with `Last-Event-ID`.
+
+    Without `poll_in_background` only events published by calling `poll`
+    or `publish` are sent.
+    """
+
+    def __init__(
+        self,
+        poll_interval: float = 1.0,
+        keepalive: float = 15.0,
+        max_queue: int = 256,
+        history: int = 256,
+        poll_in_background: bool = True,
+    ) -> None:
+        self._poll_interval = poll_interval
+        self._poll_in_background = poll_in_background
+        self._keepalive = keepalive
+        self._max_queue = max_queue
+        self._history: deque[Event] = deque(maxlen=history)
+        self._subscribers: set[queue.Queue[Event]] = set()
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._next_id = 1
+        self._last_result_id: int | None = None
+        self._last_task_update: datetime | None = None
+        self._n_tasks: int | None = None
+
+    def subscribe(self, last_event_id: int | None = None) -> 'queue.Queue[Event]':
+        subscriber: queue.Queue[Event] = queue.Queue(self._max_queue)
+        with self._lock:
+            if self._thread is None and self._poll_in_background:
+                self._thread = threading.Thread(
+                    target=self._run, name='dashboard-events', daemon=True
+                )
+                self._thread.start()
+            if last_event_id is not None:
+                for event in self._history:
+                    if event.id > last_event_id and not subscriber.full():
+                        subscriber.put_nowait(event)
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: 'queue.Queue[Event]') -> None:
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def is_subscribed(self, subscriber: 'queue.Queue[Event]') -> bool:
+        with self._lock:
+            return subscriber in self._subscribers
+
+    def publish(self, event_type: str, data: JsonDict) -> None:
+        with self._lock:
+            event = Event(self._next_id, event_type, data)
+            self._next_id += 1
+            self._history.append(event)
+            for subscriber in list(self._subscribers):
+                try:
+                    subscriber.put_nowait(event)
+                except queue.Full:
+                    self._subscribers.discard(subscriber)
+
+    def poll(self) -> None:
+        """Publishes results and task changes since the previous poll."""
+        if self._last_result_id is None:
+            self._last_result_id = TaskResult.select(
+                fn.COALESCE(fn.MAX(TaskResult.id), 0)
+            ).scalar()
+            latest_task = (
+                RunningTask.select(RunningTask.last_updated)
+                .order_by(RunningTask.last_updated.desc())
+                .first()
+            )
+            self._last_task_update = latest_task.last_updated if latest_task else None
+            self._n_tasks = RunningTask.select().count()
+            return
+        results: Any = (
+            TaskResult.select(
+                TaskResult.id,
+                TaskResult.task_id,
+                TaskResult.created_at,
+                fn.LENGTH(TaskResult.result).coerce(False),
+            )
+            .where(TaskResult.id > self._last_result_id)
+            .order_by(TaskResult.id)
+            .tuples()
+        )
+        changed_task_ids = set()
+        for result_id, task_id, created_at, size in results:
+            self.publish(
+                'result',
+                {
+                    'id': result_id,
+                    'task_id': task_id,
+                    'created_at': created_at,
+                    'size': size,
+                },
+            )
+            self._last_result_id = result_id
+            changed_task_ids.add(task_id)
+        tasks = RunningTask.select(RunningTask.task_id, RunningTask.last_updated)
+        if self._last_task_update is not None:
+            tasks = tasks.where(RunningTask.last_updated > self._last_task_update)
+        for task in tasks.order_by(RunningTask.last_updated):
+            changed_task_ids.add(task.task_id)
+            self._last_task_update = task.last_updated
+        # Summaries are built once here and pushed, so open pages update
+        # their rows without querying the database.
+        for summary in get_task_summaries(sorted(changed_task_ids)):
+            self.publish('task', {'task_id': summary.task_id, 'cells': summary.cells()})
+        n_tasks = RunningTask.select().count()
+        if n_tasks != self._n_tasks:
+            self.publish('tasks', {'count': n_tasks})
+            self._n_tasks = n_tasks
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self.poll()
+            except Exception:  # pylint: disable=broad-exception-caught
+                logger.exception('Failed to poll dashboard events')
+            time.sleep(self._poll_interval)
+
+    def stream(self, last_event_id: int | None = None) -> Iterator[str]:
+        subscriber = self.subscribe(last_event_id)
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                try:
+                    event = subscriber.get(timeout=self._keepalive)
+                except queue.Empty:
+                    if not self.is_subscribed(subscriber):
+                        return
+                    yield ': keepalive\n\n'
+                    continue
+                yield event.encode()
+        finally:
+            self.unsubscribe(subscriber)
+
+
+events = EventBroadcaster()
+ml_view = CachedView(
+    [HF_MODELS_TASK, HF_PAPERS_TASK, GH_REPOS_TASK], render_ml_dashboard
+)
+
+
+@app.route('/ml')
+def ml_dashboard() -> Response:
+    return ml_view.response()
+
+
+@app.route('/events')
+def events_stream() -> Response:
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    return Response(
+        stream_with_context(events.stream(last_event_id)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
+@app.route('/')
+def tasks_view() -> str:
+    tasks, next_cursor = list_tasks(request.args.get('after'))
+    return render_template(
+        'tasks.html', tasks=tasks, next_cursor=next_cursor, live='tasks'
+    )
+
+
+def _result_context(task_id: str, result_id: int | None) -> JsonDict:
+    """Finds the latest result of a task, or the given one, and its table."""
+    running_task = RunningTask.get_or_none(RunningTask.task_id == task_id)
+    if result_id is None:
+        entry = TaskResult.get_or_none(TaskResult.id == _latest_result_id(task_id))
+    else:
+        entry = TaskResult.get_or_none(
+            (TaskResult.id == result_id) & (TaskResult.task_id == task_id)
+        )
+    if running_task is None and entry is None:
+        abort(404)
+    task_type = running_task.task_type if running_task else None
+    return {
+        'result_view': (
+            build_result_view(task_type, json.loads(entry.result)) if entry else None
+        ),
+        'result_title': entry.created_at.strftime('%Y-%m-%d %H:%M') if entry else '',
+    }
+
+
+@app.route('/tasks/<task_id>')
+def task_view(task_id: str) -> str:
+    before = request.args.get('before', type=int)
+    result_id = request.args.get('result', type=int)
+    context = _result_context(task_id, result_id)
+    history, next_cursor = list_history(task_id, before)
+    return render_template(
+        'task.html',
+        task_id=task_id,
+        history=history,
+        before=before,
+        next_cursor=next_cursor,
+        live='task',
+        # Live results are only shown on the latest result and first page.
+        show_new_result=result_id is None,
+        show_new_history=before is None,
+        **context,
+    )
+
+
+@app.route('/tasks/<task_id>/result')
+def task_result_view(task_id: str) -> str:
+    """Renders only the result table, for pages that show new results live."""
+    return render_template(
+        '_result.html', **_result_context(task_id, request.args.get('result', type=int))
     )
 
 
@@ -0,0 +1,295 @@
+import json
+from datetime import UTC, datetime, timedelta
+from unittest import TestCase
+from zoneinfo import ZoneInfo
+
+from peewee import SqliteDatabase
+
+from argus.tasks.base.database import MODELS, Job, RunningTask, TaskResult
+from argus.tasks.base.scheduler import (
+    AdaptiveScheduler,
+    Frequency,
+    Scheduler,
+    SchedulerConfig,
+)
+from argus.tasks.base.serializable import Serializable
+from argus.tasks.base.state import save_state
+from dashboard.app import (
+    GH_REPOS_TASK,
+    HF_MODELS_TASK,
+    HF_PAPERS_TASK,
+    CachedView,
+    EventBroadcaster,
+    TableView,
+    app,
+    build_generic_view,
+    build_huggingface_models,
+    build_repos,
+    build_snow_report,
+    get_latest_result_ids,
+    list_history,
+    list_tasks,
+    ml_view,
+)
+
+START = datetime(2025, 1, 6)
+
+
+def _store(task_id: str, payload: dict, created_at: datetime = START) -> TaskResult:
+    return TaskResult.create(
+        task_id=task_id, result=json.dumps(payload), created_at=created_at
+    )
+
+
+def _running_task(task_id: str, scheduler: Serializable | None = None) -> None:
+    data = {'scheduler': scheduler.to_dict()} if scheduler else {}
+    RunningTask.create(
+        task_id=task_id, task_type='TodoTask', serialized_data=json.dumps(data)
+    )
+
+
+def _models(n_likes: int) -> dict:
+    return {'models': [{'model_id': 'org/model', 'n_likes': n_likes}]}
+
+
+class _DatabaseTestCase(TestCase):
+    def setUp(self) -> None:
+        self.test_db = SqliteDatabase(':memory:')
+        self.test_db.bind(MODELS)
+        self.test_db.connect()
+        self.test_db.create_tables(MODELS)
+        self.client = app.test_client()
+
+    def tearDown(self) -> None:
+        self.test_db.drop_tables(MODELS)
+        self.test_db.close()
+
+
+class TestTableViews(TestCase):
+    def test_from_records(self) -> None:
+        view = TableView.from_records([{'a': 1, 'b': 2}, {'a': 3, 'b': 4}], ['b'])
+        self.assertEqual(view, TableView(['b'], [[2], [4]]))
+
+    def test_adapters(self) -> None:
+        models = build_huggingface_models(
+            {'models': [{'model_id': f'org/m{i}', 'n_likes': i} for i in range(12)]}
+        )
+        self.assertEqual(models.columns, ['model_id', 'n_likes', 'url'])
+        self.assertEqual(len(models.rows), 10)
+        self.assertEqual(
+            models.rows[0], ['org/m11', 11, 'https://huggingface.co/org/m11']
+        )
+        repos = build_repos(
+            {
+                'repos': [
+                    {'url': 'https://github.com/a/b', 'n_recent_stars': 1},
+                    {'url': 'https://github.com/c/d', 'n_recent_stars': 5},
+                ]
+            }
+        )
+        self.assertEqual(repos.columns, ['repo', 'url', 'n_recent_stars'])
+        self.assertEqual([row[0] for row in repos.rows], ['c/d', 'a/b'])
+        snow = build_snow_report({'top': {'Mon': 5}, 'base': {'Mon': 1, 'Tue': 2}})
+        self.assertEqual(snow.columns, ['day', 'top', 'base'])
+        self.assertEqual(snow.rows, [['Mon', 5, 1], ['Tue', None, 2]])
+
+    def test_generic_view(self) -> None:
+        self.assertEqual(
+            build_generic_view({'__class__': 'X', 'n': 1, 'items': [{'a': 1}, 2]}),
+            TableView(['a', 'items'], [[1, None], [None, 2]]),
+        )
+        self.assertEqual(
+            build_generic_view({'__class__': 'X', 'n': 1, 'name': 'a'}),
+            TableView(['field', 'value'], [['n', 1], ['name', 'a']]),
+        )
+
+
+class TestCachedView(_DatabaseTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        ml_view.invalidate()
+        self.addCleanup(ml_view.invalidate)
+
+    def test_latest_result_ids(self) -> None:
+        _store('a', {}, START)
+        newest = _store('a', {}, START + timedelta(hours=1))
+        _store('a', {}, START - timedelta(hours=1))
+        self.assertEqual(get_latest_result_ids(['a', 'missing']), (newest.id, None))
+
+    def test_new_result_changes_version(self) -> None:
+        renders = []
+
+        def render(entries: dict[str, TaskResult]) -> str:
+            renders.append(entries)
+            return json.dumps({task_id: entry.id for task_id, entry in entries.items()})
+
+        view = CachedView(['a', 'b'], render, check_interval=0)
+        first = _store('a', {})
+        etag, body = view.get()
+        self.assertEqual(json.loads(body), {'a': first.id})
+        self.assertEqual(view.get(), (etag, body))
+        self.assertEqual(len(renders), 1)
+        second = _store('b', {})
+        new_etag, new_body = view.get()
+        self.assertNotEqual(new_etag, etag)
+        self.assertEqual(json.loads(new_body), {'a': first.id, 'b': second.id})
+
+        cached = CachedView(['a'], render, check_interval=3600)
+        cached_etag, _ = cached.get()
+        _store('a', {}, START + timedelta(days=1))
+        self.assertEqual(cached.get()[0], cached_etag)
+        cached.invalidate()
+        self.assertNotEqual(cached.get()[0], cached_etag)
+
+    def test_etag_and_not_modified(self) -> None:
+        _store(HF_MODELS_TASK, _models(3))
+        _store(HF_PAPERS_TASK, {'papers': [{'title': 'P', 'n_likes': 1, 'url': '/p'}]})
+        _store(GH_REPOS_TASK, {'repos': []})
+        response = self.client.get('/ml')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('org/model', response.get_data(as_text=True))
+        self.assertIn('Weekly ML Trends 2025-01-06', response.get_data(as_text=True))
+        etag = response.headers['ETag']
+        response = self.client.get('/ml', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+        _store(HF_MODELS_TASK, _models(4), START + timedelta(days=7))
+        ml_view.invalidate()
+        response = self.client.get('/ml', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+        self.assertIn('2025-01-13', response.get_data(as_text=True))
+
+
+class TestTaskPages(_DatabaseTestCase):
+    def test_task_pages(self) -> None:
+        for i in range(5):
+            _running_task(f'task_{i}')
+        pages, cursor = [], None
+        while True:
+            tasks, cursor = list_tasks(cursor, limit=2)
+            pages.append([task.task_id for task in tasks])
+            if cursor is None:
+                break
+        self.assertEqual(
+            pages, [['task_0', 'task_1'], ['task_2', 'task_3'], ['task_4']]
+        )
+        response = self.client.get('/?after=task_3')
+        self.assertIn('task_4', response.get_data(as_text=True))
+        self.assertNotIn('task_3', response.get_data(as_text=True))
+
+    def test_next_runtime_follows_the_manager(self) -> None:
+        sofia = ZoneInfo('Europe/Sofia')
+        future = datetime.now(sofia).replace(microsecond=0) + timedelta(days=2)
+        fixed = Scheduler(
+            [future],
+            SchedulerConfig(frequency=Frequency.DAILY, timezone='Europe/Sofia'),
+        )
+        _running_task('fixed', fixed)
+        _running_task('queued', fixed)
+        _running_task('adaptive', AdaptiveScheduler())
+        _running_task('adaptive_new', AdaptiveScheduler())
+        save_state(
+            'adaptive:schedule',
+            {'next_runtime': future.isoformat(), 'last_hash': None},
+        )
+        available_at = datetime(2030, 1, 1, 10)
+        Job.create(task_id='queued', available_at=available_at)
+        Job.create(task_id='queued', state='done', available_at=START)
+        tasks = {task.task_id: task for task in list_tasks()[0]}
+        self.assertEqual(tasks['fixed'].next_runtime, future)
+        queued_at = tasks['queued'].next_runtime
+        assert queued_at
+        self.assertEqual(queued_at, available_at.replace(tzinfo=UTC))
+        self.assertEqual(queued_at.tzinfo, sofia)
+        self.assertEqual(tasks['adaptive'].next_runtime, future)
+        self.assertIsNone(tasks['adaptive_new'].next_runtime)
+
+    def test_history_pages(self) -> None:
+        # Results stored in the same instant are ordered by id.
+        ids = [
+            _store('task', {'i': i}, START + timedelta(hours=i // 2)).id
+            for i in range(5)
+        ]
+        pages, cursor = [], None
+        while True:
+            entries, cursor = list_history('task', cursor, limit=2)
+            pages.append([entry.id for entry in entries])
+            if cursor is None:
+                break
+        self.assertEqual(pages, [ids[:2:-1], ids[2:0:-1], ids[:1]])
+        response = self.client.get(f'/tasks/task?before={ids[3]}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/tasks/missing').status_code, 404)
+
+
+class TestEventBroadcaster(_DatabaseTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.events = EventBroadcaster(
+            keepalive=0.01, max_queue=2, history=3, poll_in_background=False
+        )
+
+    def test_poll_pushes_changed_rows(self) -> None:
+        _running_task('a')
+        _running_task('b')
+        self.events.poll()
+        subscriber = self.events.subscribe()
+        result = _store('a', {'x': 1})
+        self.events.poll()
+        events = [subscriber.get_nowait() for _ in range(subscriber.qsize())]
+        self.assertEqual([event.type for event in events], ['result', 'task'])
+        self.assertEqual(events[0].data['id'], result.id)
+        self.assertEqual(events[1].data['task_id'], 'a')
+        self.assertEqual(
+            events[1].data['cells']['last_result_at'], str(result.created_at)
+        )
+        _running_task('c')
+        self.events.poll()
+        self.assertEqual(
+            [subscriber.get_nowait().type for _ in range(subscriber.qsize())],
+            ['task', 'tasks'],
+        )
+        self.events.poll()
+        self.assertTrue(subscriber.empty())
+
+    def test_slow_client_is_dropped_and_replays(self) -> None:
+        slow = self.events.subscribe()
+        for i in range(3):
+            self.events.publish('result', {'i': i})
+        self.assertFalse(self.events.is_subscribed(slow))
+        replayed = self.events.subscribe(last_event_id=1)
+        self.assertEqual(
+            [replayed.get_nowait().id for _ in range(replayed.qsize())], [2, 3]
+        )
+        self.events.publish('result', {'i': 3})
+        self.events.publish('result', {'i': 4})
+        # Only the last `history` events are kept.
+        self.assertEqual(self.events.subscribe(last_event_id=0).get_nowait().id, 3)
+
+    def test_stream(self) -> None:
+        self.events.publish('result', {'task_id': 'a'})
+        stream = self.events.stream(last_event_id=0)
+        self.assertEqual(next(stream), 'retry: 3000\n\n')
+        self.assertEqual(
+            next(stream), 'id: 1\nevent: result\ndata: {"task_id": "a"}\n\n'
+        )
+        self.assertEqual(next(stream), ': keepalive\n\n')
+        for i in range(3):
+            self.events.publish('result', {'i': i})
+        # Events that were queued are sent before the stream ends.
+        self.assertEqual(len(list(stream)), 2)
+
+    def test_pages_are_updated_in_place(self) -> None:
+        _running_task('a')
+        _store('a', {'items': [{'name': 'first'}]})
+        page = self.client.get('/').get_data(as_text=True)
+        self.assertIn('data-task-id="a"', page)
+        self.assertIn('data-field="result_size"', page)
+        page = self.client.get('/tasks/a').get_data(as_text=True)
+        self.assertIn('id="history"', page)
+        _store('a', {'items': [{'name': 'second'}]}, START + timedelta(hours=1))
+        fragment = self.client.get('/tasks/a/result').get_data(as_text=True)
+        self.assertIn('second', fragment)
+        self.assertNotIn('<html', fragment)
+        self.assertEqual(self.client.get('/tasks/missing/result').status_code, 404)
@@ -0,0 +1,57 @@
+import argparse
+import statistics
+import subprocess
+import sys
+
+DEFAULT_MODULES = [
+    'argus.tasks',
+    'argus.tasks.base.task',
+    'argus.tasks.todo',
+    'argus.tasks.github',
+    'argus.tasks.epay',
+    'argus.tasks.ml.hugging_face',
+    'argus.tasks.ml.paper_with_code',
+    'argus.tasks.product',
+    'argus.tasks.snow',
+]
+HEAVY_MODULES = ['bs4', 'pandas', 'requests', 'tabulate', 'telegram']
+
+SNIPPET = """
+import sys, time
+started_at = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started_at
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(elapsed, ','.join(heavy))
+"""
+
+
+def measure(module: str, repeat: int) -> tuple[float, str]:
+    """Returns the median cold import time of `module` in fresh interpreters."""
+    timings = []
+    heavy = ''
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, '-c', SNIPPET.format(module=module, heavy=HEAVY_MODULES)],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.split(' ', 1)
+        timings.append(float(output[0]))
+        heavy = output[1].strip()
+    return statistics.median(timings), heavy
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Measure cold import times.')
+    parser.add_argument('modules', nargs='*', default=DEFAULT_MODULES)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    width = max(len(module) for module in args.modules)
+    for module in args.modules:
+        elapsed, heavy = measure(module, args.repeat)
+        print(f'{module:<{width}}  {elapsed * 1000:8.1f} ms  {heavy or "-"}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+import argparse
+import json
+import timeit
+from dataclasses import asdict
+from datetime import datetime, timedelta
+
+from argus.tasks.base.notifier import TelegramNotifier
+from argus.tasks.base.scheduler import Frequency, Scheduler, SchedulerConfig
+from argus.tasks.base.serializable import Serializable
+from argus.tasks.github import (
+    GithubSlackFormatter,
+    Repo,
+    Repos,
+    TrendingGithubReposTask,
+)
+
+
+def make_repos(n_repos: int) -> Repos:
+    return Repos(
+        Repo(
+            description=f'Repository number {index}',
+            n_stars=index * 10,
+            n_recent_stars=index,
+            language='Python',
+            url=f'https://github.com/user/repo{index}',
+        )
+        for index in range(n_repos)
+    )
+
+
+def report(name: str, number: int, seconds: float) -> None:
+    print(f'{name:<28} {seconds / number * 1000:9.3f} ms')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark (de)serialization.')
+    parser.add_argument('--n-repos', type=int, default=10_000)
+    parser.add_argument('--number', type=int, default=20)
+    args = parser.parse_args()
+
+    repos = make_repos(args.n_repos)
+    payload = json.loads(json.dumps(repos.to_dict()))
+    task = TrendingGithubReposTask(
+        scheduler=Scheduler(
+            [datetime.now() - timedelta(days=90)],
+            SchedulerConfig(frequency=Frequency.HOURLY),
+        ),
+        formatter=GithubSlackFormatter(),
+        notifier=TelegramNotifier('token', ['chat']),
+    )
+    task_payload = json.loads(json.dumps(task.to_dict()))
+
+    benchmarks = {
+        'result to_dict (asdict)': lambda: {'repos': [asdict(repo) for repo in repos]},
+        'result to_dict': repos.to_dict,
+        'result from_dict (**kwargs)': lambda: Repos(
+            [Repo(**repo) for repo in payload['repos']]
+        ),
+        'result from_dict': lambda: Repos.from_dict(payload),
+        'task from_dict': lambda: Serializable.from_dict(task_payload),
+    }
+    for name, function in benchmarks.items():
+        number = args.number if name.startswith('result') else args.number * 1000
+        report(name, number, timeit.timeit(function, number=number))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,59 @@
+import argparse
+
 from argus.logger_setup import setup_logging
 from argus.tasks.base.database import init_database
 from argus.tasks.base.task import TaskManager
 
 
 def main() -> None:
-    task_manager = TaskManager()
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--role',
+        choices=['all', 'scheduler', 'worker'],
+        default='all',
+        help='Schedule due tasks, execute queued jobs, or both.',
+    )
+    parser.add_argument(
+        '--workers', type=int, default=4, help='Jobs executed concurrently.'
+    )
+    parser.add_argument(
+        '--reserved-workers',
+        type=int,
+        default=1,
+        help='Workers kept free for critical jobs such as reminders.',
+    )
+    parser.add_argument(
+        '--log-json', action='store_true', help='Log one JSON object per line.'
+    )
+    parser.add_argument(
+        '--log-file', default=None, help='Also log to this size-rotated file.'
+    )
+    parser.add_argument(
+        '--log-async',
+        action='store_true',
+        help='Write logs from a background thread.',
+    )
+    parser.add_argument(
+        '--log-runs',
+        action='store_true',
+        help='Store the logs of each run with its journal entry.',
+    )
+    args = parser.parse_args()
+    setup_logging(
+        json_format=args.log_json,
+        log_file=args.log_file,
+        background=args.log_async,
+        capture_runs=args.log_runs,
+    )
+    init_database()
+    task_manager = TaskManager(
+        schedule=args.role in ('all', 'scheduler'),
+        execute=args.role in ('all', 'worker'),
+        max_workers=args.workers,
+        reserved_workers=args.reserved_workers,
+    )
     task_manager.run()
 
 
 if __name__ == '__main__':
-    setup_logging()
-    init_database()
     main()
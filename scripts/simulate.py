@@ -0,0 +1,53 @@
+import argparse
+from datetime import UTC, datetime, timedelta
+
+from argus.logger_setup import setup_logging
+from argus.tasks.base.simulation import (
+    load_running_tasks,
+    recorded_durations,
+    simulate,
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Replays the schedules of the running tasks on a virtual clock.'
+    )
+    parser.add_argument(
+        '--start',
+        type=datetime.fromisoformat,
+        default=None,
+        help='Start of the simulation (ISO format), now by default.',
+    )
+    parser.add_argument(
+        '--days', type=float, default=7, help='Length of the simulation.'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=None,
+        help='Jobs executed concurrently; unlimited by default.',
+    )
+    parser.add_argument(
+        '--reserved-workers',
+        type=int,
+        default=0,
+        help='Workers kept free for critical jobs such as reminders.',
+    )
+    parser.add_argument('--top', type=int, default=24, help='Busiest hours to list.')
+    args = parser.parse_args()
+    tasks = load_running_tasks()
+    report = simulate(
+        tasks,
+        start=args.start if args.start else datetime.now(UTC),
+        horizon=timedelta(days=args.days),
+        durations=recorded_durations([task.task_id for task in tasks]),
+        max_workers=args.workers,
+        reserved_workers=args.reserved_workers,
+    )
+    print(report.to_str(top=args.top))
+
+
+if __name__ == '__main__':
+    setup_logging()
+    main()
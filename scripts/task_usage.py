@@ -0,0 +1,43 @@
+import argparse
+from datetime import timedelta
+
+from argus.tasks.base.database import get_current_utc_time
+from argus.tasks.base.journal import (
+    USAGE_ORDERS,
+    Outcome,
+    query_runs,
+    usage_by_task,
+    usage_to_str,
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Lists the tasks that used the most resources.'
+    )
+    parser.add_argument(
+        '--days', type=float, default=7, help='Runs of the last days to include.'
+    )
+    parser.add_argument(
+        '--sort', choices=USAGE_ORDERS, default='cpu_time', help='Usage to rank by.'
+    )
+    parser.add_argument('--top', type=int, default=10, help='Tasks to list.')
+    parser.add_argument(
+        '--failures', type=int, default=5, help='Latest failed runs to list.'
+    )
+    args = parser.parse_args()
+    since = get_current_utc_time() - timedelta(days=args.days)
+    print(usage_to_str(usage_by_task(since, order_by=args.sort, limit=args.top)))
+    failed_runs = query_runs(
+        since=since,
+        outcomes=[Outcome.FAILURE, Outcome.TIMEOUT],
+        limit=args.failures,
+    )
+    for run in failed_runs:
+        print(
+            f'{run.started_at:%Y-%m-%d %H:%M} {run.task_id} {run.outcome}: {run.error}'
+        )
+
+
+if __name__ == '__main__':
+    main()